@@ -1,20 +1,21 @@
-from webdriver_manager.chrome import ChromeDriverManager
-from utils.threading_controller import FastSearchAlgo
+from utils.driver_bootstrap import DriverBootstrap
+from utils.progress_events import ProgressEvents
 from argparse import ArgumentParser
-import tkinter as tk
-from tkinter import ttk
+from datetime import date
 from threading import Event, Thread, Lock
 import logging
-import time
 
 class GMapsScraper:
     def __init__(self):
         self._args = None
         self.setup_logging()
         self.stop_event = Event()
-        self.result_count = 0
+        self.progress_events = ProgressEvents()
         self.scraping_thread = None
-        self.status_thread = None
+        self.bootstrap = None
+        self.algo_obj = None
+        self.reviews_since = None
+        self.proxies = None
 
     def setup_logging(self):
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,6 +23,7 @@ class GMapsScraper:
 
     def arg_parser(self):
         parser = ArgumentParser(description='Command Line Google Map Scraper by Abdul Moez')
+        parser.add_argument('-w', '--threads', help='Number of browsers searching queries or map tiles in parallel (default: 5)', type=int, default=5)
         parser.add_argument('-l', '--limit', help='Number of results to scrape (-1 for all results, default: 200)', type=int, default=200)
         parser.add_argument('-u', '--unavailable-text', help='Replacement text for unavailable information (default: "Not Available")', type=str, default="Not Available")
         parser.add_argument('-bw', '--browser-wait', help='Browser waiting time in seconds (default: 15)', type=int, default=15)
@@ -29,60 +31,230 @@ class GMapsScraper:
         parser.add_argument('-wb', '--windowed-browser', help='Disable headless mode', action='store_false', default=True)
         parser.add_argument('-v', '--verbose', help='Enable verbose mode', action='store_true')
         parser.add_argument('-o', '--output-folder', help='Output folder to store CSV details (default: ./CSV_FILES)', type=str, default='./CSV_FILES')
+        parser.add_argument('-dw', '--detail-workers', help='Number of detail drivers visiting place pages in parallel (0 keeps a single driver per query, default: 0)', type=int, default=0)
         parser.add_argument('-d', '--driver-path', help='Path to Chrome driver (if not provided, it will be downloaded)', type=str, default='')
+        parser.add_argument('-pd', '--profile-dir', help='Folder for persistent Chrome profiles, empty to launch cold profiles (default: ./CHROME_PROFILES)', type=str, default='./CHROME_PROFILES')
+        parser.add_argument('-ae', '--async-enrich', help='Fetch websites and their suggested extensions concurrently after the places are scraped instead of opening them in browser tabs', action='store_true')
+        parser.add_argument('-nr', '--no-rate-control', help='Disable the adaptive rate controller that slows searches and place visits down when Google starts blocking', action='store_false', dest='adaptive_rate', default=True)
+        parser.add_argument('-bb', '--bbox', help='Tile the query over a bounding box "south,west,north,east" to get past the per-search result cap', type=str, default='')
+        parser.add_argument('-tg', '--tile-grid', help='Initial tile grid size per side for --bbox (default: 2)', type=int, default=2)
+        parser.add_argument('-tc', '--tile-cap', help='Results in a tile at which it is split into four smaller tiles (default: 100)', type=int, default=100)
+        parser.add_argument('-td', '--tile-depth', help='Maximum number of times a tile can be split (default: 4)', type=int, default=4)
+        parser.add_argument('-dr', '--dedupe-radius', help='Skip listings within this many metres of a place with a matching name or phone, 0 to disable (default: 50)', type=float, default=50.0)
+        parser.add_argument('-mb', '--max-browser-mb', help='Recycle a browser once its process tree uses this many MB, 0 to disable (default: 1500)', type=float, default=1500.0)
+        parser.add_argument('-mp', '--max-pages', help='Recycle a browser after visiting this many pages, 0 to disable (default: 0)', type=int, default=0)
+        parser.add_argument('-jq', '--queue', help='Run headless as a worker of this SQLite job queue instead of opening the GUI (fill it with python -m utils.job_queue)', type=str, default='')
+        parser.add_argument('-ls', '--lease-seconds', help='How long a leased job stays claimed without a heartbeat (default: 300)', type=float, default=300.0)
+        parser.add_argument('-sv', '--serve', help='Run headless as a local HTTP job service on this port instead of opening the GUI, -w sets how many warm drivers run jobs (default: 0, off)', type=int, default=0)
+        parser.add_argument('-ar', '--archive', help='Folder to archive place pages and contact pages in, compressed and deduplicated, for offline re-extraction with python -m utils.page_archive', type=str, default='')
+        parser.add_argument('-rv', '--reviews', help='Reviews to read per place into google_maps_reviews.csv, 0 for all of them (default: -1, off)', type=int, default=-1)
+        parser.add_argument('-rs', '--reviews-since', help='With --reviews, only read reviews newer than this date (YYYY-MM-DD), the reviews are sorted newest first', type=str, default='')
+        parser.add_argument('-rk', '--keep-review-nodes', help='Keep read reviews in the page instead of removing them while scrolling', action='store_false', dest='prune_reviews', default=True)
+        parser.add_argument('-id', '--identities', help='Give every browser its own user agent and fingerprint, blocked identities are retired for 30 minutes', action='store_true')
+        parser.add_argument('-px', '--proxy-file', help='File with one proxy endpoint per line (e.g. http://127.0.0.1:8001), spread over the identities; implies --identities', type=str, default='')
+        parser.add_argument('-dx', '--delta', help='SQLite snapshot to compare this run against, writes delta_<time>_added/changed/disappeared.csv next to the full CSV', type=str, default='')
+        parser.add_argument('-ph', '--plan-history', help='SQLite file with the size and duration of earlier queries, used to run the longest queries first and split oversized ones', type=str, default='')
+        parser.add_argument('-pq', '--probe', help='With --plan-history, search queries never seen before once to estimate their size', action='store_true')
+        parser.add_argument('-be', '--backend', help='How page navigation and feed scripts reach Chrome: through chromedriver (selenium) or straight over the DevTools socket (cdp); compare them with python -m utils.backend_bench (default: selenium)', choices=['selenium', 'cdp'], default='selenium')
+        parser.add_argument('-tb', '--tabs', help='Long-lived tabs per browser that load places in parallel while another one is read, 0 opens a new tab per place (default: 0)', type=int, default=0)
+        parser.add_argument('--dry-run', help='Validate arguments and print the run configuration without launching anything', action='store_true')
         self._args = parser.parse_args()
 
-    def scrape_maps_data(self, query):
-        self.result_count = 0
-        limit_results = 500 if self._args.limit == -1 else self._args.limit
-
-        driver_path = self._args.driver_path
-        if not self._args.driver_path:
+        if self._args.limit == 0 or self._args.limit < -1:
+            parser.error("--limit must be -1 or a positive number")
+        if self._args.browser_wait <= 0:
+            parser.error("--browser-wait must be a positive number")
+        if self._args.detail_workers < 0:
+            parser.error("--detail-workers can't be negative")
+        if self._args.threads < 1:
+            parser.error("--threads must be at least 1")
+        if not 0 <= self._args.serve <= 65535:
+            parser.error("--serve must be a valid port")
+        if self._args.lease_seconds <= 0:
+            parser.error("--lease-seconds must be a positive number")
+        if self._args.max_browser_mb < 0 or self._args.max_pages < 0:
+            parser.error("--max-browser-mb and --max-pages can't be negative")
+        if self._args.tabs < 0:
+            parser.error("--tabs can't be negative")
+        if self._args.reviews < -1:
+            parser.error("--reviews must be -1, 0 or a positive number")
+        if self._args.reviews_since:
             try:
-                driver_path = ChromeDriverManager().install()
+                self.reviews_since = date.fromisoformat(self._args.reviews_since)
             except ValueError:
-                self.logger.error("Not able to download the driver which is compatible with your browser.")
-                self.logger.info("Head to this site (https://chromedriver.chromium.org/downloads) and find your version driver and pass it with argument -d.")
-                return
+                parser.error("--reviews-since must be a date like 2024-01-31")
+        if self._args.proxy_file:
+            try:
+                with open(self._args.proxy_file, encoding="utf-8") as proxy_file:
+                    self.proxies = [line.strip() for line in proxy_file if line.strip() and not line.startswith("#")]
+            except OSError as e:
+                parser.error(f"Not able to read --proxy-file: {e}")
+            if not self.proxies:
+                parser.error("--proxy-file has no proxy endpoints")
+        if self._args.bbox:
+            from utils.geo_tiling import Tile
+            try:
+                Tile.from_string(self._args.bbox)
+            except ValueError as e:
+                parser.error(str(e))
+
+        self.bootstrap = DriverBootstrap(driver_path=self._args.driver_path, profile_root=self._args.profile_dir)
 
-        print_lock = Lock()
-        algo_obj = FastSearchAlgo(
+    def create_algo(self, driver_path, limit_results):
+        # Selenium and friends are only paid for once a scrape (or warm up) actually starts
+        from utils.threading_controller import FastSearchAlgo
+
+        return FastSearchAlgo(
             unavailable_text=self._args.unavailable_text,
             headless=self._args.windowed_browser,
             wait_time=self._args.browser_wait,
             suggested_ext=self._args.suggested_ext,
             output_path=self._args.output_folder,
-            workers=10,
+            workers=self._args.threads,
             result_range=limit_results,
             verbose=self._args.verbose,
             driver_path=driver_path,
-            print_lock=print_lock
+            print_lock=Lock(),
+            detail_workers=self._args.detail_workers,
+            bootstrap=self.bootstrap,
+            async_enrichment=self._args.async_enrich,
+            adaptive_rate=self._args.adaptive_rate,
+            dedupe_radius=self._args.dedupe_radius,
+            max_browser_mb=self._args.max_browser_mb,
+            max_pages=self._args.max_pages,
+            archive_dir=self._args.archive,
+            max_reviews=self._args.reviews,
+            reviews_since=self.reviews_since,
+            prune_reviews=self._args.prune_reviews,
+            identities=self._args.identities,
+            proxies=self.proxies,
+            delta_path=self._args.delta,
+            plan_history=self._args.plan_history,
+            probe_queries=self._args.probe,
+            backend=self._args.backend,
+            tabs=self._args.tabs
         )
 
-        def update_result_count(count):
-            if self.result_count + count > limit_results:
-                count = limit_results - self.result_count
-            self.result_count += count
-            result_label.config(text=f"Results Scraped: {self.result_count}")
-            progress_bar['value'] = (self.result_count / limit_results) * 100
-            root.update_idletasks()
-            if self.result_count >= limit_results:
-                self.stop_event.set()
+    def resolve_driver_path(self):
+        try:
+            return self.bootstrap.resolve_driver_path()
+        except ValueError:
+            self.logger.error("Not able to download the driver which is compatible with your browser.")
+            self.logger.info("Head to this site (https://chromedriver.chromium.org/downloads) and find your version driver and pass it with argument -d.")
+            return None
+
+    def warm_start(self):
+        # Resolve the driver and warm the browser profile while the user is still typing the query
+        driver_path = self.resolve_driver_path()
+        if driver_path:
+            try:
+                self.create_algo(driver_path, limit_results=None).warm_up()
+            except Exception as e:
+                self.logger.error(f"Error while warming up the browser: {e}")
+
+    def result_limit(self, tiled: bool):
+        # A single feed stops around a few hundred places, tiling has no such cap
+        if self._args.limit == -1:
+            return None if tiled else 500
+        return self._args.limit
+
+    def scrape_maps_data(self, queries: list[str]):
+        limit_results = self.result_limit(tiled=bool(self._args.bbox))
+
+        driver_path = self.resolve_driver_path()
+        if not driver_path:
+            self.progress_events.query_status("", "Driver not available")
+            return None
+
+        algo_obj = self.create_algo(driver_path, limit_results)
+        self.algo_obj = algo_obj
 
         def scrape_with_update():
+            # Workers only push events, the Tk loop is the one touching widgets
             try:
-                algo_obj.fast_search_algorithm([query], update_result_count, lambda: self.stop_event.is_set())
+                if self._args.bbox:
+                    algo_obj.tiled_search_algorithm(queries, self._args.bbox, self.progress_events,
+                                                    lambda: self.stop_event.is_set(), grid=self._args.tile_grid,
+                                                    tile_cap=self._args.tile_cap, max_depth=self._args.tile_depth)
+                    return
+                algo_obj.fast_search_algorithm(queries, self.progress_events, lambda: self.stop_event.is_set())
             except Exception as e:
                 self.logger.error(f"Error during scraping: {e}")
+            finally:
+                algo_obj.finish_run()
 
         self.scraping_thread = Thread(target=scrape_with_update, daemon=True)
         self.scraping_thread.start()
+        return limit_results
+
+    def stop_scraping(self, grace: float = 5.0):
+        # Workers flush their records and quit their drivers within `grace`, stragglers are force closed
+        self.stop_event.set()
+        if self.algo_obj is None:
+            return
+        report = self.algo_obj.shutdown(grace)
+        if self.scraping_thread and self.scraping_thread.is_alive():
+            self.scraping_thread.join(timeout=grace)
+        self.logger.info(f"Stopped in {report['seconds']:.2f}s "
+                         f"({report['forced_drivers']} driver(s) force closed)")
+        self.progress_events.query_status("", f"Stopped in {report['seconds']:.1f}s")
+
+    def run_queue_worker(self):
+        from utils.job_queue import JobQueue
+
+        job_queue = JobQueue(self._args.queue)
+        self.logger.info(f"Queue {self._args.queue}: {job_queue.counts()}")
+        driver_path = self.resolve_driver_path()
+        if not driver_path:
+            return
+
+        # Tile jobs carry their own bbox, their limit counts unique places like a --bbox run
+        self.algo_obj = self.create_algo(driver_path, self.result_limit(tiled=False))
+        # On Ctrl+C unfinished jobs are released back to the queue for the other workers
+        self.run_headless(self.algo_obj.queue_search_algorithm, job_queue, lambda count: None,
+                          lambda: self.stop_event.is_set(), self._args.lease_seconds, self._args.tile_grid,
+                          self._args.tile_cap, self._args.tile_depth)
+        self.logger.info(f"Queue {self._args.queue}: {job_queue.counts()}")
+
+    def run_headless(self, target, *args):
+        self.scraping_thread = Thread(target=target, args=args, daemon=True)
+        self.scraping_thread.start()
+        try:
+            while self.scraping_thread.is_alive():
+                self.scraping_thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop_scraping()
+        self.algo_obj.finish_run()
+
+    def run_service(self):
+        driver_path = self.resolve_driver_path()
+        if not driver_path:
+            return
+        self.algo_obj = self.create_algo(driver_path, self.result_limit(tiled=False))
+        self.run_headless(self.algo_obj.serve, lambda: self.stop_event.is_set(), self._args.serve, "127.0.0.1",
+                          self.result_limit(tiled=False))
 
     def run(self):
-        global root
+        if self._args.dry_run:
+            for key, value in vars(self._args).items():
+                self.logger.info(f"{key}: {value}")
+            return
+
+        if self._args.queue:
+            self.run_queue_worker()
+            return
+        if self._args.serve:
+            self.run_service()
+            return
+
+        import tkinter as tk
+        from tkinter import ttk
+
+        Thread(target=self.warm_start, daemon=True).start()
+
         root = tk.Tk()
         root.title("Google Maps Scraper")
-        root.geometry("600x400")
+        root.geometry("700x620")
         root.configure(bg='#F0F0F0')
 
         style = ttk.Style()
@@ -98,72 +270,131 @@ class GMapsScraper:
         frame = ttk.Frame(root, padding=20, style='TFrame')
         frame.pack(fill=tk.BOTH, expand=True)
 
-        ttk.Label(frame, text="Enter Search Query:").grid(row=0, column=0, padx=10, pady=10, sticky=tk.W)
-        query_entry = ttk.Entry(frame, width=50)
-        query_entry.grid(row=0, column=1, padx=10, pady=10)
+        ttk.Label(frame, text="Search Queries (one per line):").grid(row=0, column=0, padx=10, pady=10, sticky=tk.NW)
+        query_text = tk.Text(frame, width=45, height=5, font=('Segoe UI', 11))
+        query_text.grid(row=0, column=1, padx=10, pady=10)
 
-        ttk.Label(frame, text="Limit (number of results):").grid(row=1, column=0, padx=10, pady=10, sticky=tk.W)
+        ttk.Label(frame, text="Limit per query:").grid(row=1, column=0, padx=10, pady=10, sticky=tk.W)
         limit_entry = ttk.Entry(frame, width=10)
         limit_entry.insert(0, "200")
-        limit_entry.grid(row=1, column=1, padx=10, pady=10)
+        limit_entry.grid(row=1, column=1, padx=10, pady=10, sticky=tk.W)
+
+        query_table = ttk.Treeview(frame, columns=("status", "results"), height=6)
+        query_table.heading("#0", text="Query")
+        query_table.heading("status", text="Status")
+        query_table.heading("results", text="Results")
+        query_table.column("#0", width=330)
+        query_table.column("status", width=120, anchor=tk.CENTER)
+        query_table.column("results", width=120, anchor=tk.CENTER)
+        query_table.grid(row=2, columnspan=2, pady=10, sticky=tk.EW)
 
-        global result_label
         result_label = ttk.Label(frame, text="Results Scraped: 0")
-        result_label.grid(row=2, columnspan=2, pady=10)
+        result_label.grid(row=3, columnspan=2, pady=10)
 
-        global progress_bar
         progress_bar = ttk.Progressbar(frame, style='TProgressbar', length=500, mode='determinate')
-        progress_bar.grid(row=3, columnspan=2, pady=10)
+        progress_bar.grid(row=4, columnspan=2, pady=10)
+
+        status_label = ttk.Label(frame, text="Status: Idle", font=('Segoe UI', 12, 'bold'))
+        status_label.grid(row=5, columnspan=2, pady=10)
+
+        # Owned by the Tk thread only, workers never read or write these
+        run_state = {"counts": {}, "statuses": {}, "limit": None, "ticks": 0, "running": False}
 
-        status_label = ttk.Label(frame, text="Status: 🚀", font=('Segoe UI', 12, 'bold'))
-        status_label.grid(row=4, columnspan=2, pady=10)
+        def results_text(query):
+            count = run_state["counts"][query]
+            return f"{count}/{run_state['limit']}" if run_state["limit"] else str(count)
 
-        def update_status():
-            emojis = ["🚀", "🚀🚀", "🚀🚀🚀", "🚀🚀🚀🚀", "🚀🚀🚀🚀🚀"]
-            count = 0
-            while not self.stop_event.is_set():
-                status_label.config(text=f"Status: {emojis[count % len(emojis)]}")
-                count += 1
-                root.update_idletasks()
-                time.sleep(0.2)
+        def pump_events():
+            # One batch per tick: however many events came in, every widget is redrawn at most once
+            results, statuses = self.progress_events.drain()
+            changed = set(results) | set(statuses)
+            for query, count in results.items():
+                if query in run_state["counts"]:
+                    run_state["counts"][query] = min(run_state["counts"][query] + count,
+                                                     run_state["limit"] or float("inf"))
+            for query, status in statuses.items():
+                if query == "":
+                    status_label.config(text=f"Status: {status}")
+                elif query in run_state["statuses"]:
+                    run_state["statuses"][query] = status
+
+            for query in changed:
+                if query in run_state["counts"]:
+                    query_table.item(query, values=(run_state["statuses"][query], results_text(query)))
+
+            if results:
+                total = sum(run_state["counts"].values())
+                result_label.config(text=f"Results Scraped: {total}")
+                if run_state["limit"]:
+                    progress_bar['value'] = total / (run_state["limit"] * len(run_state["counts"])) * 100
+
+            if run_state["running"]:
+                run_state["ticks"] += 1
+                if not self.scraping_thread or not self.scraping_thread.is_alive():
+                    run_state["running"] = False
+                    status_label.config(text="Status: Stopped" if self.stop_event.is_set() else "Status: Done")
+                elif run_state["ticks"] % 2 == 0:
+                    emojis = ["🚀", "🚀🚀", "🚀🚀🚀", "🚀🚀🚀🚀", "🚀🚀🚀🚀🚀"]
+                    status_label.config(text=f"Status: {emojis[run_state['ticks'] // 2 % len(emojis)]}")
+            root.after(100, pump_events)
 
         def on_start_click():
-            query = query_entry.get()
+            if run_state["running"]:
+                return
+            # Order is kept and repeated lines are searched once
+            queries = list(dict.fromkeys(line.strip() for line in query_text.get("1.0", tk.END).splitlines()
+                                         if line.strip()))
             limit = limit_entry.get()
-            if query and limit.isdigit():
-                self._args.limit = int(limit)
-                self.stop_event.clear()
-                progress_bar['value'] = 0
-                self.scrape_maps_data(query)
-                self.status_thread = Thread(target=update_status, daemon=True)
-                self.status_thread.start()
+            if not queries or not limit.isdigit():
+                return
+
+            self._args.limit = int(limit)
+            self.stop_event.clear()
+            self.progress_events.drain()
+            query_table.delete(*query_table.get_children())
+            run_state["counts"] = dict.fromkeys(queries, 0)
+            run_state["statuses"] = dict.fromkeys(queries, "Queued")
+            for query in queries:
+                query_table.insert("", tk.END, iid=query, text=query, values=("Queued", "0"))
+            progress_bar['value'] = 0
+            result_label.config(text="Results Scraped: 0")
+
+            run_state["limit"] = self.scrape_maps_data(queries)
+            for query in queries:
+                query_table.item(query, values=("Queued", results_text(query)))
+            run_state["running"] = self.scraping_thread is not None and self.scraping_thread.is_alive()
 
         def on_stop_click():
-            self.stop_event.set()
-            if self.scraping_thread and self.scraping_thread.is_alive():
-                self.scraping_thread.join(timeout=10)
-            if self.status_thread and self.status_thread.is_alive():
-                self.status_thread.join(timeout=10)
+            # Shutting down off the Tk thread keeps the window responsive while drivers close
+            status_label.config(text="Status: Stopping")
+            Thread(target=self.stop_scraping, daemon=True).start()
 
         def on_close():
-            self.stop_event.set()
-            if self.scraping_thread and self.scraping_thread.is_alive():
-                self.scraping_thread.join(timeout=10)
-            if self.status_thread and self.status_thread.is_alive():
-                self.status_thread.join(timeout=10)
-            root.destroy()
+            # Same shutdown as Stop, off the Tk thread, the window only goes away once it has finished
+            status_label.config(text="Status: Closing")
+            root.protocol("WM_DELETE_WINDOW", lambda: None)
+            shutdown = Thread(target=self.stop_scraping, daemon=True)
+            shutdown.start()
+
+            def destroy_when_stopped():
+                if shutdown.is_alive():
+                    root.after(100, destroy_when_stopped)
+                else:
+                    root.destroy()
+            destroy_when_stopped()
 
         root.protocol("WM_DELETE_WINDOW", on_close)
 
         start_button = ttk.Button(frame, text="Start Scraper", style='StartButton.TButton', command=on_start_click)
-        start_button.grid(row=5, column=0, pady=20, sticky=tk.EW)
+        start_button.grid(row=6, column=0, pady=20, sticky=tk.EW)
 
         stop_button = ttk.Button(frame, text="Stop Scraper", style='StopButton.TButton', command=on_stop_click)
-        stop_button.grid(row=5, column=1, pady=20, sticky=tk.EW)
+        stop_button.grid(row=6, column=1, pady=20, sticky=tk.EW)
 
         for widget in frame.winfo_children():
             widget.grid_configure(padx=10, pady=5)
 
+        root.after(100, pump_events)
         root.mainloop()
 
 if __name__ == '__main__':
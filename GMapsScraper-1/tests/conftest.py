@@ -0,0 +1,5 @@
+from os.path import dirname, abspath
+import sys
+
+# The scraper is run from its own folder and imports utils.* from there, the tests do the same
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from utils.async_site_enricher import AsyncSiteEnricher
+from utils.local_stubs import LatencyStubServer
+
+
+def test_dechunk_joins_chunks_and_stops_at_the_last():
+    body = b"5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\n\r\n"
+    assert AsyncSiteEnricher._dechunk(body) == b"hello world"
+    assert AsyncSiteEnricher._dechunk(b"zz\r\nrest") == b""
+
+
+def test_run_fetches_sites_and_their_contact_pages():
+    pytest.importorskip("bs4")
+    pytest.importorskip("lxml")
+
+    async def scenario():
+        server = await LatencyStubServer(latency=0, page_padding=0).start()
+        try:
+            hosts = {"cafex.test": "127.0.0.1", "bar.test": "127.0.0.1"}
+            enricher = AsyncSiteEnricher(suggested_ext=["contact"], per_host=1, host_overrides=hosts)
+            records = [{"title": host} for host in hosts]
+            stats = await enricher.run([(record, f"http://{record['title']}:{server.port}/") for record in records])
+            return records, stats, dict(server.requests_per_host)
+        finally:
+            await server.close()
+
+    records, stats, requests_per_host = asyncio.run(scenario())
+    assert [record["site_email"] for record in records] == ["info@cafex.test", "info@bar.test"]
+    # The site and its one suggested page, fake hostnames never reach DNS
+    assert requests_per_host == {"cafex.test": 2, "bar.test": 2}
+    assert stats["sites"] == 2 and stats["fetches"] == 4
+
+
+def test_enrich_records_routes_socials_without_fetching():
+    enricher = AsyncSiteEnricher(unavailable_text="n/a")
+    records = [{"webpage": "https://www.instagram.com/cafex"}, {"webpage": "n/a"}]
+    stats = enricher.enrich_records(records)
+    assert records[0]["socials"] == ("https://www.instagram.com/cafex",)
+    assert records[1]["site_email"] == "n/a"
+    assert stats["routed"] == 1 and stats.get("fetches", 0) == 0
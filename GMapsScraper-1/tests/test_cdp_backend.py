@@ -0,0 +1,92 @@
+import json
+import socket
+from threading import Thread
+
+import pytest
+
+wsproto = pytest.importorskip("wsproto")
+from wsproto import WSConnection, ConnectionType
+from wsproto.events import AcceptConnection, CloseConnection, Ping, Request, TextMessage
+
+from utils.cdp_backend import CDPConnection, CDPError
+
+
+class FakeDevTools:
+    # One-connection DevTools stand-in: answer(method, params) returns the frames to send back for a call, as
+    # (text, finished) pairs, a Ping or None to hang up
+    def __init__(self, answer):
+        self._answer = answer
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.url = f"ws://127.0.0.1:{self._listener.getsockname()[1]}/devtools/page/1"
+        self._thread = Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        connection, _ = self._listener.accept()
+        ws = WSConnection(ConnectionType.SERVER)
+        with connection:
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    return
+                ws.receive_data(data)
+                for event in ws.events():
+                    if isinstance(event, Request):
+                        connection.sendall(ws.send(AcceptConnection()))
+                    elif isinstance(event, CloseConnection):
+                        return
+                    elif isinstance(event, TextMessage):
+                        request = json.loads(event.data)
+                        frames = self._answer(request["id"], request["method"])
+                        if frames is None:
+                            return
+                        for frame in frames:
+                            if isinstance(frame, Ping):
+                                connection.sendall(ws.send(frame))
+                            else:
+                                connection.sendall(ws.send(TextMessage(data=frame[0], message_finished=frame[1])))
+
+    def close(self):
+        self._listener.close()
+        self._thread.join(timeout=5)
+
+
+def message(**fields) -> str:
+    return json.dumps(fields)
+
+
+def test_fragments_events_and_pings_around_a_response():
+    def answer(message_id, method):
+        if method == "Runtime.evaluate":
+            load = message(method="Page.loadEventFired", params={"timestamp": 1.5})
+            return [(load[:10], False), (load[10:], True), Ping(),
+                    (message(method="Network.requestWillBeSent", params={"requestId": "r1"}), True),
+                    (message(id=message_id, result={"result": {"value": 2}}), True)]
+        return [(message(id=message_id, error={"message": f"'{method}' wasn't found"}), True)]
+
+    server = FakeDevTools(answer)
+    connection = CDPConnection(server.url, timeout=5)
+    requests = []
+    connection.listen("Network.requestWillBeSent", requests.append)
+    try:
+        assert connection.call("Runtime.evaluate", {"expression": "1 + 1"}) == {"result": {"value": 2}}
+        # The event came in fragments while the call waited, it is kept for wait_event
+        assert connection.wait_event("Page.loadEventFired", timeout=0.1) == {"timestamp": 1.5}
+        assert connection.wait_event("Page.loadEventFired", timeout=0.1) is None
+        assert requests == [{"requestId": "r1"}]
+        with pytest.raises(CDPError, match="wasn't found"):
+            connection.call("Nope.method")
+    finally:
+        connection.close()
+        server.close()
+
+
+def test_a_closed_socket_fails_the_call():
+    server = FakeDevTools(lambda message_id, method: None)
+    connection = CDPConnection(server.url, timeout=5)
+    try:
+        with pytest.raises(CDPError, match="closed"):
+            connection.call("Runtime.evaluate")
+    finally:
+        connection.close()
+        server.close()
@@ -0,0 +1,47 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from utils.consolidate import clean_chunk, dedupe_key, consolidate
+
+
+def test_clean_chunk_types_and_normalises():
+    chunk = clean_chunk(pd.DataFrame({
+        "rating": ["4,5", "Not Available"], "review_count": ["1,234 reviews", ""], "lat": ["40.5", "x"],
+        "phone_number": ["0044 20 1234 5678", "+1 (555) 123-4567"],
+        "webpage": ["https://www.CafeX.com/menu", "cafe-y.co.uk."]}, dtype=str))
+    assert chunk["rating"].tolist()[0] == 4.5 and pd.isna(chunk["rating"].tolist()[1])
+    assert chunk["review_count"].tolist()[0] == 1234 and pd.isna(chunk["review_count"].tolist()[1])
+    assert chunk["phone_number"].tolist() == ["+442012345678", "+15551234567"]
+    assert chunk["domain"].tolist() == ["cafex.com", "cafe-y.co.uk"]
+
+
+def test_dedupe_key_prefers_place_id_then_name_and_anchor():
+    chunk = clean_chunk(pd.DataFrame({
+        "title": ["Cafe X", "Café-X!", "Cafe X", "Not Available"],
+        "phone_number": ["555 1234", "Not Available", "Not Available", "Not Available"],
+        "webpage": ["Not Available", "Not Available", "http://cafex.com", "Not Available"],
+        "place_id": ["0x1:0x2", "Not Available", "Not Available", "Not Available"]}, dtype=str))
+    keys = dedupe_key(chunk).tolist()
+    assert keys[0] == "p:0x1:0x2"
+    assert keys[2] == "k:cafe x|cafex.com"
+    assert pd.isna(keys[3])
+
+
+def test_consolidate_merges_newest_values(tmp_path):
+    old = tmp_path / "old.csv"
+    new = tmp_path / "new.csv"
+    pd.DataFrame({"title": ["Cafe X", "Bar Y"], "rating": ["4.0", "3.0"], "webpage": ["https://cafex.com", ""],
+                  "place_id": ["a", "b"]}).to_csv(old, index=False, encoding="utf-8-sig")
+    pd.DataFrame({"title": ["Cafe X", ""], "rating": ["4.5", ""], "webpage": ["Not Available", ""],
+                  "place_id": ["a", "Not Available"], "site_email": ["hi@cafex.com", ""]}).to_csv(
+        new, index=False, encoding="utf-8-sig")
+    output = tmp_path / "out.csv"
+    stats = consolidate([str(old), str(new)], str(output), chunk_size=1, partitions=3)
+    assert (stats["rows_in"], stats["rows_out"], stats["duplicates"], stats["rows_without_key"]) == (4, 2, 1, 1)
+    merged = pd.read_csv(output, encoding="utf-8-sig").set_index("place_id")
+    # The newer row wins, the older one only fills what the newer one is missing
+    assert merged.loc["a", "rating"] == 4.5
+    assert merged.loc["a", "webpage"] == "https://cafex.com"
+    assert merged.loc["a", "site_email"] == "hi@cafex.com"
+    assert list(merged.columns)[:3] == ["title", "rating", "webpage"]
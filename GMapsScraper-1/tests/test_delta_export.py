@@ -0,0 +1,69 @@
+from utils.delta_export import DeltaExporter
+from utils.place_record import Place
+from csv import DictReader
+from os.path import isfile
+
+
+def places(*place_ids, title="Cafe"):
+    return [Place(title=f"{title} {place_id}", place_id=place_id, query="cafes") for place_id in place_ids]
+
+
+def run(tmp_path, scraped, feed=None, completed=True, title="Cafe"):
+    # One scrape run: the records that were stored, the ids its feed listed to the end and whether it finished
+    exporter = DeltaExporter(str(tmp_path / "snapshot.sqlite"), output_path=str(tmp_path))
+    exporter.observe(places(*scraped, title=title))
+    if feed is not None:
+        exporter.feed_read("cafes", list(feed))
+    if completed:
+        exporter.complete_query("cafes")
+    return exporter, exporter.finish()
+
+
+def disappeared(exporter):
+    path = exporter.output_files["disappeared"]
+    if not isfile(path):
+        return []
+    with open(path, encoding="utf-8-sig") as file_handler:
+        return [row["place_id"] for row in DictReader(file_handler)]
+
+
+def test_first_run_adds_everything(tmp_path):
+    _, counts = run(tmp_path, ["a", "b"], feed=["a", "b"])
+    assert counts["added"] == 2 and counts["disappeared"] == 0
+
+
+def test_place_missing_from_a_fully_read_feed_disappears(tmp_path):
+    run(tmp_path, ["a", "b", "c"], feed=["a", "b", "c"])
+    exporter, counts = run(tmp_path, ["a"], feed=["a", "b"])
+    # b was listed but skipped (dedupe, failed visit), only c is really gone
+    assert counts["unchanged"] == 1
+    assert disappeared(exporter) == ["c"]
+
+
+def test_truncated_feed_marks_nothing_gone(tmp_path):
+    run(tmp_path, ["a", "b", "c"], feed=["a", "b", "c"])
+    exporter, counts = run(tmp_path, ["a"], feed=None)
+    assert counts["disappeared"] == 0
+    assert disappeared(exporter) == []
+
+
+def test_cancelled_query_marks_nothing_gone(tmp_path):
+    run(tmp_path, ["a", "b"], feed=["a", "b"])
+    _, counts = run(tmp_path, ["a"], feed=["a"], completed=False)
+    assert counts["disappeared"] == 0
+
+
+def test_changed_and_readded_places(tmp_path):
+    run(tmp_path, ["a", "b"], feed=["a", "b"])
+    run(tmp_path, ["a"], feed=["a"])
+    exporter, counts = run(tmp_path, ["a", "b"], feed=["a", "b"], title="Bar")
+    # b came back after it was marked gone, a got a new title
+    assert counts["added"] == 1 and counts["changed"] == 1
+    with open(exporter.output_files["changed"], encoding="utf-8-sig") as file_handler:
+        assert next(DictReader(file_handler))["changed_fields"] == "title"
+
+
+def test_records_without_place_id_are_skipped(tmp_path):
+    exporter = DeltaExporter(str(tmp_path / "snapshot.sqlite"), output_path=str(tmp_path))
+    exporter.observe([Place(title="No id", query="cafes")])
+    assert exporter.finish()["skipped"] == 1
@@ -0,0 +1,30 @@
+from utils.domain_router import DomainRouter
+
+
+def test_route_by_host_subdomain_and_any_tld():
+    router = DomainRouter()
+    assert router.route("https://www.facebook.com/cafex") == DomainRouter.SOCIAL
+    assert router.route("https://m.instagram.com/cafex/") == DomainRouter.SOCIAL
+    assert router.route("https://booksy.com/en-us/123") == DomainRouter.BOOKING
+    assert router.route("https://www.treatwell.co.uk/place/x") == DomainRouter.BOOKING
+    assert router.route("https://www.foodpanda.pk/restaurant/x") == DomainRouter.DIRECTORY
+    assert router.route("https://linktr.ee/cafex") == DomainRouter.AGGREGATOR
+    assert router.route("https://FACEBOOK.COM./cafex") == DomainRouter.SOCIAL
+
+
+def test_route_keeps_the_crawl_for_sites_and_missing_websites():
+    router = DomainRouter()
+    assert router.route("https://cafex.com/contact") == DomainRouter.SITE
+    # Only whole labels match, a business called notfacebook.com or yelpcafe.com is a site
+    assert router.route("https://notfacebook.com") == DomainRouter.SITE
+    assert router.route("https://yelpcafe.com") == DomainRouter.SITE
+    assert router.route("Not Available") == DomainRouter.SITE
+    assert router.route("") == DomainRouter.SITE
+    assert router.route(None) == DomainRouter.SITE
+
+
+def test_record_counts_avoided_fetches():
+    router = DomainRouter()
+    router.record(DomainRouter.SOCIAL, 3, 0)
+    router.record(DomainRouter.AGGREGATOR, 3, 1)
+    assert router.stats() == {"routed": {"social": 1, "aggregator": 1}, "fetches_avoided": 5}
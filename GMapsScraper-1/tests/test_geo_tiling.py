@@ -0,0 +1,123 @@
+import pytest
+
+from utils.geo_tiling import Tile, TiledSearch
+from utils.rate_controller import PageBlocked
+
+
+class FakeMaps:
+    # Stands in for GoogleMaps: feeds(url) lists a tile's links, scrape(link) reads a place
+    place_index = None
+
+    def __init__(self, feeds, scrape=None):
+        self.feeds = feeds
+        self.scrape = scrape or (lambda link: {"map_link": link})
+        self.stored = []
+        self.drivers = []
+        self.quit = []
+
+    def create_chrome_driver(self, **kwargs):
+        driver = object()
+        self.drivers.append(driver)
+        return driver
+
+    def recycle_if_needed(self, driver, **kwargs):
+        return driver
+
+    def quit_driver(self, driver):
+        self.quit.append(driver)
+
+    def pace(self, stop_flag=None):
+        return True
+
+    def collect_tile_links(self, driver, url, stop_flag=None, link_callback=None):
+        links = self.feeds(url)
+        for link in links:
+            link_callback(link)
+        return links
+
+    def scrape_place_url(self, driver, url, query):
+        return self.scrape(url)
+
+    def store_records(self, records):
+        self.stored.extend(records)
+
+
+def place(number: int) -> str:
+    return f"https://www.google.com/maps/place/P{number}/data=!4m7!3m6!1s0x{number}:0x1"
+
+
+def test_blocked_place_is_recorded_and_earlier_records_kept():
+    def scrape(link):
+        if link == place(2):
+            raise PageBlocked("sorry page")
+        return {"map_link": link}
+
+    maps_obj = FakeMaps(lambda url: [place(1), place(2), place(3)], scrape)
+    search = TiledSearch(lambda: maps_obj, "cafes", Tile(0, 0, 1, 1), workers=1, grid=1)
+    search.run()
+    assert len(search.errors) == 1 and "sorry page" in search.errors[0]
+    assert maps_obj.stored == [{"map_link": place(1)}]
+
+
+def test_blocked_listing_is_recorded():
+    def feeds(url):
+        raise PageBlocked("Blocked while listing")
+
+    search = TiledSearch(lambda: FakeMaps(feeds), "cafes", Tile(0, 0, 1, 1), workers=1, grid=2)
+    search.run()
+    assert len(search.errors) == 4
+
+
+def test_driver_recycled_before_a_block_is_the_one_quit():
+    class RecyclingMaps(FakeMaps):
+        def recycle_if_needed(self, driver, **kwargs):
+            return self.create_chrome_driver()
+
+    def scrape(link):
+        raise PageBlocked("sorry page")
+
+    maps_obj = RecyclingMaps(lambda url: [place(1)], scrape)
+    TiledSearch(lambda: maps_obj, "cafes", Tile(0, 0, 1, 1), workers=1, grid=1).run()
+    assert maps_obj.quit == [maps_obj.drivers[-1]]
+
+
+def test_tile_parsing_and_geometry():
+    tile = Tile.from_string("40.0,-74.0,41.0,-73.0")
+    assert tile.center == (40.5, -73.5)
+    assert tile.contains(40.2, -73.9) and not tile.contains(39.9, -73.5)
+    with pytest.raises(ValueError):
+        Tile.from_string("41.0,-74.0,40.0,-73.0")
+    with pytest.raises(ValueError):
+        Tile.from_string("a,b,c")
+
+    children = tile.subdivide()
+    assert [child.depth for child in children] == [1, 1, 1, 1]
+    assert (children[0].south, children[0].west, children[3].north, children[3].east) == (40.0, -74.0, 41.0, -73.0)
+    assert len(tile.grid(2, 3)) == 6
+    # Smaller tiles zoom in further, the zoom stays within what Maps accepts
+    assert children[0].zoom() == tile.zoom() + 1
+    assert Tile(0, 0, 1e-9, 1e-9).zoom() == 21
+    assert tile.to_url("pizza shops").startswith("https://www.google.com/maps/search/pizza+shops/@40.500000,-73.500000,")
+
+
+def test_full_tiles_split_and_overlapping_places_are_visited_once():
+    def feeds(url):
+        # The root tile is full, its four children share one place along their edges
+        if "@0.500000,0.500000," in url:
+            return [place(1), place(2), place(3)]
+        return [place(1), place(4)]
+
+    maps_obj = FakeMaps(feeds)
+    search = TiledSearch(lambda: maps_obj, "cafes", Tile(0, 0, 1, 1), workers=2, grid=1, tile_cap=3, max_depth=1)
+    assert search.run() == 4
+    assert (search.tiles_searched, search.tiles_split, search.errors) == (5, 1, [])
+    assert sorted(record["map_link"] for record in maps_obj.stored) == [place(1), place(2), place(3), place(4)]
+    # Every worker quits the browser it started
+    assert sorted(map(id, maps_obj.quit)) == sorted(map(id, maps_obj.drivers))
+
+
+def test_limit_stops_claiming_places():
+    maps_obj = FakeMaps(lambda url: [place(number) for number in range(10)])
+    search = TiledSearch(lambda: maps_obj, "cafes", Tile(0, 0, 1, 1), workers=1, grid=2, tile_cap=100, limit=3)
+    assert search.run() == 3
+    assert len(maps_obj.stored) == 3 and search.tiles_searched == 1
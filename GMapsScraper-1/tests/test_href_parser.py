@@ -0,0 +1,36 @@
+from utils.href_parser import HrefParser
+
+LISTING = ("https://www.google.com/maps/place/Cafe+X/data=!4m7!3m6!1s0x89c259a9b3117469:0xd134e199a405a163"
+           "!8m2!3d40.7580!4d-73.9855!16s%2Fg%2F11c1!19sChIJ1234abcd-_?authuser=0&hl=en")
+
+
+def test_parse_reads_pin_ids_and_slug():
+    parsed = HrefParser.parse(LISTING)
+    assert parsed["lat"] == "40.7580"
+    assert parsed["long"] == "-73.9855"
+    assert parsed["place_id"] == "0x89c259a9b3117469:0xd134e199a405a163"
+    assert parsed["slug"] == "Cafe X"
+    assert parsed["map_link"] == LISTING.split("?")[0]
+
+
+def test_parse_falls_back_to_viewport_centre():
+    parsed = HrefParser.parse("https://www.google.com/maps/place/Cafe+X/@51.5,-0.12,17z")
+    assert (parsed["lat"], parsed["long"]) == ("51.5", "-0.12")
+    assert parsed["place_id"] == "Not Available"
+
+
+def test_parse_ignores_non_maps_links():
+    assert set(HrefParser.parse("https://example.com/", "n/a").values()) == {"n/a"}
+    assert set(HrefParser.parse("", "n/a").values()) == {"n/a"}
+
+
+def test_place_key_prefers_feature_id_then_place_id_then_url():
+    assert HrefParser.place_key(LISTING) == "0x89c259a9b3117469:0xd134e199a405a163"
+    assert HrefParser.place_key("https://maps.google.com/maps/place/X/data=!19sChIJabc") == "ChIJabc"
+    assert HrefParser.place_key("https://maps.google.com/maps/place/X?hl=en") == "https://maps.google.com/maps/place/X"
+    assert HrefParser.place_key("https://maps.google.com/maps/place/X", "") == ""
+
+
+def test_coordinates():
+    assert HrefParser.coordinates(LISTING) == (40.758, -73.9855)
+    assert HrefParser.coordinates("https://maps.google.com/maps/place/X") is None
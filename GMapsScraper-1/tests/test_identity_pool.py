@@ -0,0 +1,50 @@
+from threading import Thread
+
+import pytest
+
+from utils.cancellation import ScrapeCancelled
+from utils.identity_pool import IdentityPool
+from utils.rate_controller import AdaptiveRateController
+
+AGENTS = ["Mozilla/5.0 (Windows NT 10.0) Chrome/116.0", "Mozilla/5.0 (Macintosh) Chrome/116.0",
+          "Mozilla/5.0 (X11; Linux x86_64) Chrome/116.0"]
+
+
+def test_identities_spread_over_proxies_and_fingerprints_follow_the_agent():
+    pool = IdentityPool(user_agents=AGENTS, proxies=["http://a:1", " ", "http://b:2"])
+    identities = [pool.acquire() for _ in AGENTS]
+    assert [identity.proxy for identity in identities] == ["http://a:1", "http://b:2", "http://a:1"]
+    assert [identity.platform for identity in identities] == ["Win32", "MacIntel", "Linux x86_64"]
+
+
+def test_blocked_identities_go_last_and_retire_after_the_block_limit():
+    pool = IdentityPool(user_agents=AGENTS[:2], block_limit=2)
+    first, second = pool.acquire(), pool.acquire()
+    pool.attach("driver-1", first)
+    pool.attach("driver-2", second)
+    pool.report("driver-1", AdaptiveRateController.OK)
+    pool.report("driver-2", AdaptiveRateController.BLOCKED)
+    assert not pool.is_retired("driver-2")
+    pool.report("driver-2", AdaptiveRateController.BLOCKED)
+    assert pool.is_retired("driver-2")
+
+    pool.release("driver-1")
+    pool.release("driver-2")
+    # The identity with no blocks is handed out first, the retired one only while it is the last idle one
+    assert pool.acquire() is first
+    assert pool.acquire() is second
+    assert {row["identity"]: row["blocks"] for row in pool.stats()} == {first.key: 0, second.key: 2}
+
+
+def test_acquire_waits_for_a_release_and_honours_stop():
+    pool = IdentityPool(user_agents=AGENTS[:1])
+    identity = pool.acquire()
+    with pytest.raises(ScrapeCancelled):
+        pool.acquire(stop_flag=lambda: True, poll_interval=0.01)
+
+    acquired = []
+    waiter = Thread(target=lambda: acquired.append(pool.acquire(poll_interval=0.01)))
+    waiter.start()
+    pool.discard(identity)
+    waiter.join(timeout=5)
+    assert acquired == [identity]
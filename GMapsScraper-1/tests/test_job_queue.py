@@ -0,0 +1,97 @@
+from multiprocessing import get_context
+
+from utils.job_queue import JobQueue
+import utils.job_queue as job_queue_module
+
+
+def test_add_skips_duplicates_and_blank_queries(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    assert queue.add(["cafes", "cafes", " ", "bars"]) == 2
+    assert queue.add(["cafes"], {"bbox": "1,2,3,4"}) == 1
+    assert queue.counts()[JobQueue.PENDING] == 3
+
+
+def test_lease_complete_and_owner_guard(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.add(["cafes"])
+    job = queue.lease("worker-1")
+    assert job["query"] == "cafes" and job["attempts"] == 1 and job["payload"] == {}
+    assert queue.lease("worker-2") is None
+    assert not queue.complete(job["id"], "worker-2", 5)
+    assert queue.complete(job["id"], "worker-1", 5)
+    assert queue.counts()[JobQueue.DONE] == 1
+
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"), max_attempts=2)
+    queue.add(["cafes"])
+    job = queue.lease("worker")
+    assert queue.fail(job["id"], "worker", "blocked")
+    assert queue.counts()[JobQueue.PENDING] == 1
+    job = queue.lease("worker")
+    assert job["attempts"] == 2
+    queue.fail(job["id"], "worker", "blocked")
+    assert queue.counts()[JobQueue.FAILED] == 1
+    assert queue.lease("worker") is None
+    assert queue.retry_failed() == 1
+    assert queue.lease("worker")["attempts"] == 1
+
+
+def test_release_gives_the_attempt_back(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.add(["cafes"])
+    job = queue.lease("worker")
+    assert queue.release(job["id"], "worker")
+    assert queue.lease("worker")["attempts"] == 1
+
+
+def test_expired_lease_is_taken_over_then_failed(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_queue_module, "time", lambda: now[0])
+    queue = JobQueue(str(tmp_path / "queue.sqlite"), max_attempts=2)
+    queue.add(["cafes"])
+    job = queue.lease("worker-1", lease_seconds=10)
+
+    now[0] += 11
+    taken_over = queue.lease("worker-2", lease_seconds=10)
+    assert taken_over["id"] == job["id"] and taken_over["attempts"] == 2
+    # The first worker's lease is gone, it can't finish the job any more
+    assert not queue.complete(job["id"], "worker-1")
+
+    now[0] += 11
+    assert queue.lease("worker-3") is None
+    assert queue.counts()[JobQueue.FAILED] == 1
+
+
+def lease_until_empty(path: str, owner: str, leased) -> None:
+    # Module level so spawned processes can import it
+    queue = JobQueue(path)
+    while (job := queue.lease(owner)) is not None:
+        leased.put(job["id"])
+        assert queue.complete(job["id"], owner, 1)
+    leased.put(None)
+
+
+def test_processes_sharing_one_file_never_lease_a_job_twice(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = JobQueue(path)
+    queue.add([f"query {index}" for index in range(60)])
+
+    context = get_context("spawn")
+    leased = context.Queue()
+    workers = [context.Process(target=lease_until_empty, args=(path, f"worker-{index}", leased)) for index in range(4)]
+    for worker in workers:
+        worker.start()
+    ids, finished = [], 0
+    while finished < len(workers):
+        job_id = leased.get(timeout=60)
+        if job_id is None:
+            finished += 1
+        else:
+            ids.append(job_id)
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    assert len(ids) == len(set(ids)) == 60
+    assert queue.counts()[JobQueue.DONE] == 60
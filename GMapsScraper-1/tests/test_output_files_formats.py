@@ -0,0 +1,32 @@
+from csv import DictReader
+from threading import Lock
+
+from utils.output_files_formats import CSVCreator, migrate_csv_header
+from utils.place_record import Place
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as file_handler:
+        return list(DictReader(file_handler))
+
+
+def test_older_header_is_rewritten_before_appending(tmp_path):
+    path = tmp_path / "google_maps_data.csv"
+    path.write_text("title,map_link,cover_image\nOld Cafe,https://maps/old,img.png\n", encoding="utf-8-sig")
+
+    CSVCreator(Lock(), output_path=str(tmp_path), unavailable_text="n/a").create_csv([Place(title="New Cafe")])
+
+    rows = read_rows(path)
+    assert list(rows[0]) == [*Place.fields, "cover_image"]
+    assert (rows[0]["title"], rows[0]["map_link"], rows[0]["rating"], rows[0]["cover_image"]) == \
+        ("Old Cafe", "https://maps/old", "n/a", "img.png")
+    assert (rows[1]["title"], rows[1]["cover_image"]) == ("New Cafe", "n/a")
+    assert not (tmp_path / "google_maps_data.csv.tmp").exists()
+
+
+def test_matching_or_wider_header_is_kept(tmp_path):
+    path = tmp_path / "reviews.csv"
+    path.write_text("b,a,c\n1,2,3\n", encoding="utf-8")
+    assert migrate_csv_header(str(path), ("a", "b")) == ("b", "a", "c")
+    assert path.read_text(encoding="utf-8") == "b,a,c\n1,2,3\n"
+    assert migrate_csv_header(str(tmp_path / "missing.csv"), ["a"]) == ("a",)
@@ -0,0 +1,58 @@
+from utils.page_archive import PageArchive, PageExtractor
+from utils.domain_router import DomainRouter
+from utils.page_patterns import PagePatterns
+import pytest
+
+PLACE_PAGE = """<html><body><div id="QA0Szd"><div><div><div class="w6VYqd"><div class="bJzME tTVLSc"><div>
+<div class="e07Vkf kA9KIf"><div><div><div class="TIHn2"><div><div class="lMbq3e">
+  <div><h1> Cafe X </h1></div>
+  <div class="LBgpqf"><div><div class="fontBodyMedium dmRWX"><div class="F7nice">
+    <span><span>4.5</span></span><span><span><span aria-label="1,234 reviews">(1,234)</span></span></span>
+  </div></div></div></div>
+</div></div></div></div></div></div></div></div></div></div></div>
+<div class="UCw5gc"><div><div><a data-tooltip="Open website" href="{website}">site</a></div></div></div>
+<div class="rogA2c"><div>12 Main St</div></div><div class="rogA2c"><div>+1 (555) 123-4567</div></div>
+</body></html>"""
+
+
+def test_archive_deduplicates_blobs_and_lists_latest_place(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"))
+    first = archive.put("place", "https://maps/x", "<html>1</html>", place_id="x", query="cafes")
+    assert archive.put("place", "https://maps/x", "<html>1</html>", place_id="x", query="cafes") == first
+    latest = archive.put("place", "https://maps/x", "<html>2</html>", place_id="x", query="cafes")
+    archive.put("contact", "https://x.com/contact", "<p>hi</p>", place_id="x")
+    assert archive.get(latest) == "<html>2</html>"
+    assert archive.stats() == {"pages": 3, "blobs": 3}
+    [place] = archive.places()
+    assert place["digest"] == latest and len(place["contacts"]) == 1
+
+
+def test_place_fields_follow_the_shared_selectors():
+    pytest.importorskip("lxml")
+    fields = PageExtractor().place_fields(PLACE_PAGE.format(website="https://cafex.com"))
+    assert fields == {"title": "Cafe X", "rating": "4.5", "review_count": "1,234 reviews",
+                      "webpage": "https://cafex.com", "phone_number": "+1 (555) 123-4567"}
+    assert PageExtractor().place_fields("<html><body><p>nothing</p></body></html>")["title"] is None
+
+
+def test_emails_prefer_links_and_skip_image_names():
+    pytest.importorskip("lxml")
+    html = ('<p>Write to sales@cafex.com, see logo@2x.png</p>'
+            '<a href="mailto:Boss@cafex.com?subject=hi">mail</a>')
+    assert PageExtractor().emails(html) == ["Boss@cafex.com", "sales@cafex.com"]
+    # Cloudflare protected address: key 0x42 XORed over "a@b.co"
+    encoded = "42" + "".join(f"{ord(character) ^ 0x42:02x}" for character in "a@b.co")
+    assert PagePatterns.emails("", [f"/cdn-cgi/l/email-protection#{encoded}", "/cdn-cgi/l/email-protection#zz"]) == \
+        ["a@b.co"]
+
+
+def test_website_data_keeps_socials_like_the_live_scraper():
+    pytest.importorskip("lxml")
+    extractor, router = PageExtractor("n/a"), DomainRouter()
+    assert extractor.website_data("https://facebook.com/cafex", [], router) == \
+        {"site_email": "n/a", "socials": ("https://facebook.com/cafex",)}
+    linktree = extractor.website_data("https://linktr.ee/cafex",
+                                      ['<a href="https://instagram.com/cafex">ig</a> hi@cafex.com'], router)
+    assert linktree == {"site_email": "hi@cafex.com",
+                        "socials": ("https://linktr.ee/cafex", "https://instagram.com/cafex")}
+    assert extractor.website_data("https://cafex.com", ["<p>no address</p>"], router) == {"site_email": "n/a"}
@@ -0,0 +1,48 @@
+import pytest
+
+from utils.cancellation import ScrapeCancelled
+from utils.page_state import PageState
+
+
+class FakePage:
+    # Answers the probe with one prepared result per call, the last one repeats
+    def __init__(self, *probes):
+        self.probes = list(probes)
+
+    def execute_script(self, script, *args):
+        probe = self.probes.pop(0) if len(self.probes) > 1 else self.probes[0]
+        if isinstance(probe, Exception):
+            raise probe
+        return probe
+
+
+def test_from_probe():
+    maps = "https://www.google.com/maps/search/cafes"
+    assert PageState.from_probe(maps, True, False, True, "") == PageState.PLACE
+    assert PageState.from_probe(maps, False, True, True, "") == PageState.FEED
+    assert PageState.from_probe("https://www.google.com/sorry/index", False, False, False, "") == PageState.BLOCKED
+    assert PageState.from_probe("https://consent.google.com/ml", False, False, False, "") == PageState.CONSENT
+    assert PageState.from_probe(maps, False, False, True, "Google Maps can't find cafes") == PageState.EMPTY
+    # The empty markers only count on a search URL
+    assert PageState.from_probe("https://www.google.com/maps", False, False, True, "No results found") == \
+        PageState.SEARCH
+    assert PageState.from_probe("about:blank", False, False, False, "") == PageState.LOADING
+
+
+def test_classify_treats_script_errors_as_loading():
+    assert PageState.classify(FakePage(RuntimeError("no such window"))) == PageState.LOADING
+
+
+def test_wait_for_polls_until_a_wanted_state():
+    page = FakePage(["about:blank", False, False, False, ""], RuntimeError("navigating"),
+                    ["https://www.google.com/maps/place/x", True, False, True, ""])
+    assert PageState.wait_for(page, (PageState.PLACE,), timeout=5, poll_interval=0) == PageState.PLACE
+    # Out of time it returns whatever the page showed last
+    assert PageState.wait_for(FakePage(["about:blank", False, False, False, ""]), (PageState.PLACE,),
+                              timeout=0) == PageState.LOADING
+
+
+def test_wait_for_stops_on_the_stop_flag():
+    with pytest.raises(ScrapeCancelled):
+        PageState.wait_for(FakePage(["about:blank", False, False, False, ""]), (PageState.PLACE,), timeout=5,
+                           stop_flag=lambda: True, poll_interval=0)
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+import utils.place_iterator as place_iterator_module
+from utils.place_iterator import aiter_places
+
+
+def test_async_iterator_streams_places_and_closes_the_scrape(monkeypatch):
+    closed = []
+
+    def iter_places(query, **options):
+        try:
+            for index in range(3):
+                yield {"title": f"{query} {index}", "limit": options["limit"]}
+        finally:
+            closed.append(query)
+
+    monkeypatch.setattr(place_iterator_module, "iter_places", iter_places)
+
+    async def consume():
+        titles = []
+        async with aiter_places("cafes", limit=3) as places:
+            async for place in places:
+                titles.append(place["title"])
+                if len(titles) == 2:
+                    break
+        return titles
+
+    assert asyncio.run(consume()) == ["cafes 0", "cafes 1"]
+    assert closed == ["cafes"]
+
+
+def test_iter_places_quits_the_browser_when_the_consumer_stops(tmp_path, monkeypatch):
+    pytest.importorskip("selenium")
+    pytest.importorskip("selenium_stealth")
+    pytest.importorskip("psutil")
+    from utils.google_maps_scraper import GoogleMaps
+
+    quit_drivers = []
+    monkeypatch.setattr(GoogleMaps, "create_chrome_driver", lambda self: "driver")
+    monkeypatch.setattr(GoogleMaps, "quit_driver", lambda self, driver: quit_drivers.append(driver))
+    monkeypatch.setattr(GoogleMaps, "iter_query_places",
+                        lambda self, driver, query: iter([{"title": "a"}, {"title": "b"}]))
+
+    places = place_iterator_module.iter_places("cafes", driver_path="chromedriver", output_path=str(tmp_path))
+    assert next(places) == {"title": "a"}
+    places.close()
+    assert quit_drivers == ["driver"]
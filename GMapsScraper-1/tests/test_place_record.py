@@ -0,0 +1,46 @@
+from utils.href_parser import HrefParser
+from utils.place_record import Place, serialize_place
+
+
+def test_from_scrape_types_fields_and_drops_placeholders():
+    place = Place.from_scrape("Not Available", title="Cafe X", rating="4,5", review_count="1,234 reviews",
+                              lat="40.758", long="-73.9855", webpage="Not Available", unknown="ignored")
+    assert place.rating == 4.5
+    assert place.review_count == 1234
+    assert (place.lat, place.long) == (40.758, -73.9855)
+    assert place.webpage is None
+    assert Place.from_scrape("n/a", rating="n/a", review_count="none").review_count is None
+
+
+def test_from_scrape_keeps_the_href_fields():
+    href = "https://www.google.com/maps/place/Cafe+X/data=!4m7!3m6!1s0x1:0x2!8m2!3d40.758!4d-73.9855!16s"
+    place = Place.from_scrape("n/a", title="Cafe X", **HrefParser.parse(href, "n/a"))
+    assert (place.place_id, place.slug) == ("0x1:0x2", "Cafe X")
+    assert set(HrefParser.fields) <= set(Place.fields)
+
+
+def test_mapping_interface():
+    place = Place(title="Cafe X")
+    place["site_email"] = "hi@cafex.com"
+    place.update({"phone_number": "555"})
+    assert place["site_email"] == "hi@cafex.com"
+    assert place.get("webpage", "none") == "none"
+    assert place.setdefault("webpage", "https://cafex.com") == "https://cafex.com"
+    assert tuple(place.keys()) == Place.fields
+    try:
+        place["nope"] = 1
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("unknown field was accepted")
+
+
+def test_to_dict_joins_socials_and_fills_missing():
+    place = Place(title="Cafe X", socials=("https://instagram.com/x", "https://facebook.com/x"), query="cafes")
+    row = place.to_dict("n/a")
+    assert list(row) == list(Place.fields)
+    assert row["socials"] == "https://instagram.com/x | https://facebook.com/x"
+    assert row["webpage"] == "n/a"
+    assert Place(title="Y").to_dict("n/a")["socials"] == "n/a"
+    assert serialize_place(place, "n/a") == row
+    assert serialize_place({"title": "Z"}) == {"title": "Z"}
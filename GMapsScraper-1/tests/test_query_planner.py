@@ -0,0 +1,54 @@
+from utils.query_planner import QueryPlanner
+import pytest
+
+
+def test_makespan_longest_first():
+    # 5+3 and 4+3+3, the greedy schedule and not the optimum (9)
+    assert QueryPlanner.makespan([5, 4, 3, 3, 3], 2) == 10
+    assert QueryPlanner.makespan([4, 3, 2], 3) == 4
+    assert QueryPlanner.makespan([], 3) == 0
+    assert QueryPlanner.makespan([2, 2], 0) == 4
+
+
+def test_plan_uses_history_probe_and_default(tmp_path):
+    planner = QueryPlanner(str(tmp_path / "history.sqlite"), default_places=10, default_seconds_per_place=2.0)
+    planner.record_query("known", 100, 300.0)
+    probed = []
+    plan = planner.plan(["new", "known"], workers=2, probe=lambda query: probed.append(query) or 20)
+    assert probed == ["new"]
+    sources = {entry[0]: entry[3] for entry in plan.entries}
+    assert sources == {"known": "history", "new": "probe"}
+    # Three seconds a place learnt from history, longest query first
+    assert plan.queries == ["known", "new"]
+    assert plan.entries[1][2] == pytest.approx(60.0)
+    assert planner.plan(["other"], workers=1).entries[0][3] == "default"
+
+
+def test_plan_splits_a_query_longer_than_a_fair_share(tmp_path):
+    planner = QueryPlanner(str(tmp_path / "history.sqlite"))
+    planner.record_query("big", 120, 600.0)
+    planner.record_query("small", 10, 50.0)
+    plan = planner.plan(["big", "small"], workers=4)
+    assert plan.chunks("big") == 4
+    assert plan.chunks("small") == 1
+    assert plan.chunks("missing") == 1
+    assert planner.plan(["big", "small"], workers=4, split=False).chunks("big") == 1
+
+
+def test_limit_caps_places_and_seconds(tmp_path):
+    planner = QueryPlanner(str(tmp_path / "history.sqlite"))
+    planner.record_query("big", 200, 1000.0)
+    _, places, seconds, _, _ = planner.plan(["big"], workers=1, limit=50).entries[0]
+    assert (places, seconds) == (50, 250.0)
+
+
+def test_history_is_smoothed_and_runs_calibrate(tmp_path):
+    planner = QueryPlanner(str(tmp_path / "history.sqlite"), smoothing=0.5)
+    planner.record_query("q", 100, 100.0)
+    planner.record_query("q", 200, 300.0)
+    assert planner.history(["q"]) == {"q": (150.0, 200.0)}
+    plan = planner.plan(["q"], workers=1)
+    assert planner.calibration() == 1.0
+    planner.record_run(plan, plan.raw_makespan * 2)
+    assert planner.calibration() == pytest.approx(2.0)
+    assert planner.plan(["q"], workers=1).predicted_makespan == pytest.approx(400.0)
@@ -0,0 +1,64 @@
+from utils.rate_controller import AdaptiveRateController
+import utils.rate_controller as rate_controller_module
+
+
+def fake_clock(monkeypatch, start: float = 1000.0) -> list:
+    now = [start]
+    monkeypatch.setattr(rate_controller_module, "monotonic", lambda: now[0])
+    return now
+
+
+def test_classify_page():
+    assert AdaptiveRateController.classify_page("https://www.google.com/sorry/index") == AdaptiveRateController.BLOCKED
+    assert AdaptiveRateController.classify_page("", "Our systems have detected Unusual Traffic") == \
+        AdaptiveRateController.BLOCKED
+    assert AdaptiveRateController.classify_page("https://consent.google.com/m") == AdaptiveRateController.CONSENT
+    assert AdaptiveRateController.classify_page("https://www.google.com/maps") == AdaptiveRateController.OK
+
+
+def test_ok_ramps_up_to_max_rate():
+    controller = AdaptiveRateController(initial_rate=1.0, max_rate=1.25, additive_step=0.1)
+    controller.report(AdaptiveRateController.OK)
+    assert controller.rate == 1.1
+    for _ in range(10):
+        controller.report(AdaptiveRateController.OK)
+    assert controller.rate == 1.25
+
+
+def test_blocks_halve_the_rate_and_double_the_cooldown(monkeypatch):
+    now = fake_clock(monkeypatch)
+    controller = AdaptiveRateController(initial_rate=4.0, block_cooldown=30.0, block_window=300.0)
+    controller.report(AdaptiveRateController.BLOCKED)
+    assert controller.rate == 2.0 and controller._blocked_until == 1030.0
+
+    # A late report from a request already in flight doesn't cut again
+    controller.report(AdaptiveRateController.BLOCKED)
+    assert controller.rate == 2.0
+
+    now[0] = 1100.0
+    controller.report(AdaptiveRateController.BLOCKED)
+    assert controller.rate == 1.0 and controller._blocked_until == 1160.0
+
+    # Past the block window the episode is over and the cooldown starts from scratch
+    now[0] = 1500.0
+    controller.report(AdaptiveRateController.BLOCKED)
+    assert controller._blocked_until == 1530.0
+    assert controller.stats()[AdaptiveRateController.BLOCKED] == 4
+
+
+def test_timeouts_only_slow_down_past_the_threshold():
+    controller = AdaptiveRateController(initial_rate=2.0, additive_step=0.0, timeout_threshold=0.3)
+    for signal in ("ok", "ok", "ok", "ok", "timeout"):
+        controller.report(signal)
+    assert controller.rate == 2.0
+    controller.report(AdaptiveRateController.TIMEOUT)
+    assert controller.rate == 1.0
+
+
+def test_acquire_gives_up_on_stop_during_a_cooldown(monkeypatch):
+    fake_clock(monkeypatch)
+    monkeypatch.setattr(rate_controller_module, "sleep", lambda seconds: None)
+    controller = AdaptiveRateController(initial_rate=1.0)
+    assert controller.acquire()
+    controller.report(AdaptiveRateController.BLOCKED)
+    assert not controller.acquire(stop_flag=lambda: True)
@@ -0,0 +1,21 @@
+from datetime import date
+
+from utils.review_scraper import ReviewScraper
+
+
+def test_review_date_from_relative_age():
+    today = date(2026, 10, 19)
+    assert ReviewScraper.review_date("a week ago", today) == date(2026, 10, 12)
+    assert ReviewScraper.review_date("3 months ago", today) == date(2026, 7, 21)
+    assert ReviewScraper.review_date("An hour ago", today) == today
+    assert ReviewScraper.review_date("Edited 2 years ago", today) == date(2024, 10, 19)
+    assert ReviewScraper.review_date("last summer", today) is None
+    assert ReviewScraper.review_date("", today) is None
+
+
+def test_rating_from_star_label():
+    assert ReviewScraper._rating("5 stars") == 5.0
+    assert ReviewScraper._rating("4,5 Sterne") == 4.5
+    assert ReviewScraper._rating("Rated 3.0 out of 5") == 3.0
+    assert ReviewScraper._rating("") is None
+    assert ReviewScraper._rating(None) is None
@@ -0,0 +1,57 @@
+from utils.spatial_index import PlaceIndex
+
+
+def test_same_place_id_is_a_duplicate():
+    index = PlaceIndex()
+    assert index.check_and_add("a", 40.0, -73.0, "Cafe X") is None
+    assert index.check_and_add("a") == "a"
+    assert index.duplicates["place_id"] == 1
+    assert len(index) == 1
+
+
+def test_similar_name_close_by_is_a_duplicate():
+    index = PlaceIndex(radius_m=50)
+    index.check_and_add("a", 40.0, -73.0, "Pizza Hut")
+    # About 11m north, the longer name still contains every token of the first one
+    assert index.check_and_add("b", 40.0001, -73.0, "The Pizza Hut Delivery") == "a"
+    assert index.duplicates["nearby_name"] == 1
+
+
+def test_far_away_or_different_name_is_new():
+    index = PlaceIndex(radius_m=50)
+    index.check_and_add("a", 40.0, -73.0, "Cafe 5")
+    # About 1.1km away
+    assert index.check_and_add("b", 40.01, -73.0, "Cafe 5") is None
+    assert index.check_and_add("c", 40.0001, -73.0, "Cafe 50") is None
+    assert len(index) == 3
+
+
+def test_one_shared_word_close_by_is_new():
+    index = PlaceIndex(radius_m=50)
+    index.check_and_add("a", 40.0, -73.0, "Cafe")
+    assert index.check_and_add("b", 40.0001, -73.0, "Cafe Milano") is None
+    assert index.check_and_add("c", 40.0001, -73.0, "Cafe") == "a"
+
+
+def test_name_key_drops_noise_and_accents():
+    assert PlaceIndex.name_key("Café & Co. Ltd") == "cafe"
+    assert PlaceIndex.name_key("") == ""
+
+
+def test_phone_matches_only_nearby_listing():
+    index = PlaceIndex(phone_radius_m=500)
+    assert index.check_phone("a", "+1 (555) 123-4567", 40.0, -73.0) is None
+    assert index.check_phone("b", "555 123 4567", 40.001, -73.0) == "a"
+    # A branch of the same chain across town keeps its own listing
+    assert index.check_phone("c", "5551234567", 40.1, -73.0) is None
+    assert index.check_phone("d", "123", 40.0, -73.0) is None
+    assert index.check_phone("a", "+1 (555) 123-4567", 40.0, -73.0) is None
+
+
+def test_find_duplicate_does_not_index():
+    index = PlaceIndex(radius_m=50)
+    assert index.find_duplicate("a", 40.0, -73.0, "Cafe X") is None
+    assert index.find_duplicate("a", 40.0, -73.0, "Cafe X") is None
+    assert len(index) == 0
+    index.check_and_add("a", 40.0, -73.0, "Cafe X")
+    assert index.find_duplicate("b", 40.0001, -73.0, "Cafe X") == "a"
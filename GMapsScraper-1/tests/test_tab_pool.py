@@ -0,0 +1,56 @@
+from utils.page_state import PageState
+from utils.tab_pool import TabPool
+
+PLACE = "https://www.google.com/maps/place/Cafe+X/data=!4m7!3m6!1s0x1:0x2"
+
+
+class FakeDriver:
+    # Tabs as dicts, a navigation only shows up once commit() is called like a slow page would
+    def __init__(self):
+        self.windows = {"main": {"url": PLACE, "released": False, "pending": None}}
+        self.current_window_handle = "main"
+        self.switch_to = self
+
+    @property
+    def window_handles(self):
+        return list(self.windows)
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    def close(self):
+        del self.windows[self.current_window_handle]
+
+    def commit(self, handle):
+        window = self.windows[handle]
+        window.update(url=window["pending"], released=False, pending=None)
+
+    def execute_script(self, script, *args):
+        if script.startswith("window.open('about:blank'"):
+            self.windows[args[0]] = {"url": "about:blank", "released": False, "pending": None}
+        elif script.startswith("window.open("):
+            self.windows[args[1]]["pending"] = args[0]
+        elif script == TabPool._release_script:
+            self.windows[self.current_window_handle]["released"] = True
+        else:
+            window = self.windows[self.current_window_handle]
+            if window["released"] and "__gmReleased" in script:
+                return None
+            return [window["url"], "/maps/place/" in window["url"], False, True, ""]
+
+
+def test_same_place_again_is_loading_until_the_navigation_commits():
+    driver = FakeDriver()
+    pool = TabPool(driver, size=1)
+    assert pool.load(PLACE, "first")
+    assert pool._classify("gm-tab-0") == PageState.LOADING
+    driver.commit("gm-tab-0")
+    assert pool.next_ready(timeout=1) == ("gm-tab-0", "first", PageState.PLACE)
+    pool.release("gm-tab-0")
+    assert driver.current_window_handle == "main"
+
+    # Revisiting the place it was released with must not count as settled before the tab navigated
+    assert pool.load(PLACE, "second")
+    assert pool._classify("gm-tab-0") == PageState.LOADING
+    driver.commit("gm-tab-0")
+    assert pool._classify("gm-tab-0") == PageState.PLACE
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("selenium_stealth")
+pytest.importorskip("psutil")
+
+from selenium.common.exceptions import TimeoutException
+from utils.google_maps_scraper import GoogleMaps
+from utils.threading_controller import FastSearchAlgo
+from utils.job_queue import JobQueue
+from utils.place_record import Place
+
+HREF = "https://www.google.com/maps/place/Cafe+X/data=!4m7!3m6!1s0x1:0x2!8m2!3d40.0!4d-73.0!16s"
+
+
+def test_failed_job_finds_its_places_again_on_retry(tmp_path, monkeypatch):
+    attempts = []
+
+    def start_scrapper(self, query, update_callback, stop_flag, raise_errors=False):
+        # The listing is seen on every attempt, the first one fails before its visit finishes
+        listed = not self.is_duplicate_listing(HREF, "Cafe X")
+        attempts.append(listed)
+        if len(attempts) == 1:
+            raise TimeoutException("place page never settled")
+        place = Place.from_scrape("Not Available", title="Cafe X", lat=40.0, long=-73.0, query=query)
+        if listed and not self.is_duplicate_place(HREF, place):
+            update_callback(1)
+
+    monkeypatch.setattr(GoogleMaps, "start_scrapper", start_scrapper)
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.add(["cafes"])
+    algo = FastSearchAlgo(driver_path="", output_path=str(tmp_path), verbose=False, workers=1)
+    algo.queue_search_algorithm(queue, lambda count: None, lambda: False)
+
+    assert attempts == [True, True]
+    assert queue.counts()[JobQueue.DONE] == 1
+    row = queue._connection().execute("SELECT results, attempts FROM jobs").fetchone()
+    assert (row["results"], row["attempts"]) == (1, 2)
@@ -0,0 +1,250 @@
+from utils.web_site_scraper import PatternScraper
+from utils.domain_router import DomainRouter
+from urllib.parse import urlparse, urljoin
+from collections import defaultdict
+from time import perf_counter
+import asyncio
+import logging
+import socket
+import zlib
+import ssl
+
+
+class FetchError(Exception):
+    pass
+
+
+class AsyncSiteEnricher:
+    _user_agent = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                   "Chrome/116.0.0.0 Safari/537.36")
+    _redirect_codes = {301, 302, 303, 307, 308}
+
+    def __init__(self, suggested_ext: list = None, unavailable_text: str = "Not Available", max_in_flight: int = 64,
+                 per_host: int = 4, connect_timeout: float = 5, read_timeout: float = 10,
+                 max_response_bytes: int = 2 * 1024 * 1024, max_redirects: int = 3, verify_ssl: bool = True,
+                 host_overrides: dict = None, source_sink=None, domain_router: DomainRouter = None) -> None:
+        self._suggested_ext = suggested_ext or []
+        self._unavailable_text = unavailable_text
+        self._max_in_flight = max_in_flight
+        self._per_host = per_host
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._max_response_bytes = max_response_bytes
+        self._max_redirects = max_redirects
+        self._pattern_scraper = PatternScraper()
+        # Called with (record, url, html) for every page fetched, used to archive contact pages
+        self._source_sink = source_sink
+        self._domain_router = domain_router or DomainRouter()
+
+        self._ssl_context = ssl.create_default_context()
+        if not verify_ssl:
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+
+        # host -> resolved address, pre-seeded entries skip DNS entirely (used by the local benchmark)
+        self._dns_cache = dict(host_overrides or {})
+        self._dns_pending = {}
+        self._global_slots = None
+        self._host_slots = None
+        self.stats = defaultdict(int)
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    async def _resolve(self, host: str, port: int) -> str:
+        if host in self._dns_cache:
+            return self._dns_cache[host]
+
+        # Concurrent lookups of the same host share one getaddrinfo call
+        if host not in self._dns_pending:
+            loop = asyncio.get_running_loop()
+            self._dns_pending[host] = loop.create_task(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+        try:
+            infos = await asyncio.wait_for(asyncio.shield(self._dns_pending[host]), self._connect_timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise FetchError(f"DNS lookup failed for {host}: {e}")
+        finally:
+            if host in self._dns_pending and self._dns_pending[host].done():
+                self._dns_pending.pop(host, None)
+
+        address = infos[0][4][0]
+        self._dns_cache[host] = address
+        return address
+
+    @staticmethod
+    def _dechunk(body: bytes) -> bytes:
+        decoded = bytearray()
+        while body:
+            size_line, _, body = body.partition(b"\r\n")
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError:
+                break
+            if size == 0:
+                break
+            decoded += body[:size]
+            body = body[size + 2:]
+        return bytes(decoded)
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> tuple[int, dict, bytes]:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self._read_timeout)
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        status = int(status_line.split(" ", 2)[1])
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        body = bytearray()
+        while len(body) < self._max_response_bytes:
+            chunk = await asyncio.wait_for(reader.read(65536), self._read_timeout)
+            if not chunk:
+                break
+            body += chunk
+
+        if len(body) >= self._max_response_bytes:
+            self.stats["truncated"] += 1
+            del body[self._max_response_bytes:]
+
+        body = bytes(body)
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = self._dechunk(body)
+        if headers.get("content-encoding", "").lower() == "gzip":
+            body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body)
+        return status, headers, body
+
+    async def _fetch_once(self, url: str) -> tuple[int, dict, bytes]:
+        parsed = urlparse(url)
+        host = parsed.hostname
+        if parsed.scheme not in ("http", "https") or not host:
+            raise FetchError(f"Unsupported url: {url}")
+
+        is_https = parsed.scheme == "https"
+        port = parsed.port or (443 if is_https else 80)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+
+        async with self._global_slots, self._host_slots[host]:
+            address = await self._resolve(host, port)
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(address, port, ssl=self._ssl_context if is_https else None,
+                                            server_hostname=host if is_https else None),
+                    self._connect_timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                raise FetchError(f"Connect failed for {url}: {e}")
+
+            try:
+                writer.write((f"GET {path} HTTP/1.1\r\nHost: {parsed.netloc}\r\nUser-Agent: {self._user_agent}\r\n"
+                              f"Accept: text/html,*/*;q=0.8\r\nAccept-Encoding: gzip\r\nConnection: close\r\n\r\n")
+                             .encode("latin-1"))
+                await writer.drain()
+                self.stats["fetches"] += 1
+                return await self._read_response(reader)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                    ValueError, IndexError, zlib.error) as e:
+                raise FetchError(f"Read failed for {url}: {e}")
+            finally:
+                writer.close()
+
+    async def fetch(self, url: str):
+        for _ in range(self._max_redirects + 1):
+            try:
+                status, headers, body = await self._fetch_once(url)
+            except FetchError as e:
+                self.stats["failed_fetches"] += 1
+                self.logger.debug(str(e))
+                return None
+
+            if status in self._redirect_codes and headers.get("location"):
+                url = urljoin(url, headers["location"])
+                continue
+
+            self.stats["bytes"] += len(body)
+            return body.decode("utf-8", errors="replace") if status < 400 else None
+        return None
+
+    async def enrich_site(self, record: dict, website: str) -> dict:
+        urls = [website] + self._pattern_scraper.create_urls(website, self._suggested_ext)
+        if self._domain_router.route(website) == DomainRouter.AGGREGATOR:
+            # A link-in-bio page is read once for the links it lists, its contact pages don't exist
+            self._domain_router.record(DomainRouter.AGGREGATOR, len(urls), 1)
+            source = await self.fetch(website)
+            if source and self._source_sink:
+                self._source_sink(record, website, source)
+            website_data = self._domain_router.aggregator_data(website, [source] if source else [],
+                                                               self._pattern_scraper, self._unavailable_text)
+            record.update(website_data)
+            self.stats["sites"] += 1
+            return website_data
+
+        fetched = await asyncio.gather(*(self.fetch(url) for url in urls))
+        sources = [source for source in fetched if source]
+        if self._source_sink:
+            for url, source in zip(urls, fetched):
+                if source:
+                    self._source_sink(record, url, source)
+
+        patterns = self._pattern_scraper.get_pattern_data(sources) if sources else {"site_email": []}
+        website_data = {key: (values[0] if values else self._unavailable_text) for key, values in patterns.items()}
+        record.update(website_data)
+        self.stats["sites"] += 1
+        return website_data
+
+    async def run(self, pairs, on_result=None) -> dict:
+        self._global_slots = asyncio.Semaphore(self._max_in_flight)
+        self._host_slots = defaultdict(lambda: asyncio.Semaphore(self._per_host))
+        site_queue = asyncio.Queue(maxsize=self._max_in_flight * 2)
+        start_time = perf_counter()
+
+        async def consume():
+            while True:
+                pair = await site_queue.get()
+                if pair is None:
+                    return
+                record, website = pair
+                try:
+                    website_data = await self.enrich_site(record, website)
+                except Exception as e:
+                    self.logger.error(f"An error occurred while enriching '{website}': {e}")
+                    continue
+                if on_result:
+                    on_result(record, website_data)
+
+        consumers = [asyncio.create_task(consume()) for _ in range(self._max_in_flight)]
+
+        # Accept both plain and async streams of (record, website) pairs
+        if hasattr(pairs, "__aiter__"):
+            async for pair in pairs:
+                await site_queue.put(pair)
+        else:
+            for pair in pairs:
+                await site_queue.put(pair)
+
+        for _ in consumers:
+            await site_queue.put(None)
+        await asyncio.gather(*consumers)
+
+        self.stats["elapsed"] = perf_counter() - start_time
+        return dict(self.stats)
+
+    def enrich_records(self, records: list[dict], website_key: str = "webpage") -> dict:
+        pairs = []
+        for record in records:
+            website = record.get(website_key, self._unavailable_text)
+            kind = self._domain_router.route(website)
+            if kind not in (DomainRouter.SITE, DomainRouter.AGGREGATOR):
+                generic_fetches = 1 + len(self._pattern_scraper.create_urls(website, self._suggested_ext))
+                self._domain_router.record(kind, generic_fetches, 0)
+                record.update(self._domain_router.link_data(website, self._unavailable_text))
+                self.stats["routed"] += 1
+            elif website and website != self._unavailable_text:
+                pairs.append((record, website))
+            else:
+                record.setdefault("site_email", self._unavailable_text)
+        return asyncio.run(self.run(pairs))
@@ -0,0 +1,77 @@
+from utils.google_maps_scraper import GoogleMaps
+from utils.cdp_backend import CDPBackend, SeleniumBackend
+from utils.local_stubs import LatencyStubServer
+from utils.rate_bench import serve_in_background
+from utils.page_state import PageState
+from argparse import ArgumentParser
+from threading import Thread, Event
+from statistics import median
+from time import perf_counter
+
+
+def time_operations(backend, url: str, rounds: int) -> dict:
+    # Milliseconds per call for every operation the scraper sends through a backend
+    timings = {name: [] for name in ("navigate", "evaluate", "page_state", "wait_for_selector", "current_url",
+                                     "targets", "new_close_target")}
+
+    def timed(name, call):
+        start = perf_counter()
+        call()
+        timings[name].append((perf_counter() - start) * 1000)
+
+    backend.enable_network_log()
+    for index in range(rounds):
+        timed("navigate", lambda: backend.navigate(f"{url}?round={index}"))
+        timed("evaluate", lambda: backend.evaluate("document.querySelectorAll('p').length"))
+        timed("page_state", lambda: backend.execute_script(PageState._probe_script))
+        timed("wait_for_selector", lambda: backend.wait_for_selector("h1", 5))
+        timed("current_url", lambda: backend.current_url)
+        timed("targets", backend.targets)
+        timed("new_close_target", lambda: backend.close_target(backend.new_target("about:blank")))
+    timings["network_entries"] = len(backend.network_log())
+    return timings
+
+
+def run_benchmark(driver_path: str, rounds: int, headless: bool) -> dict:
+    server = LatencyStubServer(latency=0.0, page_padding=2000)
+    ready, stop = Event(), Event()
+    Thread(target=serve_in_background, args=(server, ready, stop), daemon=True).start()
+    ready.wait()
+
+    maps_obj = GoogleMaps(driver_path=driver_path, headless=headless, verbose=False)
+    driver = maps_obj.create_chrome_driver(bind_wait=False)
+    url = f"http://127.0.0.1:{server.port}/"
+    results = {}
+    try:
+        # Both backends drive the same browser and tab, only the path of each call differs
+        results["selenium"] = time_operations(SeleniumBackend(driver), url, rounds)
+        cdp_backend = CDPBackend.from_driver(driver)
+        try:
+            results["cdp"] = time_operations(cdp_backend, url, rounds)
+        finally:
+            cdp_backend.close()
+    finally:
+        maps_obj.quit_driver(driver)
+        stop.set()
+    return results
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Compare per-operation latency of the Selenium and direct DevTools backends')
+    parser.add_argument('-d', '--driver-path', help='Path to Chrome driver', type=str, required=True)
+    parser.add_argument('-n', '--rounds', help='Times each operation is timed per backend (default: 50)', type=int, default=50)
+    parser.add_argument('-wb', '--windowed-browser', help='Disable headless mode', action='store_false', dest='headless', default=True)
+    args = parser.parse_args()
+
+    result = run_benchmark(args.driver_path, args.rounds, args.headless)
+    print(f"{'operation':>18} | {'selenium p50':>12} | {'cdp p50':>8} | {'selenium p95':>12} | {'cdp p95':>8} | speedup")
+    for operation, selenium_times in result["selenium"].items():
+        if operation == "network_entries":
+            continue
+        cdp_times = result["cdp"][operation]
+        p95 = lambda times: sorted(times)[int(len(times) * 0.95) - 1 if len(times) > 1 else 0]
+        print(f"{operation:>18} | {median(selenium_times):10.2f}ms | {median(cdp_times):6.2f}ms | "
+              f"{p95(selenium_times):10.2f}ms | {p95(cdp_times):6.2f}ms | "
+              f"{median(selenium_times) / max(median(cdp_times), 1e-6):.1f}x")
+    print(f"Network log entries: selenium {result['selenium']['network_entries']} (resource timing), "
+          f"cdp {result['cdp']['network_entries']} (DevTools events)")
@@ -0,0 +1,59 @@
+from threading import Lock
+from time import monotonic, sleep
+import logging
+
+
+class ScrapeCancelled(Exception):
+    pass
+
+
+class DriverRegistry:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._drivers = {}
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    def register(self, driver):
+        with self._lock:
+            self._drivers[id(driver)] = driver
+
+    def unregister(self, driver):
+        with self._lock:
+            self._drivers.pop(id(driver), None)
+
+    def live(self) -> int:
+        with self._lock:
+            return len(self._drivers)
+
+    def wait_idle(self, timeout: float, poll_interval: float = 0.1) -> bool:
+        deadline = monotonic() + timeout
+        while self.live() and monotonic() < deadline:
+            sleep(poll_interval)
+        return not self.live()
+
+    def force_quit_all(self) -> int:
+        # Quitting from here also breaks any worker stuck inside driver.get(), it gets an error and unwinds
+        with self._lock:
+            drivers = list(self._drivers.values())
+            self._drivers.clear()
+
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                self.logger.error(f"Not able to force quit a driver: {e}")
+        return len(drivers)
+
+    def shutdown(self, grace: float = 5.0) -> dict:
+        start_time = monotonic()
+        cooperative = self.wait_idle(grace)
+        forced = 0 if cooperative else self.force_quit_all()
+        report = {"seconds": monotonic() - start_time, "forced_drivers": forced}
+        self.logger.info(f"Shutdown finished in {report['seconds']:.2f}s "
+                         f"({forced} driver(s) had to be force closed)")
+        return report
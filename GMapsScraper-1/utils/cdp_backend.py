@@ -0,0 +1,351 @@
+from utils.cancellation import ScrapeCancelled
+from urllib.parse import urlparse, quote
+from urllib.request import Request as HttpRequest, urlopen
+from collections import deque
+from threading import Lock
+from time import monotonic, sleep
+import logging
+import socket
+import json
+
+
+class CDPError(Exception):
+    pass
+
+
+class CDPConnection:
+    # Blocking client for one DevTools WebSocket. wsproto (what trio-websocket is built on) does the framing, the
+    # scraper's worker threads are synchronous so there is no event loop to hand the socket to
+    def __init__(self, ws_url: str, timeout: float = 30.0) -> None:
+        from wsproto import WSConnection, ConnectionType
+        from wsproto.events import Request
+
+        parsed = urlparse(ws_url)
+        self._timeout = timeout
+        self._socket = socket.create_connection((parsed.hostname, parsed.port or 80), timeout=timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._ws = WSConnection(ConnectionType.CLIENT)
+        self._socket.sendall(self._ws.send(Request(host=parsed.netloc, target=parsed.path or "/")))
+        self._next_id = 0
+        self._responses = {}
+        self._events = deque(maxlen=1000)
+        self._listeners = {}
+        self._fragments = []
+        self._open = False
+        self._closed = False
+        self._lock = Lock()
+        self._read_until(lambda: self._open or self._closed, monotonic() + timeout)
+        if not self._open:
+            raise CDPError(f"DevTools refused the WebSocket handshake for {ws_url}")
+
+    def listen(self, method: str, callback):
+        self._listeners[method] = callback
+
+    def _handle(self, event):
+        from wsproto.events import (AcceptConnection, RejectConnection, TextMessage, CloseConnection, Ping)
+
+        if isinstance(event, AcceptConnection):
+            self._open = True
+        elif isinstance(event, RejectConnection):
+            self._closed = True
+        elif isinstance(event, Ping):
+            self._socket.sendall(self._ws.send(event.response()))
+        elif isinstance(event, CloseConnection):
+            self._closed = True
+        elif isinstance(event, TextMessage):
+            self._fragments.append(event.data)
+            if not event.message_finished:
+                return
+            message = json.loads("".join(self._fragments))
+            self._fragments = []
+            if "id" in message:
+                self._responses[message["id"]] = message
+                return
+            # Events are handed to their listener (network log) or kept for wait_event
+            listener = self._listeners.get(message.get("method"))
+            if listener is not None:
+                listener(message.get("params", {}))
+            else:
+                self._events.append(message)
+
+    def _read_until(self, done, deadline: float):
+        while not done():
+            if self._closed:
+                raise CDPError("DevTools connection closed")
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return
+            self._socket.settimeout(remaining)
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                return
+            if not data:
+                self._closed = True
+                raise CDPError("DevTools connection closed")
+            self._ws.receive_data(data)
+            for event in self._ws.events():
+                self._handle(event)
+
+    def call(self, method: str, params: dict = None, timeout: float = None) -> dict:
+        from wsproto.events import TextMessage
+
+        with self._lock:
+            self._next_id += 1
+            message_id = self._next_id
+            payload = json.dumps({"id": message_id, "method": method, "params": params or {}})
+            self._socket.sendall(self._ws.send(TextMessage(data=payload)))
+            self._read_until(lambda: message_id in self._responses, monotonic() + (timeout or self._timeout))
+            response = self._responses.pop(message_id, None)
+        if response is None:
+            raise CDPError(f"{method} got no answer within {timeout or self._timeout:.0f}s")
+        if "error" in response:
+            raise CDPError(f"{method}: {response['error'].get('message', response['error'])}")
+        return response.get("result", {})
+
+    def wait_event(self, method: str, timeout: float, predicate=None):
+        # Returns the first matching event's params, or None when the timeout runs out
+        def find():
+            return next((event for event in self._events if event.get("method") == method and
+                         (predicate is None or predicate(event.get("params", {})))), None)
+
+        with self._lock:
+            self._read_until(lambda: find() is not None, monotonic() + timeout)
+            event = find()
+            if event is None:
+                return None
+            self._events.remove(event)
+        return event.get("params", {})
+
+    def drain(self, seconds: float = 0.05):
+        # Events only arrive while a call reads the socket, this picks up what came in since the last one
+        with self._lock:
+            self._read_until(lambda: False, monotonic() + seconds)
+
+    def drop_events(self, method: str):
+        with self._lock:
+            for event in [event for event in self._events if event.get("method") == method]:
+                self._events.remove(event)
+
+    def close(self):
+        from wsproto.events import CloseConnection
+
+        with self._lock:
+            try:
+                if self._open and not self._closed:
+                    self._socket.sendall(self._ws.send(CloseConnection(code=1000)))
+            except Exception:
+                pass
+            self._closed = True
+            self._socket.close()
+
+
+class SeleniumBackend:
+    name = "selenium"
+
+    # Same operations as CDPBackend on top of a plain WebDriver, every call goes through chromedriver
+    def __init__(self, driver) -> None:
+        self.driver = driver
+
+    @property
+    def target_id(self) -> str:
+        return self.driver.current_window_handle
+
+    @property
+    def current_url(self) -> str:
+        return self.driver.current_url
+
+    @property
+    def page_source(self) -> str:
+        return self.driver.page_source
+
+    def navigate(self, url: str, timeout: float = None):
+        if timeout:
+            self.driver.set_page_load_timeout(timeout)
+        self.driver.get(url)
+
+    def execute_script(self, script: str, *args):
+        return self.driver.execute_script(script, *args)
+
+    def evaluate(self, expression: str):
+        return self.driver.execute_script(f"return ({expression});")
+
+    def wait_for_selector(self, selector: str, timeout: float, stop_flag=None, poll_interval: float = 0.1) -> bool:
+        deadline = monotonic() + timeout
+        while not self.driver.execute_script("return document.querySelector(arguments[0]) !== null;", selector):
+            if stop_flag and stop_flag():
+                raise ScrapeCancelled()
+            if monotonic() >= deadline:
+                return False
+            sleep(poll_interval)
+        return True
+
+    def targets(self) -> list[str]:
+        return list(self.driver.window_handles)
+
+    def new_target(self, url: str = "about:blank") -> str:
+        handles = set(self.driver.window_handles)
+        self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+        return next(handle for handle in self.driver.window_handles if handle not in handles)
+
+    def close_target(self, target_id: str):
+        current = self.driver.current_window_handle
+        self.driver.switch_to.window(target_id)
+        self.driver.close()
+        if target_id != current:
+            self.driver.switch_to.window(current)
+
+    def enable_network_log(self):
+        pass
+
+    def network_log(self) -> list[dict]:
+        # Without a DevTools session only the resource timing entries of the current document are visible
+        return self.driver.execute_script(
+            "return performance.getEntriesByType('resource').map(entry => ({url: entry.name, "
+            "type: entry.initiatorType, status: entry.responseStatus || null, bytes: entry.transferSize, "
+            "duration: entry.duration}));")
+
+    def close(self):
+        pass
+
+
+class CDPBackend:
+    name = "cdp"
+
+    # Talks to Chrome's remote-debugging WebSocket directly, one session per tab. It attaches to the browser
+    # chromedriver launched, so profiles, identities and stealth scripts stay exactly as Selenium set them up
+    def __init__(self, debugger_address: str, target_id: str = None, timeout: float = 30.0) -> None:
+        self._address = debugger_address
+        self._timeout = timeout
+        self._connection = None
+        self._network_entries = {}
+        self._network_enabled = False
+        self.target_id = None
+
+        self.setup_logging()
+        self.attach(target_id or self.targets()[0])
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_driver(cls, driver, timeout: float = 30.0):
+        # chromedriver starts Chrome with a debugging port and window handles are DevTools target ids
+        address = driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        return cls(address, driver.current_window_handle, timeout)
+
+    def _http(self, path: str, method: str = "GET"):
+        with urlopen(HttpRequest(f"http://{self._address}{path}", method=method), timeout=self._timeout) as response:
+            body = response.read().decode("utf-8")
+        try:
+            return json.loads(body)
+        except ValueError:
+            return body
+
+    def attach(self, target_id: str):
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = CDPConnection(f"ws://{self._address}/devtools/page/{target_id}", self._timeout)
+        self.target_id = target_id
+        self._connection.call("Page.enable")
+        if self._network_enabled:
+            self._network_enabled = False
+            self.enable_network_log()
+
+    @property
+    def current_url(self) -> str:
+        return self.evaluate("location.href")
+
+    @property
+    def page_source(self) -> str:
+        return self.evaluate("document.documentElement.outerHTML")
+
+    def navigate(self, url: str, timeout: float = None, wait: bool = True):
+        # wait=False returns once the navigation started, tab pools poll the page state themselves
+        timeout = timeout or self._timeout
+        self._connection.drop_events("Page.loadEventFired")
+        result = self._connection.call("Page.navigate", {"url": url}, timeout)
+        if result.get("errorText"):
+            raise CDPError(f"Not able to open {url}: {result['errorText']}")
+        # Same-document navigations have no loader and fire no load event
+        if wait and result.get("loaderId") and self._connection.wait_event("Page.loadEventFired", timeout) is None:
+            raise CDPError(f"{url} did not finish loading within {timeout:.0f}s")
+
+    def evaluate(self, expression: str):
+        result = self._connection.call("Runtime.evaluate", {"expression": expression, "returnByValue": True})
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text", "Script error"))
+        return result.get("result", {}).get("value")
+
+    def execute_script(self, script: str, *args):
+        # Same contract as WebDriver.execute_script for JSON arguments, so PageState and the feed scripts run unchanged
+        return self.evaluate(f"(function() {{\n{script}\n}}).apply(null, {json.dumps(args)})")
+
+    def wait_for_selector(self, selector: str, timeout: float, stop_flag=None, poll_interval: float = 0.1) -> bool:
+        deadline = monotonic() + timeout
+        while not self.evaluate(f"document.querySelector({json.dumps(selector)}) !== null"):
+            if stop_flag and stop_flag():
+                raise ScrapeCancelled()
+            if monotonic() >= deadline:
+                return False
+            sleep(poll_interval)
+        return True
+
+    def targets(self) -> list[str]:
+        return [target["id"] for target in self._http("/json/list") if target.get("type") == "page"]
+
+    def new_target(self, url: str = "about:blank") -> str:
+        return self._http(f"/json/new?{quote(url, safe='')}", method="PUT")["id"]
+
+    def close_target(self, target_id: str):
+        self._http(f"/json/close/{target_id}")
+
+    def enable_network_log(self):
+        if self._network_enabled:
+            return
+        self._network_enabled = True
+        entries = self._network_entries
+
+        def request_sent(params):
+            request = params.get("request", {})
+            entries[params["requestId"]] = {"url": request.get("url"), "method": request.get("method"),
+                                            "type": params.get("type"), "status": None, "bytes": None,
+                                            "started": params.get("timestamp"), "duration": None}
+
+        def response_received(params):
+            entry = entries.get(params["requestId"])
+            if entry is not None:
+                entry["status"] = params.get("response", {}).get("status")
+
+        def loading_finished(params):
+            entry = entries.get(params["requestId"])
+            if entry is not None:
+                entry["bytes"] = params.get("encodedDataLength")
+                if entry["started"] is not None:
+                    entry["duration"] = (params.get("timestamp", entry["started"]) - entry["started"]) * 1000
+
+        def loading_failed(params):
+            entry = entries.get(params["requestId"])
+            if entry is not None:
+                entry["status"] = params.get("errorText", "failed")
+
+        self._connection.listen("Network.requestWillBeSent", request_sent)
+        self._connection.listen("Network.responseReceived", response_received)
+        self._connection.listen("Network.loadingFinished", loading_finished)
+        self._connection.listen("Network.loadingFailed", loading_failed)
+        self._connection.call("Network.enable")
+
+    def network_log(self) -> list[dict]:
+        self._connection.drain()
+        return list(self._network_entries.values())
+
+    def clear_network_log(self):
+        self._network_entries.clear()
+
+    def close(self):
+        # Only the WebSocket is closed, the browser belongs to the Selenium driver
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
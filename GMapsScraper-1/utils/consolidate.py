@@ -0,0 +1,162 @@
+from argparse import ArgumentParser
+from tempfile import mkdtemp
+from os.path import getsize, isfile, join, dirname, abspath
+from shutil import rmtree
+from time import perf_counter
+import math
+import sys
+
+
+# Columns that come out typed, everything else stays text
+float_columns = ("rating", "lat", "long")
+int_columns = ("review_count",)
+
+
+def clean_chunk(chunk, unavailable_text: str = "Not Available"):
+    # Whole-column string operations only, no Python loop over rows
+    import numpy as np
+    import pandas as pd
+
+    chunk = chunk.mask(chunk.isin([unavailable_text, ""]))
+
+    for column in float_columns:
+        if column in chunk:
+            number = chunk[column].str.extract(r"(-?\d+(?:[.,]\d+)?)", expand=False).str.replace(",", ".", regex=False)
+            chunk[column] = pd.to_numeric(number, errors="coerce").astype("float64")
+    for column in int_columns:
+        if column in chunk:
+            digits = chunk[column].str.replace(r"\D", "", regex=True).replace("", np.nan)
+            chunk[column] = pd.to_numeric(digits, errors="coerce").astype("Int64")
+
+    if "phone_number" in chunk:
+        # Digits only, international numbers keep a leading +, 00 prefixes become +
+        raw = chunk["phone_number"].str.strip()
+        digits = raw.str.replace(r"\D", "", regex=True)
+        international = raw.str.startswith("+", na=False) | digits.str.startswith("00", na=False)
+        digits = digits.where(~digits.str.startswith("00", na=False), digits.str[2:])
+        phone = ("+" + digits).where(international, digits)
+        chunk["phone_number"] = phone.where(digits.str.len() >= 6)
+
+    if "webpage" in chunk:
+        chunk["domain"] = chunk["webpage"].str.strip().str.lower().str.extract(
+            r"^(?:[a-z][a-z0-9+.-]*://)?(?:www\d*\.)?([^/:?#\s]+)", expand=False).str.rstrip(".")
+    return chunk
+
+
+def dedupe_key(chunk):
+    # The place id when the row has one, otherwise the name plus the phone, the domain or rounded coordinates
+    import pandas as pd
+
+    empty = pd.Series(pd.NA, index=chunk.index, dtype="object")
+    title = chunk["title"] if "title" in chunk else empty
+    name = title.str.lower().str.replace(r"[\W_]+", " ", regex=True).str.strip()
+    location = empty
+    if "lat" in chunk and "long" in chunk:
+        location = (chunk["lat"].round(4).astype(str) + "," + chunk["long"].round(4).astype(str)).where(
+            chunk["lat"].notna() & chunk["long"].notna())
+    anchor = chunk.get("phone_number", empty).fillna(chunk.get("domain", empty)).fillna(location)
+    key = ("k:" + name.fillna("") + "|" + anchor.fillna("")).where(name.notna() | anchor.notna())
+    if "place_id" in chunk:
+        key = ("p:" + chunk["place_id"]).fillna(key)
+    return key
+
+
+def estimate_partitions(inputs: list[str], chunk_size: int, sample_lines: int = 2000) -> int:
+    # Enough partitions for one of them to hold about chunk_size rows, row width sampled from the first file
+    total_bytes = sum(getsize(path) for path in inputs)
+    with open(inputs[0], "rb") as file_handler:
+        lines = [line for _, line in zip(range(sample_lines + 1), file_handler)][1:]
+    row_bytes = max(1.0, sum(len(line) for line in lines) / max(1, len(lines)))
+    return max(1, math.ceil(total_bytes / row_bytes / chunk_size))
+
+
+def output_columns(inputs: list[str]) -> list[str]:
+    # Headers of every input, files written before a column existed just leave it empty
+    import pandas as pd
+
+    columns = []
+    for path in inputs:
+        for column in pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns:
+            if column not in columns:
+                columns.append(column)
+    if "webpage" in columns and "domain" not in columns:
+        columns.insert(columns.index("webpage") + 1, "domain")
+    return columns
+
+
+def consolidate(inputs: list[str], output_file: str, chunk_size: int = 100000, partitions: int = 0,
+                unavailable_text: str = "Not Available", temp_root: str = None) -> dict:
+    import pandas as pd
+
+    partitions = partitions or estimate_partitions(inputs, chunk_size)
+    temp_dir = mkdtemp(prefix="consolidate_", dir=temp_root or dirname(abspath(output_file)))
+    partition_paths = [join(temp_dir, f"part_{index:05d}.csv") for index in range(partitions)]
+    stats = {"rows_in": 0, "rows_out": 0, "rows_without_key": 0, "nulled": 0, "partitions": partitions}
+    columns = output_columns(inputs)
+    try:
+        # Pass 1: clean each chunk and spread its rows over partition files by key hash, a key always lands in the
+        # same partition so each one can be deduplicated on its own
+        for path in inputs:
+            for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                                     encoding="utf-8-sig"):
+                stats["rows_in"] += len(chunk)
+                stats["nulled"] += int(chunk.isin([unavailable_text]).to_numpy().sum())
+                chunk = clean_chunk(chunk, unavailable_text).reindex(columns=columns)
+                chunk["_key"] = dedupe_key(chunk)
+                missing = chunk["_key"].isna()
+                stats["rows_without_key"] += int(missing.sum())
+                chunk = chunk[~missing]
+
+                buckets = pd.util.hash_pandas_object(chunk["_key"], index=False).to_numpy() % partitions
+                for bucket, rows in chunk.groupby(buckets, sort=False):
+                    partition_path = partition_paths[bucket]
+                    rows.to_csv(partition_path, mode="a", header=not isfile(partition_path), index=False)
+
+        # Pass 2: one partition in memory at a time. Rows are in file order, so the last non-empty value of each
+        # column is the newest one and older rows only fill in what the newer ones are missing
+        dtypes = {column: "float64" for column in float_columns}
+        dtypes.update({column: "Int64" for column in int_columns})
+        is_header_file = True
+        for partition_path in partition_paths:
+            if not isfile(partition_path):
+                continue
+            part = pd.read_csv(partition_path, dtype={column: dtypes.get(column, str) for column in columns + ["_key"]},
+                               keep_default_na=False, na_values=[""], encoding="utf-8")
+            merged = part.groupby("_key", sort=False).last().reset_index(drop=True).reindex(columns=columns)
+            merged.to_csv(output_file, mode="w" if is_header_file else "a", header=is_header_file, index=False,
+                          encoding="utf-8-sig" if is_header_file else "utf-8")
+            is_header_file = False
+            stats["rows_out"] += len(merged)
+    finally:
+        rmtree(temp_dir, ignore_errors=True)
+
+    if is_header_file:
+        pd.DataFrame(columns=columns).to_csv(output_file, index=False, encoding="utf-8-sig")
+    stats["duplicates"] = stats["rows_in"] - stats["rows_without_key"] - stats["rows_out"]
+    return stats
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Merge appended scrape CSVs into one clean, typed and deduplicated CSV with bounded memory')
+    parser.add_argument('inputs', nargs='+', help='CSV files written by maps.py (google_maps_data.csv or replayed ones)')
+    parser.add_argument('-o', '--output-file', help='Consolidated CSV (default: ./CSV_FILES/consolidated_data.csv)', type=str, default='./CSV_FILES/consolidated_data.csv')
+    parser.add_argument('-c', '--chunk-size', help='Rows read per chunk, also the target size of a dedupe partition (default: 100000)', type=int, default=100000)
+    parser.add_argument('-p', '--partitions', help='Hash partitions for the dedupe pass, 0 sizes them from the input files (default: 0)', type=int, default=0)
+    parser.add_argument('-u', '--unavailable-text', help='Placeholder text turned into empty values (default: "Not Available")', type=str, default="Not Available")
+    parser.add_argument('-t', '--temp-dir', help='Folder for the partition files (default: next to the output file)', type=str, default=None)
+    args = parser.parse_args()
+
+    if args.chunk_size < 1 or args.partitions < 0:
+        parser.error("--chunk-size must be positive and --partitions can't be negative")
+    missing_inputs = [path for path in args.inputs if not isfile(path)]
+    if missing_inputs:
+        parser.error(f"Input files not found: {', '.join(missing_inputs)}")
+
+    start_time = perf_counter()
+    result = consolidate(args.inputs, args.output_file, args.chunk_size, args.partitions, args.unavailable_text,
+                         args.temp_dir)
+    print(f"Read {result['rows_in']} rows, wrote {result['rows_out']} places to {args.output_file} | "
+          f"duplicates {result['duplicates']} | without key {result['rows_without_key']} | "
+          f"placeholders nulled {result['nulled']} | {result['partitions']} partitions | "
+          f"{perf_counter() - start_time:.2f}s")
+    sys.exit(0)
@@ -0,0 +1,155 @@
+from utils.place_record import Place, serialize_place
+from datetime import datetime
+from threading import Lock
+from csv import DictWriter
+from os.path import isfile
+from hashlib import sha1
+from time import time
+import sqlite3
+import json
+
+
+class DeltaExporter:
+    # Query, map link and its slug depend on which search found the place, they don't make a record "changed"
+    tracked_fields = tuple(field for field in Place.fields if field not in ("query", "map_link", "slug"))
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS places (
+            place_id TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            fields TEXT NOT NULL,
+            query TEXT,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            gone INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS places_by_query ON places (query, last_seen);
+    """
+
+    def __init__(self, snapshot_path: str, output_path: str = "./CSV_FILES", unavailable_text: str = "Not Available",
+                 batch_size: int = 500) -> None:
+        self._unavailable_text = unavailable_text
+        self._batch_size = batch_size
+        self._started_at = time()
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.output_files = {kind: f"{output_path}/delta_{stamp}_{kind}.csv"
+                             for kind in ("added", "changed", "disappeared")}
+
+        # Store calls come from every worker thread, one connection behind one lock keeps the CSVs and the
+        # snapshot in step
+        self._lock = Lock()
+        self._connection = sqlite3.connect(snapshot_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(self._schema)
+        self._completed_queries = set()
+        self._read_feeds = set()
+        self.counts = dict.fromkeys(("added", "changed", "unchanged", "disappeared", "skipped"), 0)
+
+    def _digest(self, row: dict) -> str:
+        return sha1("\x1f".join(str(row[field]) for field in self.tracked_fields).encode("utf-8")).hexdigest()
+
+    def _append(self, kind: str, fieldnames: tuple, rows: list):
+        if not rows:
+            return
+        is_header_file = not isfile(self.output_files[kind])
+        with open(self.output_files[kind], "w" if is_header_file else "a", newline="", encoding="utf-8-sig") as file_handler:
+            writer = DictWriter(file_handler, fieldnames=fieldnames, extrasaction='ignore')
+            if is_header_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def _known(self, place_ids: list) -> dict:
+        # Only the rows of this batch are read, a run costs one indexed lookup per scraped place
+        known = {}
+        for start in range(0, len(place_ids), self._batch_size):
+            chunk = place_ids[start:start + self._batch_size]
+            for place_id, digest, fields, gone in self._connection.execute(
+                    f"SELECT place_id, digest, fields, gone FROM places WHERE place_id IN "
+                    f"({', '.join('?' * len(chunk))})", chunk):
+                known[place_id] = (digest, fields, gone)
+        return known
+
+    def observe(self, records: list):
+        rows = {}
+        skipped = 0
+        for record in records:
+            row = serialize_place(record, self._unavailable_text)
+            place_id = record.get("place_id")
+            if not place_id or place_id == self._unavailable_text:
+                skipped += 1
+                continue
+            rows[place_id] = row
+
+        with self._lock:
+            self.counts["skipped"] += skipped
+            if not rows:
+                return
+            known = self._known(list(rows))
+            added, changed, upserts = [], [], []
+            now = time()
+            for place_id, row in rows.items():
+                digest = self._digest(row)
+                fields = {field: row[field] for field in self.tracked_fields}
+                previous = known.get(place_id)
+                if previous is None or previous[2]:
+                    added.append(row)
+                elif previous[0] != digest:
+                    old_fields = json.loads(previous[1])
+                    changed.append({"changed_fields": " | ".join(
+                        field for field in self.tracked_fields if old_fields.get(field) != fields[field]), **row})
+                else:
+                    self.counts["unchanged"] += 1
+                upserts.append((place_id, digest, json.dumps(fields, ensure_ascii=False), row["query"], now, now))
+
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "INSERT INTO places (place_id, digest, fields, query, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (place_id) DO UPDATE SET digest = excluded.digest, fields = excluded.fields, "
+                "query = excluded.query, last_seen = excluded.last_seen, gone = 0", upserts)
+            self._connection.execute("COMMIT")
+
+            self._append("added", Place.fields, added)
+            self._append("changed", ("changed_fields", *Place.fields), changed)
+            self.counts["added"] += len(added)
+            self.counts["changed"] += len(changed)
+
+    def feed_read(self, query: str, place_ids: list):
+        # The feed was scrolled to its end marker with no limit cut, every place it listed counts as seen even when
+        # dedupe or a failed visit kept it from being scraped
+        place_ids = list(dict.fromkeys(place_id for place_id in place_ids if place_id))
+        with self._lock:
+            self._read_feeds.add(query)
+            now = time()
+            self._connection.execute("BEGIN")
+            for start in range(0, len(place_ids), self._batch_size):
+                chunk = place_ids[start:start + self._batch_size]
+                self._connection.execute(f"UPDATE places SET last_seen = ? WHERE place_id IN "
+                                         f"({', '.join('?' * len(chunk))})", (now, *chunk))
+            self._connection.execute("COMMIT")
+
+    def complete_query(self, query: str):
+        # Only queries that ran to the end can make places disappear, a cancelled or failed one proves nothing
+        with self._lock:
+            self._completed_queries.add(query)
+
+    def finish(self) -> dict:
+        with self._lock:
+            # A feed cut by --limit, a timeout or tiling never saw all its places, they can't count as gone
+            queries = list(self._completed_queries & self._read_feeds)
+            disappeared = []
+            for start in range(0, len(queries), self._batch_size):
+                chunk = queries[start:start + self._batch_size]
+                condition = f"gone = 0 AND last_seen < ? AND query IN ({', '.join('?' * len(chunk))})"
+                for place_id, fields, query, last_seen in self._connection.execute(
+                        f"SELECT place_id, fields, query, last_seen FROM places WHERE {condition}",
+                        (self._started_at, *chunk)):
+                    disappeared.append({"place_id": place_id, "title": json.loads(fields).get("title"),
+                                        "query": query, "last_seen": datetime.fromtimestamp(last_seen).isoformat(
+                                            timespec="seconds")})
+                self._connection.execute(f"UPDATE places SET gone = 1 WHERE {condition}", (self._started_at, *chunk))
+
+            self._append("disappeared", ("place_id", "title", "query", "last_seen"), disappeared)
+            self.counts["disappeared"] += len(disappeared)
+            self._completed_queries.clear()
+            self._read_feeds.clear()
+            return dict(self.counts)
@@ -0,0 +1,123 @@
+from utils.web_site_scraper import PatternScraper
+from utils.rate_controller import PageBlocked
+from threading import Thread, Condition
+from queue import Queue
+import logging
+
+
+class PlaceBatch:
+    def __init__(self, pool, query: str, update_callback=None, place_index=None):
+        self.query = query
+        # The submitting job's index, a queue job dedupes against its own places only
+        self.place_index = place_index
+        self.records = []
+        self.errors = []
+        self._pool = pool
+        self._update_callback = update_callback
+        self._pending = 0
+        self._condition = Condition()
+
+    def submit(self, url: str):
+        with self._condition:
+            self._pending += 1
+        self._pool.put(self, url)
+
+    def done(self, record: dict = None, error: Exception = None):
+        with self._condition:
+            if record is not None:
+                self.records.append(record)
+            if error is not None:
+                self.errors.append(error)
+            self._pending -= 1
+            self._condition.notify_all()
+
+        if record is not None and self._update_callback:
+            self._update_callback(1)
+
+    def wait(self, stop_flag=None, poll_interval: float = 0.5):
+        with self._condition:
+            while self._pending > 0:
+                if stop_flag and stop_flag():
+                    break
+                self._condition.wait(timeout=poll_interval)
+
+
+class DetailDriverPool:
+    def __init__(self, maps_obj, workers: int = 2, stop_flag=None):
+        self._maps_obj = maps_obj
+        self._workers = max(1, workers)
+        self._stop_flag = stop_flag or (lambda: False)
+        self._url_queue = Queue()
+        self._threads = []
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    def new_batch(self, query: str, update_callback=None, place_index=None) -> PlaceBatch:
+        return PlaceBatch(pool=self, query=query, update_callback=update_callback, place_index=place_index)
+
+    def put(self, batch: PlaceBatch, url: str):
+        self._url_queue.put((batch, url))
+
+    def start(self):
+        for index in range(self._workers):
+            thread = Thread(target=self._detail_worker, name=f"detail-driver-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self, timeout: float = None):
+        for _ in self._threads:
+            self._url_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
+
+    def _detail_worker(self):
+        # Each detail driver owns its tab and pattern scraper, nothing here is shared between threads
+        pattern_scraper = PatternScraper()
+        driver = None
+        try:
+            driver = self._maps_obj.create_chrome_driver(bind_wait=False)
+        except Exception as e:
+            self.logger.error(f"Not able to start a detail driver: {e}")
+
+        while True:
+            job = self._url_queue.get()
+            if job is None:
+                break
+
+            batch, url = job
+            if driver is None or self._stop_flag() or not self._maps_obj.pace(self._stop_flag):
+                batch.done()
+                continue
+
+            try:
+                # Places are independent URLs, so a bloated driver can be swapped for a fresh one in between
+                driver = self._maps_obj.recycle_if_needed(driver, bind_wait=False)
+            except Exception as e:
+                self.logger.error(f"Not able to replace a recycled detail driver: {e}")
+                driver = None
+                batch.done()
+                continue
+
+            try:
+                record = self._maps_obj.scrape_place_url(driver, url, batch.query, pattern_scraper,
+                                                         batch.place_index)
+            except PageBlocked as e:
+                # A block fails the submitting job, unlike a place that merely couldn't be read
+                self.logger.error(f"Blocked while scraping place '{url}': {e}")
+                batch.done(error=e)
+                continue
+            except Exception as e:
+                self.logger.error(f"An error occurred while scraping place '{url}': {e}")
+                batch.done()
+                continue
+
+            # The batch is the only holder of its records, they go away once its query is stored
+            batch.done(record)
+
+        if driver is not None:
+            self._maps_obj.quit_driver(driver)
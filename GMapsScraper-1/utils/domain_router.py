@@ -0,0 +1,95 @@
+from collections import Counter
+from urllib.parse import urlparse, urljoin
+from threading import Lock
+import logging
+import re
+
+
+class DomainRouter:
+    SITE = "site"
+    SOCIAL = "social"
+    BOOKING = "booking"
+    DIRECTORY = "directory"
+    AGGREGATOR = "aggregator"
+
+    # A trailing ".*" matches the name under any TLD (foodpanda.pk, treatwell.co.uk)
+    _hosts = {
+        SOCIAL: ("facebook.com", "fb.com", "fb.me", "instagram.com", "twitter.com", "x.com", "tiktok.com",
+                 "youtube.com", "youtu.be", "linkedin.com", "pinterest.com", "snapchat.com", "threads.net", "wa.me",
+                 "whatsapp.com", "t.me", "telegram.me", "vk.com"),
+        BOOKING: ("booksy.com", "fresha.com", "vagaro.com", "opentable.*", "resy.com", "sevenrooms.com",
+                  "calendly.com", "setmore.com", "simplybook.me", "mindbodyonline.com", "treatwell.*", "square.site",
+                  "squareup.com", "acuityscheduling.com", "zocdoc.com", "booking.com", "airbnb.*", "thefork.*",
+                  "quandoo.*", "tablein.com"),
+        DIRECTORY: ("yelp.*", "tripadvisor.*", "foursquare.com", "zomato.com", "ubereats.com", "doordash.com",
+                    "grubhub.com", "deliveroo.*", "foodpanda.*", "just-eat.*", "g.page", "goo.gl", "maps.app.goo.gl"),
+        AGGREGATOR: ("linktr.ee", "linkin.bio", "beacons.ai", "lnk.bio", "taplink.cc", "bio.link", "campsite.bio",
+                     "allmylinks.com", "msha.ke", "linkfly.to", "solo.to"),
+    }
+    _href_pattern = re.compile(r"""<a\s[^>]*?href\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+    _asset_pattern = re.compile(r"\.(?:css|js|png|jpe?g|gif|svg|webp|ico|woff2?)(?:$|\?)", re.IGNORECASE)
+
+    def __init__(self) -> None:
+        self._suffixes = {}
+        self._names = {}
+        for kind, hosts in self._hosts.items():
+            for host in hosts:
+                if host.endswith(".*"):
+                    self._names[host[:-2]] = kind
+                else:
+                    self._suffixes[host] = kind
+
+        self._lock = Lock()
+        self.routed = Counter()
+        self.fetches_avoided = 0
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    def host_kind(self, host: str) -> str:
+        # Every parent domain is looked up, so www., m. and other subdomains need no special casing
+        labels = (host or "").lower().rstrip(".").split(".")
+        for index in range(len(labels) - 1):
+            kind = self._suffixes.get(".".join(labels[index:]))
+            if kind:
+                return kind
+        for label in labels[:-1]:
+            kind = self._names.get(label)
+            if kind:
+                return kind
+        return self.SITE
+
+    def route(self, website: str) -> str:
+        # Anything that isn't a known host, including a missing website, keeps the generic crawl
+        if not website or "://" not in website:
+            return self.SITE
+        return self.host_kind(urlparse(website).hostname)
+
+    def record(self, kind: str, generic_fetches: int, fetches: int):
+        with self._lock:
+            self.routed[kind] += 1
+            self.fetches_avoided += max(0, generic_fetches - fetches)
+
+    @staticmethod
+    def link_data(website: str, unavailable: str = "Not Available") -> dict:
+        # A profile page is the business' online presence, it is kept as a social link and never opened
+        return {"site_email": unavailable, "socials": (website,)}
+
+    def aggregator_data(self, website: str, sources: list, pattern_scraper, unavailable: str = "Not Available") -> dict:
+        # A link-in-bio page lists the business' other profiles and site, one fetch replaces the contact page crawl
+        links = [website]
+        for source in sources:
+            for href in self._href_pattern.findall(source):
+                url = urljoin(website, href.strip())
+                if url.startswith(("http://", "https://")) and not self._asset_pattern.search(url) and \
+                        self.route(url) != self.AGGREGATOR:
+                    links.append(url)
+        emails = pattern_scraper.get_pattern_data(sources)["site_email"] if sources else []
+        return {"site_email": emails[0] if emails else unavailable, "socials": tuple(dict.fromkeys(links))}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"routed": dict(self.routed), "fetches_avoided": self.fetches_avoided}
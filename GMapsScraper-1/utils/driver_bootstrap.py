@@ -0,0 +1,166 @@
+from os.path import exists, expanduser, join, dirname, abspath
+from os import makedirs
+from platform import system as system_platform
+from threading import Lock
+from time import time
+import subprocess
+import logging
+import json
+import re
+
+
+class DriverBootstrap:
+    _chrome_binaries = {
+        "linux": ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"],
+        "darwin": ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"],
+    }
+    # Flags that keep a persistent profile small and stop Chrome phoning home on every launch
+    _trimmed_profile_flags = [
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--disable-background-networking",
+        "--disable-component-update",
+        "--disable-sync",
+        "--disable-default-apps",
+        "--metrics-recording-only",
+        "--disk-cache-size=104857600",
+    ]
+    _warm_marker = ".gmaps_warm"
+
+    def __init__(self, driver_path: str = "", profile_root: str = "./CHROME_PROFILES",
+                 cache_path: str = None) -> None:
+        self._driver_path = driver_path
+        self._profile_root = abspath(profile_root) if profile_root else ""
+        self._cache_path = cache_path or join(expanduser("~"), ".gmaps_scraper", "driver_cache.json")
+        self._resolve_lock = Lock()
+        self._profile_lock = Lock()
+        self._busy_profiles = set()
+        self._driver_profiles = {}
+        self.first_search_times = []
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    def browser_version(self):
+        platform_name = system_platform().lower()
+        try:
+            if platform_name == "windows":
+                output = subprocess.run(["reg", "query", r"HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon",
+                                         "/v", "version"], capture_output=True, text=True, timeout=5).stdout
+            else:
+                output = ""
+                for binary in self._chrome_binaries.get(platform_name, []):
+                    try:
+                        output = subprocess.run([binary, "--version"], capture_output=True, text=True,
+                                                timeout=5).stdout
+                    except FileNotFoundError:
+                        continue
+                    if output:
+                        break
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+        version = re.search(r"(\d+)\.\d+\.\d+\.\d+", output or "")
+        return version.group(0) if version else None
+
+    def _load_cache(self) -> dict:
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, cache: dict):
+        makedirs(dirname(self._cache_path), exist_ok=True)
+        with open(self._cache_path, "w", encoding="utf-8") as cache_file:
+            json.dump(cache, cache_file, indent=2)
+
+    def resolve_driver_path(self) -> str:
+        with self._resolve_lock:
+            if self._driver_path:
+                return self._driver_path
+
+            cache = self._load_cache()
+            cached_path = cache.get("driver_path", "")
+            browser_version = self.browser_version()
+            cached_major = str(cache.get("browser_version", "")).split(".")[0]
+
+            # Trust the cache when the browser major version didn't move (or can't be read while offline)
+            if cached_path and exists(cached_path) and \
+                    (browser_version is None or browser_version.split(".")[0] == cached_major):
+                self._driver_path = cached_path
+                return cached_path
+
+            from webdriver_manager.chrome import ChromeDriverManager
+            try:
+                driver_path = ChromeDriverManager().install()
+            except Exception:
+                if cached_path and exists(cached_path):
+                    self.logger.info("Driver check failed, falling back to the cached chromedriver.")
+                    self._driver_path = cached_path
+                    return cached_path
+                raise
+
+            self._save_cache({"driver_path": driver_path, "browser_version": browser_version or "",
+                              "resolved_at": time()})
+            self._driver_path = driver_path
+            return driver_path
+
+    def acquire_profile(self) -> str:
+        if not self._profile_root:
+            return ""
+
+        # A user-data-dir can only be used by one Chrome at a time, so every live driver gets its own slot
+        with self._profile_lock:
+            slot = 0
+            while slot in self._busy_profiles:
+                slot += 1
+            self._busy_profiles.add(slot)
+
+        profile_path = join(self._profile_root, f"profile_{slot}")
+        makedirs(profile_path, exist_ok=True)
+        return profile_path
+
+    def attach_profile(self, driver, profile_path: str):
+        if profile_path:
+            self._driver_profiles[id(driver)] = profile_path
+
+    def profile_of(self, driver) -> str:
+        return self._driver_profiles.get(id(driver), "")
+
+    def release_profile(self, driver=None, profile_path: str = ""):
+        profile_path = self._driver_profiles.pop(id(driver), "") if driver is not None else profile_path
+        if profile_path:
+            with self._profile_lock:
+                self._busy_profiles.discard(int(profile_path.rsplit("_", 1)[1]))
+
+    def profile_flags(self, profile_path: str) -> list[str]:
+        if not profile_path:
+            return []
+        return [f"--user-data-dir={profile_path}"] + self._trimmed_profile_flags
+
+    def is_warm(self, profile_path: str) -> bool:
+        return not profile_path or exists(join(profile_path, self._warm_marker))
+
+    def mark_warm(self, profile_path: str):
+        if profile_path:
+            with open(join(profile_path, self._warm_marker), "w", encoding="utf-8") as marker:
+                marker.write(str(time()))
+
+    def record_first_search(self, seconds: float):
+        self.first_search_times.append(seconds)
+        self.logger.info(f"Time to first search: {seconds:.2f}s")
+
+    def warm_up(self, maps_obj):
+        # Run the first-launch work (consent, cache fill) once so real runs start from a warm profile
+        if not self._profile_root or self.is_warm(join(self._profile_root, "profile_0")):
+            return
+
+        driver = maps_obj.create_chrome_driver(bind_wait=False)
+        try:
+            maps_obj.open_maps(driver)
+        finally:
+            maps_obj.quit_driver(driver)
@@ -0,0 +1,100 @@
+from psutil import Process, NoSuchProcess, AccessDenied
+from collections import Counter
+from threading import Lock
+from time import monotonic
+import logging
+
+
+class DriverSupervisor:
+    def __init__(self, max_rss_mb: float = 1500.0, max_pages: int = 0, sample_interval: float = 5.0) -> None:
+        self._max_rss_mb = max_rss_mb
+        self._max_pages = max_pages
+        self._sample_interval = sample_interval
+        self._lock = Lock()
+        self._drivers = {}
+        self._launched = 0
+        self.peak_rss_mb = 0.0
+        self.recycled = Counter()
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def browser_rss_mb(driver) -> float:
+        # chromedriver spawns Chrome, which spawns its renderer and GPU processes, the whole tree is the browser
+        try:
+            root = Process(driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except (AttributeError, NoSuchProcess, AccessDenied):
+            return 0.0
+
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except (NoSuchProcess, AccessDenied):
+                continue
+        return total / 1024 / 1024
+
+    def track(self, driver):
+        with self._lock:
+            self._launched += 1
+            self._drivers[id(driver)] = {"label": f"browser-{self._launched}", "pages": 0, "rss_mb": 0.0,
+                                         "peak_mb": 0.0, "sampled_at": 0.0}
+
+    def forget(self, driver):
+        with self._lock:
+            self._drivers.pop(id(driver), None)
+
+    def page_visited(self, driver, pages: int = 1):
+        with self._lock:
+            state = self._drivers.get(id(driver))
+            if state is not None:
+                state["pages"] += pages
+
+    def sample(self, driver, force: bool = False) -> float:
+        state = self._drivers.get(id(driver))
+        if state is None:
+            return 0.0
+        # Walking the process tree costs a few milliseconds, so it runs at most once per interval
+        if not force and monotonic() - state["sampled_at"] < self._sample_interval:
+            return state["rss_mb"]
+
+        rss_mb = self.browser_rss_mb(driver)
+        with self._lock:
+            state["rss_mb"] = rss_mb
+            state["peak_mb"] = max(state["peak_mb"], rss_mb)
+            state["sampled_at"] = monotonic()
+            self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        return rss_mb
+
+    def recycle_reason(self, driver) -> str:
+        state = self._drivers.get(id(driver))
+        if state is None:
+            return None
+        if self._max_pages and state["pages"] >= self._max_pages:
+            reason = f"{state['pages']} pages visited"
+        elif self._max_rss_mb and self.sample(driver) >= self._max_rss_mb:
+            reason = f"{state['rss_mb']:.0f}MB in use"
+        else:
+            return None
+
+        with self._lock:
+            self.recycled["pages" if reason.endswith("visited") else "memory"] += 1
+        self.logger.info(f"Recycling {state['label']}: {reason}")
+        return reason
+
+    def summary(self) -> str:
+        with self._lock:
+            samples = [state["rss_mb"] for state in self._drivers.values()]
+        if not samples:
+            return "no browsers running"
+        return f"{len(samples)} browser(s), {sum(samples):.2f}MB total, {max(samples):.2f}MB largest"
+
+    def report(self) -> dict:
+        with self._lock:
+            browsers = {state["label"]: round(state["peak_mb"], 1) for state in self._drivers.values()}
+        return {"browsers": browsers, "peak_rss_mb": round(self.peak_rss_mb, 1), "recycled": dict(self.recycled)}
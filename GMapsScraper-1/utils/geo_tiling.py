@@ -0,0 +1,211 @@
+from utils.href_parser import HrefParser
+from utils.rate_controller import PageBlocked
+from utils.cancellation import ScrapeCancelled
+from urllib.parse import quote_plus
+from threading import Thread, Lock, Condition
+from collections import deque
+from math import log2, floor
+import logging
+
+
+class Tile:
+    _min_zoom = 3
+    _max_zoom = 21
+
+    def __init__(self, south: float, west: float, north: float, east: float, depth: int = 0):
+        self.south = south
+        self.west = west
+        self.north = north
+        self.east = east
+        self.depth = depth
+
+    @classmethod
+    def from_string(cls, bbox: str) -> "Tile":
+        try:
+            south, west, north, east = (float(value) for value in bbox.split(","))
+        except ValueError:
+            raise ValueError(f"Bounding box must look like 'south,west,north,east', got '{bbox}'")
+        if south >= north or west >= east:
+            raise ValueError(f"Bounding box '{bbox}' is empty (south must be < north and west < east)")
+        return cls(south, west, north, east)
+
+    @property
+    def center(self) -> tuple[float, float]:
+        return (self.south + self.north) / 2, (self.west + self.east) / 2
+
+    def zoom(self, viewport_px: int = 1000) -> int:
+        # At zoom z a viewport of N pixels spans 360 * N / (256 * 2^z) degrees of longitude
+        lng_span = max(self.east - self.west, 1e-6)
+        zoom = floor(log2(360 * viewport_px / (256 * lng_span)))
+        return max(self._min_zoom, min(self._max_zoom, zoom))
+
+    def to_url(self, query: str, viewport_px: int = 1000) -> str:
+        lat, lng = self.center
+        return f"https://www.google.com/maps/search/{quote_plus(query)}/@{lat:.6f},{lng:.6f},{self.zoom(viewport_px)}z"
+
+    def contains(self, lat: float, lng: float) -> bool:
+        return self.south <= lat <= self.north and self.west <= lng <= self.east
+
+    def subdivide(self) -> list["Tile"]:
+        mid_lat, mid_lng = self.center
+        return [Tile(self.south, self.west, mid_lat, mid_lng, self.depth + 1),
+                Tile(self.south, mid_lng, mid_lat, self.east, self.depth + 1),
+                Tile(mid_lat, self.west, self.north, mid_lng, self.depth + 1),
+                Tile(mid_lat, mid_lng, self.north, self.east, self.depth + 1)]
+
+    def grid(self, rows: int, cols: int) -> list["Tile"]:
+        lat_step = (self.north - self.south) / rows
+        lng_step = (self.east - self.west) / cols
+        return [Tile(self.south + row * lat_step, self.west + col * lng_step,
+                     self.south + (row + 1) * lat_step, self.west + (col + 1) * lng_step, self.depth)
+                for row in range(rows) for col in range(cols)]
+
+    def __repr__(self):
+        return f"Tile({self.south:.5f},{self.west:.5f},{self.north:.5f},{self.east:.5f}, depth={self.depth})"
+
+
+class TiledSearch:
+    def __init__(self, maps_factory, query: str, bbox: Tile, workers: int = 2, grid: int = 2, tile_cap: int = 100,
+                 max_depth: int = 4, limit: int = None, update_callback=None, stop_flag=None) -> None:
+        self._maps_factory = maps_factory
+        self._query = query
+        self._workers = max(1, workers)
+        self._tile_cap = tile_cap
+        self._max_depth = max_depth
+        self._limit = limit
+        self._update_callback = update_callback
+        self._stop_flag = stop_flag or (lambda: False)
+
+        self._tiles = deque(bbox.grid(grid, grid))
+        self._busy_workers = 0
+        self._condition = Condition()
+        self._seen_lock = Lock()
+        self._seen_places = set()
+        self.tiles_searched = 0
+        self.tiles_split = 0
+        # Blocked tiles and browsers that never launched, a queue job with any of them is retried
+        self.errors = []
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    def _claim_new_links(self, links: list[str]) -> list[str]:
+        # Neighbouring tiles overlap at the edges, each place is only visited by the first tile that saw it
+        new_links = []
+        with self._seen_lock:
+            for link in links:
+                if self._limit and len(self._seen_places) >= self._limit:
+                    break
+                key = HrefParser.place_key(link)
+                if key not in self._seen_places:
+                    self._seen_places.add(key)
+                    new_links.append(link)
+        return new_links
+
+    def _limit_reached(self) -> bool:
+        return bool(self._limit) and len(self._seen_places) >= self._limit
+
+    def _next_tile(self):
+        with self._condition:
+            while True:
+                if self._stop_flag() or self._limit_reached():
+                    return None
+                if self._tiles:
+                    self._busy_workers += 1
+                    return self._tiles.popleft()
+                if self._busy_workers == 0:
+                    return None
+                # Another worker may still split its tile into children
+                self._condition.wait(timeout=0.5)
+
+    def _finish_tile(self, children: list[Tile]):
+        with self._condition:
+            self._tiles.extend(children)
+            self._busy_workers -= 1
+            self.tiles_searched += 1
+            self.tiles_split += bool(children)
+            self._condition.notify_all()
+
+    def _search_tile(self, maps_obj, driver: list, tile: Tile, detail_pool):
+        # driver is the worker's one slot, a driver recycled here is swapped into it before anything can raise
+        # The cap is judged on the raw feed, only links that aren't near-duplicates are visited
+        kept_links = []
+        links = maps_obj.collect_tile_links(driver[0], tile.to_url(self._query), self._stop_flag, kept_links.append)
+        children = tile.subdivide() if len(links) >= self._tile_cap and tile.depth < self._max_depth else []
+        new_links = self._claim_new_links(kept_links)
+
+        records = []
+        try:
+            if detail_pool is not None:
+                batch = detail_pool.new_batch(query=self._query, update_callback=self._update_callback,
+                                              place_index=maps_obj.place_index)
+                for link in new_links:
+                    batch.submit(link)
+                batch.wait(self._stop_flag)
+                records = batch.records
+                if batch.errors:
+                    raise batch.errors[0]
+            else:
+                for link in new_links:
+                    if self._stop_flag() or not maps_obj.pace(self._stop_flag):
+                        break
+                    driver[0] = maps_obj.recycle_if_needed(driver[0], block_images=False)
+                    try:
+                        record = maps_obj.scrape_place_url(driver[0], link, self._query)
+                    except (PageBlocked, ScrapeCancelled):
+                        # A block ends the tile and lands in errors, the rest of its places would be blocked too
+                        raise
+                    except Exception as e:
+                        self.logger.error(f"An error occurred while scraping place '{link}': {e}")
+                        continue
+                    if record is None:
+                        continue
+                    records.append(record)
+                    if self._update_callback:
+                        self._update_callback(1)
+        finally:
+            # Places read before a block are kept
+            if records:
+                maps_obj.store_records(records)
+        return children
+
+    def _tile_worker(self, detail_pool):
+        maps_obj = self._maps_factory()
+        driver = [None]
+        try:
+            driver[0] = maps_obj.create_chrome_driver(block_images=detail_pool is not None)
+            while True:
+                tile = self._next_tile()
+                if tile is None:
+                    break
+                children = []
+                try:
+                    # Every tile starts from its own URL, nothing has to be restored on a recycled driver
+                    driver[0] = maps_obj.recycle_if_needed(driver[0], block_images=detail_pool is not None)
+                    children = self._search_tile(maps_obj, driver, tile, detail_pool)
+                except Exception as e:
+                    self.errors.append(f"{tile}: {e}")
+                    self.logger.error(f"An error occurred while searching {tile}: {e}")
+                finally:
+                    self._finish_tile(children)
+        except Exception as e:
+            self.errors.append(f"tile worker: {e}")
+            self.logger.error(f"Not able to start a tile worker: {e}")
+        finally:
+            if driver[0] is not None:
+                maps_obj.quit_driver(driver[0])
+
+    def run(self, detail_pool=None) -> int:
+        threads = [Thread(target=self._tile_worker, args=(detail_pool,), name=f"tile-worker-{index}", daemon=True)
+                   for index in range(self._workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.logger.info(f"Tiled search for '{self._query}' finished: {self.tiles_searched} tiles searched, "
+                         f"{self.tiles_split} split, {len(self._seen_places)} unique places")
+        return len(self._seen_places)
@@ -10,22 +10,49 @@ from selenium.common.exceptions import (TimeoutException, NoSuchElementException
 from selenium_stealth import stealth
 from os.path import exists
 from os import mkdir
-from time import time
+from time import time, monotonic, sleep
 import logging
 
 from utils.web_site_scraper import PatternScraper
-from utils.dict_cleaner_and_writer import DictCleaner
 from utils.output_files_formats import CSVCreator
 from utils.pprints import PPrints
+from utils.href_parser import HrefParser
+from utils.place_record import Place
+from utils.rate_controller import AdaptiveRateController, PageBlocked
+from utils.page_state import PageState
+from utils.page_patterns import PagePatterns
+from utils.domain_router import DomainRouter
+from utils.cdp_backend import CDPBackend, SeleniumBackend
+from utils.tab_pool import TabPool
+from utils.cancellation import ScrapeCancelled
 from threading import Lock
 
+
+class CancellableWait(WebDriverWait):
+    def __init__(self, driver, timeout: float, stop_flag=None, **kwargs):
+        super().__init__(driver, timeout, poll_frequency=0.25, **kwargs)
+        self._stop_flag = stop_flag or (lambda: False)
+
+    def until(self, method, message: str = ""):
+        # Every poll also checks the stop flag, so Stop never waits out a full wait_time
+        result = super().until(lambda driver: self._stop_flag() or method(driver), message)
+        if self._stop_flag():
+            raise ScrapeCancelled()
+        return result
+
+
 class GoogleMaps:
     _maps_url = "https://www.google.com/maps"
-    temp_list = []
+    # A single results feed stops growing around this many places
+    _feed_cap = 120
 
     def __init__(self, driver_path: str, unavailable_text: str = "Not Available", headless: bool = False,
                  wait_time: int = 15, suggested_ext: list = None, output_path: str = "./CSV_FILES",
-                 verbose: bool = True, result_range: int = None, print_lock: Lock = None):
+                 verbose: bool = True, result_range: int = None, print_lock: Lock = None, bootstrap=None,
+                 async_enrichment: bool = False, rate_controller: AdaptiveRateController = None,
+                 place_index=None, driver_registry=None, stop_flag=None, supervisor=None, archive=None,
+                 review_scraper=None, review_sink=None, identity_pool=None, domain_router=None, delta=None,
+                 backend: str = "selenium", tabs: int = 0):
         if suggested_ext is None:
             suggested_ext = []
 
@@ -40,10 +67,27 @@ class GoogleMaps:
         self._results_range = result_range
 
         self._web_pattern_scraper = PatternScraper()
-        self._csv_creator = CSVCreator(output_path=output_path, file_lock=print_lock)
-        self._dict_cleaner = DictCleaner(unavailable_data=unavailable_text)
-        self._print = PPrints(print_lock=print_lock)
+        self._csv_creator = CSVCreator(output_path=output_path, file_lock=print_lock, unavailable_text=unavailable_text)
+        self._print = PPrints(print_lock=print_lock, browser_memory=supervisor.summary if supervisor else None)
         self._driver_path = driver_path
+        self._bootstrap = bootstrap
+        self._async_enrichment = async_enrichment
+        self._rate_controller = rate_controller
+        self._place_index = place_index
+        self._driver_registry = driver_registry
+        self._stop_flag = stop_flag or (lambda: False)
+        self._supervisor = supervisor
+        self._archive = archive
+        self._review_scraper = review_scraper
+        self._review_sink = review_sink
+        self._identity_pool = identity_pool
+        self._domain_router = domain_router or DomainRouter()
+        self._delta = delta
+        # "cdp" sends navigation, page state checks and feed scripts straight to Chrome's DevTools socket
+        self._backend = backend
+        self._pages = {}
+        # Long-lived tabs per browser for the listing flow, 0 opens and closes a tab for every place
+        self._tabs = tabs
 
         self.is_path_available()
         self.setup_logging()
@@ -56,7 +100,7 @@ class GoogleMaps:
         if not exists(self._output_path):
             mkdir(self._output_path)
 
-    def create_chrome_driver(self):
+    def create_chrome_driver(self, bind_wait: bool = True, block_images: bool = False):
         options = Options()
         options.add_argument('--start-maximized')
         options.add_argument('--disable-infobars')
@@ -74,50 +118,196 @@ class GoogleMaps:
         if self._headless:
             options.add_argument("--headless=new")
 
-        driver = Chrome(service=Service(self._driver_path), options=options)
-        stealth(driver=driver, languages=["en-US", "en"], vendor="Google Inc.", platform="Win32",
-                webgl_vendor="Intel Inc.", renderer="Intel Iris OpenGL Engine", fix_hairline=True,
-                run_on_insecure_origins=False)
-        self._wait = WebDriverWait(driver, self._wait_time, ignored_exceptions=(NoSuchElementException,
-                                                                                StaleElementReferenceException))
+        # Each browser gets its own UA, fingerprint and proxy so workers on one host don't get throttled as one.
+        # Taken before the profile, waiting for a free identity must not hold a profile
+        identity = self._identity_pool.acquire(self._stop_flag) if self._identity_pool else None
+
+        profile_path = self._bootstrap.acquire_profile() if self._bootstrap else ""
+        if profile_path:
+            for flag in self._bootstrap.profile_flags(profile_path):
+                options.add_argument(flag)
+
+        if identity:
+            options.add_argument(f"--user-agent={identity.user_agent}")
+            if identity.proxy:
+                options.add_argument(f"--proxy-server={identity.proxy}")
+
+        # Place tabs load in the background while another tab is read, Chrome must not throttle them
+        if self._tabs > 0:
+            options.add_argument("--disable-background-timer-throttling")
+            options.add_argument("--disable-renderer-backgrounding")
+            options.add_argument("--disable-backgrounding-occluded-windows")
+
+        # The listing driver only reads anchors from the feed, images are dead weight there
+        if block_images:
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+        try:
+            driver = Chrome(service=Service(self._driver_path), options=options)
+        except Exception:
+            if profile_path:
+                self._bootstrap.release_profile(profile_path=profile_path)
+            if identity:
+                self._identity_pool.discard(identity)
+            raise
+        if profile_path:
+            self._bootstrap.attach_profile(driver, profile_path)
+        if self._driver_registry:
+            self._driver_registry.register(driver)
+        if self._supervisor:
+            self._supervisor.track(driver)
+
+        if identity:
+            self._identity_pool.attach(driver, identity)
+            stealth(driver=driver, **identity.stealth_options())
+        else:
+            stealth(driver=driver, languages=["en-US", "en"], vendor="Google Inc.", platform="Win32",
+                    webgl_vendor="Intel Inc.", renderer="Intel Iris OpenGL Engine", fix_hairline=True,
+                    run_on_insecure_origins=False)
+        if self._backend == CDPBackend.name:
+            try:
+                self._pages[id(driver)] = CDPBackend.from_driver(driver, timeout=self._wait_time * 2)
+            except Exception as e:
+                self.logger.error(f"Not able to attach to DevTools, this driver stays on Selenium: {e}")
+        # Pooled drivers keep their own waits so they don't rebind the listing driver's one
+        if bind_wait:
+            self._wait = self.create_wait(driver)
         return driver
 
-    @staticmethod
-    def load_url(driver, url):
-        driver.get(url)
+    def create_wait(self, driver):
+        return CancellableWait(driver, self._wait_time, stop_flag=self._stop_flag,
+                               ignored_exceptions=(NoSuchElementException, StaleElementReferenceException))
+
+    def check_stop(self):
+        if self._stop_flag():
+            raise ScrapeCancelled()
+
+    def quit_driver(self, driver):
+        if self._driver_registry:
+            self._driver_registry.unregister(driver)
+        if self._supervisor:
+            self._supervisor.forget(driver)
+        if self._identity_pool:
+            self._identity_pool.release(driver)
+        page = self._pages.pop(id(driver), None)
+        if page is not None:
+            page.close()
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.error(f"Not able to quit the driver cleanly: {e}")
+        finally:
+            if self._bootstrap:
+                self._bootstrap.release_profile(driver)
+
+    def needs_recycle(self, driver) -> bool:
+        if self._identity_pool is not None and self._identity_pool.is_retired(driver):
+            return True
+        return self._supervisor is not None and self._supervisor.recycle_reason(driver) is not None
+
+    def recycle_if_needed(self, driver, bind_wait: bool = True, block_images: bool = False):
+        # Returns the driver to keep using, a fresh one once the old one is over its memory or page budget
+        if not self.needs_recycle(driver):
+            return driver
+        self.quit_driver(driver)
+        return self.create_chrome_driver(bind_wait=bind_wait, block_images=block_images)
+
+    def count_page(self, driver, pages: int = 1):
+        if self._supervisor:
+            self._supervisor.page_visited(driver, pages)
+
+    def restore_search(self, driver, query: str, stop_flag=None) -> list:
+        # A recycled listing driver replays the search and reloads the feed, the caller resumes at the same index
+        self.open_maps(driver)
+        if not self.run_search(driver, query, stop_flag):
+            return []
+        self._main_handler = driver.current_window_handle
+        return self.scroll_to_the_end_event(driver)
+
+    def page(self, driver):
+        # The driver's first tab behind the configured backend, element lookups and other tabs stay on Selenium
+        return self._pages.get(id(driver)) or SeleniumBackend(driver)
+
+    def load_url(self, driver, url):
+        self.page(driver).navigate(url)
+
+    def accept_consent(self, driver):
+        if "consent.google." in driver.current_url or driver.find_elements(By.CSS_SELECTOR, 'form[action*="consent"]'):
+            buttons = driver.find_elements(By.CSS_SELECTOR, 'button[aria-label="Accept all"]') or \
+                driver.find_elements(By.CSS_SELECTOR, 'form[action*="consent"] button')
+            if buttons:
+                buttons[-1].click()
+                self.create_wait(driver).until(lambda d: "consent.google." not in d.current_url)
+
+        # Consent cookies now live in the persistent profile, later launches skip this page
+        if self._bootstrap:
+            profile_path = self._bootstrap.profile_of(driver)
+            if not self._bootstrap.is_warm(profile_path):
+                self._bootstrap.mark_warm(profile_path)
+
+    def open_maps(self, driver):
+        self.load_url(driver, self._maps_url)
+        self.accept_consent(driver)
 
     def search_query(self, query):
         search_box = self._wait.until(EC.presence_of_element_located((By.ID, "searchboxinput")))
         search_box.send_keys(query)
         search_box.send_keys(Keys.RETURN)
 
-    def validate_result_link(self, result, driver):
-        if result != "continue":
-            get_link = result.get_attribute("href")
-            driver.execute_script(f'''window.open("{get_link}", "_blank");''')
-            driver.switch_to.window(driver.window_handles[-1])
-        else:
-            get_link = driver.current_url
-
-        try:
-            self._wait.until(EC.url_contains("@"))
-            lat_lng = driver.current_url.split("@")[1].split(",")[:2]
-        except Exception:
-            lat_lng = [self._unavailable_text, self._unavailable_text]
+    def pace(self, stop_flag=None) -> bool:
+        if self._rate_controller is None:
+            return True
+        return self._rate_controller.acquire(stop_flag=stop_flag)
+
+    def report_signal(self, signal: str, driver=None):
+        if self._rate_controller is not None:
+            self._rate_controller.report(signal)
+        if self._identity_pool is not None and driver is not None:
+            self._identity_pool.report(driver, signal)
+
+    def settle_page(self, driver, states: tuple, page=None) -> str:
+        # Checks the page state every 100ms instead of waiting wait_time for one selector. Consent is clicked away once,
+        # block and consent pages return at once, anything else outside states counts as still loading
+        page = page or self.page(driver)
+        deadline = monotonic() + self._wait_time
+        consent_handled = False
+        while True:
+            state = PageState.wait_for(page, (*states, PageState.CONSENT, PageState.BLOCKED),
+                                       max(0.0, deadline - monotonic()), self._stop_flag)
+            if state != PageState.CONSENT or consent_handled:
+                break
+            consent_handled = True
+            self.accept_consent(driver)
 
-        return lat_lng[0], lat_lng[1], get_link
+        if state == PageState.BLOCKED:
+            self.report_signal(AdaptiveRateController.BLOCKED, driver)
+        elif state not in states:
+            self.report_signal(AdaptiveRateController.TIMEOUT, driver)
+        return state
 
-    def get_title(self, result, driver):
-        if result != "continue":
-            get_link = result.get_attribute("href")
-            driver.execute_script(f'''window.open("{get_link}", "_blank");''')
-            driver.switch_to.window(driver.window_handles[-1])
-        else:
-            get_link = driver.current_url
+    @staticmethod
+    def raise_unless_settled(state: str, states: tuple, what: str):
+        # An empty feed is a result, a block or a page that never settled has to fail the job instead of ending it
+        if state == PageState.BLOCKED:
+            raise PageBlocked(f"Blocked while {what}")
+        if state not in states:
+            raise TimeoutException(f"Page never settled while {what} (page state: {state})")
+
+    def run_search(self, driver, query: str, stop_flag=None) -> bool:
+        if not self.pace(stop_flag):
+            return False
+        # Any settled Maps page has the search box, a block page fails here without a wait_time timeout
+        state = self.settle_page(driver, (PageState.SEARCH, PageState.FEED, PageState.PLACE, PageState.EMPTY))
+        if state == PageState.BLOCKED:
+            raise PageBlocked(f"Blocked while searching '{query}'")
+        if state in (PageState.CONSENT, PageState.LOADING):
+            raise TimeoutException(f"Search box never showed up for '{query}' (page state: {state})")
+        self.search_query(query)
+        return True
+
+    def get_title(self, driver):
         try:
-            title = driver.find_element(By.CSS_SELECTOR, '#QA0Szd > div > div > div.w6VYqd > div.bJzME.tTVLSc > div > '
-                                                         'div.e07Vkf.kA9KIf > div > div > div.TIHn2 > div > '
-                                                         'div.lMbq3e > div:nth-child(1) > h1')
+            title = driver.find_element(By.XPATH, PagePatterns.title)
             title_text = title.text
         except Exception:
             title_text = self._unavailable_text
@@ -125,19 +315,23 @@ class GoogleMaps:
 
     def get_rating_in_card(self, driver):
         try:
-            rating = driver.find_element(By.CSS_SELECTOR, '#QA0Szd > div > div > div.w6VYqd > div.bJzME.tTVLSc > div '
-                                                          '> div.e07Vkf.kA9KIf > div > div > div.TIHn2 > div > '
-                                                          'div.lMbq3e > div.LBgpqf > div > div.fontBodyMedium.dmRWX > '
-                                                          'div.F7nice > span:nth-child(1) > span:nth-child(1)')
+            rating = driver.find_element(By.XPATH, PagePatterns.rating)
             rating_text = rating.text
         except Exception:
             rating_text = self._unavailable_text
         return rating_text
 
+    def get_review_count(self, driver):
+        try:
+            reviews = driver.find_element(By.XPATH, PagePatterns.review_count)
+            review_text = reviews.get_attribute("aria-label") or reviews.text
+        except Exception:
+            review_text = self._unavailable_text
+        return review_text
+
     def get_website_link(self, driver):
         try:
-            website = driver.find_element(By.CSS_SELECTOR, 'div.UCw5gc > div > div:nth-child(1) > a['
-                                                           'data-tooltip="Open website"]')
+            website = driver.find_element(By.XPATH, PagePatterns.website)
             website_href = website.get_attribute("href")
         except Exception:
             website_href = self._unavailable_text
@@ -145,9 +339,8 @@ class GoogleMaps:
 
     def get_phone_number(self, driver):
         try:
-            phone = driver.find_elements(By.CLASS_NAME, 'rogA2c')
-            phone_href = next((ph.text for ph in phone if ph.text.replace("(", "").replace(")", "").replace(" ", "")
-                              .replace("+", "").replace("-", "").isnumeric()), self._unavailable_text)
+            phone = driver.find_elements(By.XPATH, PagePatterns.phone)
+            phone_href = next((ph.text for ph in phone if PagePatterns.is_phone(ph.text)), self._unavailable_text)
         except Exception:
             phone_href = self._unavailable_text
         return phone_href
@@ -173,24 +366,44 @@ class GoogleMaps:
             about_dict = {"about_desc": self._unavailable_text}
         return about_dict
 
+    def create_tab_pool(self, driver) -> TabPool:
+        page_factory = None
+        if id(driver) in self._pages:
+            address = driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+            page_factory = lambda handle: CDPBackend(address, handle, timeout=self._wait_time * 2)
+        return TabPool(driver, self._tabs, page_factory=page_factory)
+
     def reset_driver_for_next_run(self, result, driver):
         if result != "continue":
             driver.close()
             driver.switch_to.window(self._main_handler)
             self._wait.until(EC.presence_of_element_located((By.CLASS_NAME, "hfpxzc")))
 
-    def scroll_to_the_end_event(self, driver):
-        try:
-            self._wait.until(EC.presence_of_element_located((By.CLASS_NAME, "hfpxzc")))
-        except TimeoutException:
-            results = ["continue"]
-            return results
+    def feed_read(self, query: str, hrefs: list[str]):
+        # The whole feed was listed: every place in it is still there, even the ones dedupe keeps from a visit
+        if self._delta is not None and query:
+            self._delta.feed_read(query, [HrefParser.place_key(href, "") for href in hrefs])
+
+    def scroll_to_the_end_event(self, driver, query: str = None):
+        # query is only passed by the first listing of a search, the delta export learns whether its feed ended
+        listing_states = (PageState.FEED, PageState.PLACE, PageState.EMPTY)
+        state = self.settle_page(driver, listing_states)
+        self.raise_unless_settled(state, listing_states, f"listing '{query or driver.current_url}'")
+        self.report_signal(AdaptiveRateController.OK, driver)
+        if state == PageState.PLACE:
+            self.feed_read(query, [driver.current_url])
+            return ["continue"]
+        if state == PageState.EMPTY:
+            self.feed_read(query, [])
+            return []
 
         scroll_end = 'div.PbZDve  > p.fontBodyMedium  > span > span[class="HlvSq"]'
         start_time = time()
         scroll_wait = 1
         while True:
             results = driver.find_elements(By.CLASS_NAME, 'hfpxzc')
+            if self._stop_flag():
+                break
             if self._results_range and len(results) >= self._results_range:
                 results = results[:self._results_range + 1]
                 break
@@ -200,6 +413,8 @@ class GoogleMaps:
             try:
                 text_span = driver.find_element(By.CSS_SELECTOR, scroll_end)
                 if "you've reached the end" in text_span.text.lower():
+                    self.feed_read(query, driver.execute_script(
+                        "return Array.from(document.getElementsByClassName('hfpxzc'), anchor => anchor.href);"))
                     break
             except NoSuchElementException:
                 pass
@@ -209,104 +424,526 @@ class GoogleMaps:
 
         return results
 
-    def _scrape_result_and_store(self, driver, mode, result, query, results_indices, update_callback, stop_flag, lenn):
-        # if stop_flag():
-        #     return
-        if len(GoogleMaps.temp_list) == lenn:
+    @property
+    def place_index(self):
+        return self._place_index
+
+    def is_duplicate_listing(self, href: str, name: str = "") -> bool:
+        # Only a lookup, a listing counts as seen once is_duplicate_place kept its record
+        if self._place_index is None:
+            return False
+        lat, lng = HrefParser.coordinates(href) or (None, None)
+        return self._place_index.find_duplicate(HrefParser.place_key(href), lat, lng, name) is not None
+
+    def is_duplicate_phone(self, place: Place, place_index=None) -> bool:
+        place_index = self._place_index if place_index is None else place_index
+        if place_index is None or place.lat is None or place.long is None:
+            return False
+        return place_index.check_phone(place.place_id, place.phone_number, place.lat, place.long) is not None
+
+    def is_duplicate_place(self, url: str, place: Place, place_index=None) -> bool:
+        # Indexes a fully scraped place, of two overlapping visits to one listing the later record is dropped
+        place_index = self._place_index if place_index is None else place_index
+        if place_index is None:
+            return False
+        duplicate_of = place_index.check_and_add(HrefParser.place_key(url), place.lat, place.long, place.title or "")
+        return duplicate_of is not None
+
+    def archive_page(self, kind: str, url: str, html: str, place_id: str = "", query: str = ""):
+        if self._archive is None or not html:
             return
-        temp_data = {}
-
-        # if self._verbose:
-        #     self._print.print_with_lock(query=query, status="Getting Latitude and longitude", mode=mode,
-        #                                 results_indices=results_indices)
-        # map_link = self.validate_result_link(result, driver)
-
-        if self._verbose:
-            self._print.print_with_lock(query=query, status="Getting title", mode=mode, results_indices=results_indices)
-        card_title = self.get_title(result,driver)
-
-        if self._verbose:
-            self._print.print_with_lock(query=query, status="Getting rating", mode=mode, results_indices=results_indices)
-        card_rating = self.get_rating_in_card(driver)
+        try:
+            self._archive.put(kind, url, html, place_id=place_id or "", query=query or "")
+        except Exception as e:
+            self.logger.error(f"Not able to archive '{url}': {e}")
 
-        if self._verbose:
-            self._print.print_with_lock(query=query, status="Getting WebLink", mode=mode, results_indices=results_indices)
-        card_website_link = self.get_website_link(driver)
+    def scrape_reviews(self, driver, place: Place) -> int:
+        # Runs on the place page after its fields are read, the reviews tab replaces the overview pane
+        if self._review_scraper is None or self._review_sink is None:
+            return 0
+        try:
+            return self._review_scraper.scrape(driver, place, self._review_sink, self._stop_flag)
+        except Exception as e:
+            self.logger.error(f"Not able to scrape reviews of '{place.title}': {e}")
+            return 0
+
+    def get_website_data(self, driver, website: str, pattern_scraper: PatternScraper = None, place_id: str = "",
+                         query: str = "") -> dict:
+        # With async enrichment the contact pages are fetched in bulk right before the CSV dump
+        if self._async_enrichment:
+            return {"site_email": self._unavailable_text}
+        pattern_scraper = pattern_scraper or self._web_pattern_scraper
+        source_sink = None
+        if self._archive is not None:
+            source_sink = lambda url, html: self.archive_page("contact", url, html, place_id, query)
+
+        # Social, booking and directory pages have no contact page worth crawling, link-in-bio pages need one fetch
+        kind = self._domain_router.route(website)
+        if kind != DomainRouter.SITE:
+            generic_fetches = len(pattern_scraper.create_urls(website, self._suggested_ext))
+            if kind != DomainRouter.AGGREGATOR:
+                self._domain_router.record(kind, generic_fetches, 0)
+                return self._domain_router.link_data(website, self._unavailable_text)
+            self._domain_router.record(kind, generic_fetches, 1)
+            self.count_page(driver)
+            try:
+                sources = pattern_scraper.read_pages(driver, [website], source_sink)
+            except Exception:
+                sources = []
+            return self._domain_router.aggregator_data(website, sources, pattern_scraper, self._unavailable_text)
+
+        if website and website != self._unavailable_text:
+            self.count_page(driver, 1 + len(self._suggested_ext))
+        return pattern_scraper.find_patterns(driver, website, self._suggested_ext, self._unavailable_text,
+                                             source_sink=source_sink)
+
+    def enrich_records(self, records: list[dict]):
+        if not self._async_enrichment or not records:
+            return
+        from utils.async_site_enricher import AsyncSiteEnricher
+
+        source_sink = None
+        if self._archive is not None:
+            source_sink = lambda record, url, html: self.archive_page("contact", url, html, record.get("place_id"),
+                                                                      record.get("query"))
+        stats = AsyncSiteEnricher(suggested_ext=self._suggested_ext, unavailable_text=self._unavailable_text,
+                                  source_sink=source_sink, domain_router=self._domain_router).enrich_records(records)
+        self.logger.info(f"Enriched {stats.get('sites', 0)} websites with {stats.get('fetches', 0)} fetches "
+                         f"in {stats.get('elapsed', 0):.2f}s, {stats.get('routed', 0)} social/booking/directory "
+                         f"links routed past the crawl")
+
+    def collect_place_links(self, driver, link_callback=None, limit: int = -1, query: str = None) -> list[str]:
+        links = []
+        for href, name in self.iter_place_links(driver, limit, query):
+            links.append(href)
+            # Near-duplicates still count towards the feed size but never reach a detail visit
+            if link_callback and not self.is_duplicate_listing(href, name):
+                link_callback(href)
+        return links
+
+    def iter_place_links(self, driver, limit: int = -1, query: str = None):
+        # Yields (href, name) as every scroll round reveals them. The feed is read through the backend page, so a
+        # consumer that reads places in another Selenium window switches back before asking for the next link
+        # -1 keeps the object's own result range, callers serving several limits pass theirs
+        limit = self._results_range if limit == -1 else limit
+        listing_states = (PageState.FEED, PageState.PLACE, PageState.EMPTY)
+        state = self.settle_page(driver, listing_states)
+        self.raise_unless_settled(state, listing_states, f"listing '{query or driver.current_url}'")
+        self.report_signal(AdaptiveRateController.OK, driver)
+        if state == PageState.EMPTY:
+            self.feed_read(query, [])
+            return
+        if state == PageState.PLACE:
+            # Search landed directly on a single place
+            self.feed_read(query, [driver.current_url])
+            yield driver.current_url, ""
+            return
 
-        if self._verbose:
-            self._print.print_with_lock(query=query, status="Getting WebLink Data", mode=mode, results_indices=results_indices)
-        website_data = self._web_pattern_scraper.find_patterns(driver, card_website_link, self._suggested_ext,
-                                                               self._unavailable_text)
+        scroll_end = 'div.PbZDve  > p.fontBodyMedium  > span > span[class="HlvSq"]'
+        # Only time spent scrolling counts, not the time a consumer spends between links
+        scroll_time = 0.0
+        scroll_wait = 1
+        links = []
+        seen_links = set()
+        page = self.page(driver)
+        # Later element lookups on this driver keep the implicit wait they always had
+        driver.implicitly_wait(scroll_wait)
+        while not self._stop_flag():
+            round_start = time()
+            # One round trip for every href and name instead of get_attribute calls per element
+            anchors = page.execute_script("return Array.from(document.getElementsByClassName('hfpxzc'), "
+                                          "anchor => [anchor.href, anchor.getAttribute('aria-label') || '']);")
+            new_anchors = []
+            for href, name in anchors:
+                if href not in seen_links:
+                    seen_links.add(href)
+                    new_anchors.append((href, name))
+            scroll_time += time() - round_start
+
+            for href, name in new_anchors:
+                links.append(href)
+                yield href, name
+                if limit and len(links) >= limit:
+                    return
+
+            round_start = time()
+            page.execute_script("const anchors = document.getElementsByClassName('hfpxzc');"
+                                "anchors[anchors.length - 1].scrollIntoView(true);")
+            # Same one second grace the implicit wait gave the end marker, polled through the backend
+            if page.wait_for_selector(scroll_end, scroll_wait) and "you've reached the end" in (page.execute_script(
+                    "return document.querySelector(arguments[0]).innerText;", scroll_end) or "").lower():
+                # Only an end marker without a limit cut proves the feed is complete
+                self.feed_read(query, links)
+                return
+
+            scroll_time += time() - round_start
+            if scroll_time > 60:
+                return
+
+    def probe_feed(self, driver, query: str, stop_flag=None) -> int:
+        # One search and one scroll: an exact count when the feed ends on the first screen, the feed cap otherwise
+        self.open_maps(driver)
+        if not self.run_search(driver, query, stop_flag):
+            return 0
+        state = self.settle_page(driver, (PageState.FEED, PageState.PLACE, PageState.EMPTY))
+        if state != PageState.FEED:
+            return 1 if state == PageState.PLACE else 0
+        page = self.page(driver)
+        page.execute_script("const anchors = document.getElementsByClassName('hfpxzc');"
+                            "anchors[anchors.length - 1].scrollIntoView(true);")
+        sleep(1)
+        count, ended = page.execute_script(
+            "const end = document.querySelector('span.HlvSq');"
+            "return [document.getElementsByClassName('hfpxzc').length, "
+            "end !== null && end.innerText.toLowerCase().includes(\"you've reached the end\")];")
+        return count if ended else max(count, self._feed_cap)
+
+    def scrape_links(self, links: list[str], query: str, update_callback, stop_flag) -> int:
+        # One driver working through a share of a split query's places, the share is stored when it is done
+        driver = None
+        records = []
+        try:
+            driver = self.create_chrome_driver(bind_wait=False)
+            for link in links:
+                if stop_flag() or not self.pace(stop_flag):
+                    break
+                driver = self.recycle_if_needed(driver, bind_wait=False)
+                try:
+                    record = self.scrape_place_url(driver, link, query)
+                except ScrapeCancelled:
+                    break
+                except Exception as e:
+                    self.logger.error(f"An error occurred while scraping place '{link}': {e}")
+                    continue
+                if record is not None:
+                    records.append(record)
+                    update_callback(1)
+        finally:
+            if records:
+                self.store_records(records)
+            if driver is not None:
+                self.quit_driver(driver)
+        return len(records)
+
+    def collect_tile_links(self, driver, url: str, stop_flag=None, link_callback=None) -> list[str]:
+        if not self.pace(stop_flag):
+            return []
+        self.load_url(driver, url)
+        self.accept_consent(driver)
+        return self.collect_place_links(driver, link_callback=link_callback)
+
+    def store_records(self, records: list[dict]):
+        # A cancelled run flushes what it has straight away, enrichment would stretch the shutdown
+        if not self._stop_flag():
+            self.enrich_records(records)
+        self._csv_creator.create_csv(list_of_dict_data=records)
+        if self._delta is not None:
+            self._delta.observe(records)
+
+    def scrape_place_url(self, driver, url: str, query: str, pattern_scraper: PatternScraper = None, place_index=None):
+        # Opens the place on the driver's backend page, detail drivers, tiles and split chunks visit places by URL
+        self.load_url(driver, url)
+        return self.visit_place(driver, url, query, pattern_scraper=pattern_scraper, place_index=place_index)
+
+    def visit_place(self, driver, url: str, query: str, page=None, pattern_scraper: PatternScraper = None,
+                    place_index=None, progress=None):
+        # Every flow reads a place here once it is open in the driver's current tab. page is what the place is
+        # polled through, place_index overrides the object's own (detail drivers serve batches of several jobs).
+        # Returns the record, or None for a duplicate
+        page = page or self.page(driver)
+        progress = progress or (lambda status: None)
+        self.count_page(driver)
+        state = self.settle_page(driver, (PageState.PLACE,), page)
+        if state == PageState.BLOCKED:
+            raise PageBlocked(f"Blocked while opening '{url}'")
+        if state == PageState.PLACE:
+            self.report_signal(AdaptiveRateController.OK, driver)
+            # Only a settled place page is kept, a half-rendered pane would replay with empty fields
+            if self._archive is not None:
+                self.archive_page("place", url, page.page_source, HrefParser.place_key(url, ""), query)
+        self.check_stop()
+
+        progress("Getting place details")
+        place = Place.from_scrape(self._unavailable_text, query=query, title=self.get_title(driver),
+                                  rating=self.get_rating_in_card(driver), review_count=self.get_review_count(driver),
+                                  webpage=self.get_website_link(driver), phone_number=self.get_phone_number(driver),
+                                  **HrefParser.parse(url, self._unavailable_text))
+        # Same number right next door is the same business, merge it before paying for reviews and website enrichment
+        if self.is_duplicate_phone(place, place_index):
+            return None
+
+        if self._review_scraper is not None:
+            progress("Getting Reviews")
+            self.scrape_reviews(driver, place)
+        self.check_stop()
+
+        progress("Getting WebLink Data")
+        place.update(self.get_website_data(driver, place.get("webpage", self._unavailable_text), pattern_scraper,
+                                           place.place_id, query))
+        if self.is_duplicate_place(url, place, place_index):
+            return None
+        return place
+
+    def iter_query_places(self, driver, query: str, limit: int = -1, stop_flag=None):
+        # Yields each place as soon as it is scraped, the feed only scrolls on when the next link is needed. The feed
+        # stays in the driver's first tab, places are read in a second window that closes when the generator does
+        stop_flag = stop_flag or self._stop_flag
+        self.open_maps(driver)
+        if not self.run_search(driver, query, stop_flag):
+            return
 
-        if self._verbose:
-            self._print.print_with_lock(query=query, status="Getting Phone Number", mode=mode, results_indices=results_indices)
-        card_phone_number = self.get_phone_number(driver)
+        feed_handle = driver.current_window_handle
+        detail_handle = None
+        try:
+            for link, name in self.iter_place_links(driver, limit, query):
+                if self.is_duplicate_listing(link, name):
+                    continue
+                if stop_flag() or not self.pace(stop_flag):
+                    return
+                if detail_handle is None:
+                    driver.execute_script("window.open('about:blank', '_blank');")
+                    detail_handle = driver.window_handles[-1]
+                driver.switch_to.window(detail_handle)
+                try:
+                    detail_page = SeleniumBackend(driver)
+                    detail_page.navigate(link)
+                    record = self.visit_place(driver, link, query, detail_page)
+                except (PageBlocked, ScrapeCancelled):
+                    raise
+                except Exception as e:
+                    self.logger.error(f"An error occurred while scraping place '{link}': {e}")
+                    continue
+                finally:
+                    driver.switch_to.window(feed_handle)
+                if record is not None:
+                    yield record
+        finally:
+            if detail_handle is not None:
+                try:
+                    driver.switch_to.window(detail_handle)
+                    driver.close()
+                    driver.switch_to.window(feed_handle)
+                except Exception as e:
+                    self.logger.error(f"Not able to close the place window: {e}")
+
+    def _progress(self, query: str, mode: str, results_indices: list):
+        if not self._verbose:
+            return None
+        return lambda status: self._print.print_with_lock(query=query, status=status, mode=mode,
+                                                          results_indices=results_indices)
+
+    def _scrape_result_and_store(self, driver, mode, result, query, results_indices, update_callback, stop_flag, lenn,
+                                 records: list):
+        if stop_flag():
+            return
+        if len(records) == lenn:
+            return
+        if not self.pace(stop_flag):
+            return
 
-        # if self._verbose:
-        #     self._print.print_with_lock(query=query, status="Getting About data", mode=mode, results_indices=results_indices)
-        # card_about = self.get_about_description(driver)
+        result_link = driver.current_url if result == "continue" else result.get_attribute("href")
+        if result != "continue":
+            if self.is_duplicate_listing(result_link, result.get_attribute("aria-label")):
+                return
+            # The place opens in its own window, the feed keeps its scroll position in the main one
+            driver.execute_script('window.open(arguments[0], "_blank");', result_link)
+            driver.switch_to.window(driver.window_handles[-1])
 
-        if self._verbose:
-            self._print.print_with_lock(query=query, status="Resetting Driver", mode=mode, results_indices=results_indices)
+        progress = self._progress(query, mode, results_indices)
+        # The place is in the driver's current window, which isn't the backend page once a new window took over
+        place = self.visit_place(driver, result_link, query, SeleniumBackend(driver), progress=progress)
+        if progress:
+            progress("Resetting Driver")
         self.reset_driver_for_next_run(result, driver)
 
-        if self._verbose:
-            self._print.print_with_lock(query=query, status="Storing Data in List", mode=mode, results_indices=results_indices)
+        if place is not None:
+            records.append(place)
+            # The callback takes an increment, passing the result index made the count grow quadratically
+            update_callback(1)
 
-        temp_data["title"] = card_title
-        # temp_data["map_link"] = map_link
-        temp_data["rating"] = card_rating
-        temp_data["webpage"] = card_website_link
-        temp_data["phone_number"] = card_phone_number
-        temp_data.update(website_data)
-        # temp_data.update(card_about)
-
-        GoogleMaps.temp_list.append(temp_data)
-        update_callback(results_indices[1])
-
-    def start_scrapper(self, query: str, update_callback, stop_flag) -> None:
+    def start_scrapper(self, query: str, update_callback, stop_flag, raise_errors: bool = False) -> None:
+        # raise_errors hands failures to the caller after the partial records are stored (job queue retries)
         mode = "headless" if self._headless else "windowed"
+        self._stop_flag = stop_flag
+        driver = None
+        records_stored = False
+        # Every call keeps its own records, a worker running job after job never stores a row twice
+        records = []
         try:
             if self._verbose:
                 self._print.print_with_lock(query=query, status="Initializing Browser", mode=mode)
 
+            launch_time = time()
             driver = self.create_chrome_driver()
 
             if self._verbose:
                 self._print.print_with_lock(query=query, status="Loading URL", mode=mode)
 
-            self.load_url(driver, self._maps_url)
+            self.open_maps(driver)
 
             if self._verbose:
                 self._print.print_with_lock(query=query, status="Searching query", mode=mode)
 
-            self.search_query(query)
+            if not self.run_search(driver, query, stop_flag):
+                return
+            if self._bootstrap:
+                self._bootstrap.record_first_search(time() - launch_time)
             self._main_handler = driver.current_window_handle
 
             if self._verbose:
                 self._print.print_with_lock(query=query, status="Loading Links from GMAPS", mode=mode)
 
-            results = self.scroll_to_the_end_event(driver)
-            
+            results = self.scroll_to_the_end_event(driver, query)
+
             result_indices = [len(results), 1]
-            for result in results:
-                self._scrape_result_and_store(driver=driver, mode=mode, result=result, query=query, 
-                                              results_indices=result_indices, update_callback=update_callback, stop_flag=stop_flag, lenn = len(results))
-                result_indices[1] += 1
-                if len(GoogleMaps.temp_list) == len(results):
-                    break
+            if self._tabs > 0 and results and results[0] != "continue":
+                # Up to tabs places load at once, each is read in its own tab as soon as it settles
+                pool = self.create_tab_pool(driver)
+                next_index = 0
+                try:
+                    while not stop_flag():
+                        recycle = self.needs_recycle(driver)
+                        while not recycle and pool.free and next_index < len(results):
+                            result = results[next_index]
+                            next_index += 1
+                            href = result.get_attribute("href")
+                            if self.is_duplicate_listing(href, result.get_attribute("aria-label")):
+                                continue
+                            if not self.pace(stop_flag):
+                                break
+                            pool.load(href, (next_index, href))
+                        if not pool.loading:
+                            if not recycle or next_index >= len(results):
+                                break
+                            # The browser is only swapped once every tab is read, the feed is rebuilt on the new one
+                            pool.close()
+                            driver = self.recycle_if_needed(driver)
+                            results = self.restore_search(driver, query, stop_flag)
+                            if len(results) <= next_index:
+                                break
+                            pool = self.create_tab_pool(driver)
+                            continue
+
+                        handle, (index, href), state = pool.next_ready(self._wait_time, stop_flag)
+                        if state not in TabPool.settled_states:
+                            # The tab may still show the place it was released with, reading it would copy that one
+                            self.report_signal(AdaptiveRateController.TIMEOUT, driver)
+                            pool.release(handle)
+                            continue
+                        try:
+                            place = self.visit_place(driver, href, query, SeleniumBackend(driver),
+                                                     progress=self._progress(query, mode, [len(results), index]))
+                        finally:
+                            pool.release(handle)
+                        if place is not None:
+                            records.append(place)
+                            update_callback(1)
+                finally:
+                    pool.close()
+            else:
+                while result_indices[1] <= len(results):
+                    if stop_flag():
+                        break
+                    # Swapping the browser is only safe between places, the feed is rebuilt on the new one
+                    recycled_driver = self.recycle_if_needed(driver)
+                    if recycled_driver is not driver:
+                        driver = recycled_driver
+                        results = self.restore_search(driver, query, stop_flag)
+                        if len(results) < result_indices[1]:
+                            break
+                    result = results[result_indices[1] - 1]
+                    self._scrape_result_and_store(driver=driver, mode=mode, result=result, query=query, 
+                                                  results_indices=result_indices, update_callback=update_callback, stop_flag=stop_flag, lenn = len(results), records=records)
+                    result_indices[1] += 1
+                    if len(records) == len(results):
+                        break
             if self._verbose:
                 self._print.print_with_lock(query=query, status="Dumping data in CSV file", mode=mode)
-            
-            self._csv_creator.create_csv(list_of_dict_data=GoogleMaps.temp_list)        
-            
+
+            records_stored = True
+            if records:
+                self.store_records(records)
+        except ScrapeCancelled:
             if self._verbose:
-                self._print.print_with_lock(query=query, status="Driver Closed", mode=mode)
-            driver.close()
+                self._print.print_with_lock(query=query, status="Cancelled", mode=mode)
+        except NoSuchWindowException:
+            if self._verbose:
+                self._print.print_with_lock(query=query, status="Browser Closed", mode=mode)
+            if raise_errors:
+                raise
+        except Exception as e:
+            if self._verbose:
+                self._print.print_with_lock(query=query, status=f"Error: {str(e)}", mode=mode)
+            self.logger.error(f"An error occurred: {e}")
+            if raise_errors:
+                raise
+        finally:
+            # Whatever was scraped before a stop or a crash still reaches the CSV
+            if not records_stored and records:
+                self.store_records(records)
+            if driver is not None:
+                if self._verbose:
+                    self._print.print_with_lock(query=query, status="Driver Closed", mode=mode)
+                self.quit_driver(driver)
+
+    def start_pooled_scrapper(self, query: str, update_callback, stop_flag, detail_pool,
+                              raise_errors: bool = False) -> None:
+        mode = "headless" if self._headless else "windowed"
+        self._stop_flag = stop_flag
+        driver = None
+        batch = None
+        try:
+            if self._verbose:
+                self._print.print_with_lock(query=query, status="Initializing Listing Browser", mode=mode)
+
+            launch_time = time()
+            driver = self.create_chrome_driver(block_images=True)
+
+            if self._verbose:
+                self._print.print_with_lock(query=query, status="Loading URL", mode=mode)
+
+            self.open_maps(driver)
+
+            if self._verbose:
+                self._print.print_with_lock(query=query, status="Searching query", mode=mode)
+
+            if not self.run_search(driver, query, stop_flag):
+                return
+            if self._bootstrap:
+                self._bootstrap.record_first_search(time() - launch_time)
+
+            if self._verbose:
+                self._print.print_with_lock(query=query, status="Feeding Links to Detail Drivers", mode=mode)
+
+            batch = detail_pool.new_batch(query=query, update_callback=update_callback, place_index=self._place_index)
+            self.collect_place_links(driver, link_callback=batch.submit, query=query)
+
+            # The feed is fully read, free the listing browser while detail drivers catch up
+            self.quit_driver(driver)
+            driver = None
+
+            batch.wait(stop_flag)
+            if batch.errors:
+                raise batch.errors[0]
+
+            if self._verbose:
+                self._print.print_with_lock(query=query, status="Dumping data in CSV file", mode=mode)
+        except ScrapeCancelled:
+            if self._verbose:
+                self._print.print_with_lock(query=query, status="Cancelled", mode=mode)
         except NoSuchWindowException:
             if self._verbose:
                 self._print.print_with_lock(query=query, status="Browser Closed", mode=mode)
+            if raise_errors:
+                raise
         except Exception as e:
             if self._verbose:
                 self._print.print_with_lock(query=query, status=f"Error: {str(e)}", mode=mode)
-            self.logger.error(f"An error occurred: {e}") 
\ No newline at end of file
+            self.logger.error(f"An error occurred: {e}")
+            if raise_errors:
+                raise
+        finally:
+            if batch is not None and batch.records:
+                self.store_records(batch.records)
+            if driver is not None:
+                self.quit_driver(driver) 
\ No newline at end of file
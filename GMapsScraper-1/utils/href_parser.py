@@ -0,0 +1,49 @@
+from urllib.parse import unquote_plus, urlsplit
+import re
+
+
+class HrefParser:
+    # Listing hrefs look like /maps/place/<slug>/data=!4m7!3m6!1s0x..:0x..!8m2!3d<lat>!4d<lng>!16s..!19sChIJ..?authuser=0
+    _coordinates_pattern = re.compile(r"!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)")
+    _viewport_pattern = re.compile(r"/@(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+    _feature_id_pattern = re.compile(r"!1s(0x[0-9a-fA-F]+:0x[0-9a-fA-F]+)")
+    _place_id_pattern = re.compile(r"!19s(ChIJ[\w-]+)")
+    _slug_pattern = re.compile(r"/maps/place/([^/]+)")
+
+    fields = ("lat", "long", "place_id", "map_link", "slug")
+
+    @classmethod
+    def parse(cls, href: str, unavailable: str = "Not Available") -> dict:
+        parsed = dict.fromkeys(cls.fields, unavailable)
+        if not href or "/maps/" not in href:
+            return parsed
+
+        split_href = urlsplit(href)
+        parsed["map_link"] = f"{split_href.scheme}://{split_href.netloc}{split_href.path}"
+
+        # The place pin (!3d/!4d) is exact, the viewport centre (@lat,lng) is only a fallback
+        coordinates = cls._coordinates_pattern.search(href) or cls._viewport_pattern.search(href)
+        if coordinates:
+            parsed["lat"], parsed["long"] = coordinates.group(1), coordinates.group(2)
+
+        parsed["place_id"] = cls.place_key(href, unavailable)
+
+        slug = cls._slug_pattern.search(split_href.path)
+        if slug:
+            parsed["slug"] = unquote_plus(slug.group(1))
+        return parsed
+
+    @classmethod
+    def place_key(cls, href: str, fallback: str = None) -> str:
+        # The feature id is in every listing href while !19s is not, preferring it keeps keys stable across sources
+        place_id = cls._feature_id_pattern.search(href) or cls._place_id_pattern.search(href)
+        if place_id:
+            return place_id.group(1)
+        return href.split("?")[0] if fallback is None else fallback
+
+    @classmethod
+    def coordinates(cls, href: str):
+        coordinates = cls._coordinates_pattern.search(href) or cls._viewport_pattern.search(href)
+        if not coordinates:
+            return None
+        return float(coordinates.group(1)), float(coordinates.group(2))
@@ -0,0 +1,148 @@
+from utils.rate_controller import AdaptiveRateController
+from utils.cancellation import ScrapeCancelled
+from threading import Condition
+from time import monotonic
+import logging
+import zlib
+
+
+class Identity:
+    # Windows renderers as Chrome reports them through ANGLE, picked per user agent so a UA always comes with the same GPU
+    _renderers = (
+        ("Intel Inc.", "Intel Iris OpenGL Engine"),
+        ("Google Inc. (Intel)", "ANGLE (Intel, Intel(R) UHD Graphics 620 Direct3D11 vs_5_0 ps_5_0, D3D11)"),
+        ("Google Inc. (NVIDIA)", "ANGLE (NVIDIA, NVIDIA GeForce GTX 1060 6GB Direct3D11 vs_5_0 ps_5_0, D3D11)"),
+        ("Google Inc. (AMD)", "ANGLE (AMD, AMD Radeon RX 580 Series Direct3D11 vs_5_0 ps_5_0, D3D11)"),
+    )
+
+    def __init__(self, key: int, user_agent: str, proxy: str = "") -> None:
+        self.key = key
+        self.user_agent = user_agent
+        self.proxy = proxy
+        if "Macintosh" in user_agent:
+            self.platform = "MacIntel"
+        elif "Linux" in user_agent:
+            self.platform = "Linux x86_64"
+        else:
+            self.platform = "Win32"
+        self.webgl_vendor, self.renderer = self._renderers[zlib.crc32(user_agent.encode()) % len(self._renderers)]
+
+        self.pages = 0
+        self.blocks = 0
+        self.consecutive_blocks = 0
+        self.active_seconds = 0.0
+        self.in_use_since = None
+        self.retired_until = 0.0
+
+    @property
+    def block_rate(self) -> float:
+        return self.blocks / max(1, self.pages + self.blocks)
+
+    @property
+    def pages_per_minute(self) -> float:
+        active = self.active_seconds + (monotonic() - self.in_use_since if self.in_use_since else 0.0)
+        return self.pages * 60.0 / active if active > 0 else 0.0
+
+    def stealth_options(self) -> dict:
+        return {"languages": ["en-US", "en"], "vendor": "Google Inc.", "platform": self.platform,
+                "webgl_vendor": self.webgl_vendor, "renderer": self.renderer, "fix_hairline": True,
+                "run_on_insecure_origins": False}
+
+    def to_dict(self) -> dict:
+        return {"identity": self.key, "proxy": self.proxy, "pages": self.pages, "blocks": self.blocks,
+                "block_rate": round(self.block_rate, 3), "pages_per_minute": round(self.pages_per_minute, 2),
+                "retired": self.retired_until > monotonic()}
+
+
+class IdentityPool:
+    def __init__(self, user_agents: list = None, proxies: list = None, block_limit: int = 2,
+                 retire_seconds: float = 1800.0) -> None:
+        if user_agents is None:
+            from utils.random_users import users
+            # Only Chrome agents, a Firefox UA on top of a Chrome fingerprint is easier to spot than no UA at all
+            user_agents = [user_agent for user_agent in users if "Chrome/" in user_agent and
+                           not any(marker in user_agent for marker in ("OPR/", "Edg", "Firefox", "YaBrowser"))]
+        proxies = [proxy.strip() for proxy in proxies or [] if proxy.strip()]
+        self._identities = [Identity(key, user_agent.strip(), proxies[key % len(proxies)] if proxies else "")
+                            for key, user_agent in enumerate(user_agents)]
+        self._block_limit = block_limit
+        self._retire_seconds = retire_seconds
+        self._by_driver = {}
+        self._lock = Condition()
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    def acquire(self, stop_flag=None, poll_interval: float = 0.5) -> Identity:
+        # Free identities that have served pages with the lowest block rate go first, untried ones come next. An
+        # identity is never handed to two browsers, with all of them in use this waits for a release
+        with self._lock:
+            waiting = False
+            while True:
+                idle = [identity for identity in self._identities if identity.in_use_since is None]
+                if idle:
+                    break
+                if stop_flag and stop_flag():
+                    raise ScrapeCancelled()
+                if not waiting:
+                    waiting = True
+                    self.logger.warning(f"All {len(self._identities)} identities are in use, waiting for a browser "
+                                        f"to quit (give the pool more user agents than browsers)")
+                self._lock.wait(poll_interval)
+
+            now = monotonic()
+            # Retired ones cool down while any other identity is idle, otherwise the one closest to coming back
+            free = [identity for identity in idle if identity.retired_until <= now] or \
+                   [min(idle, key=lambda identity: identity.retired_until)]
+            identity = min(free, key=lambda identity: (identity.block_rate, identity.pages == 0, -identity.pages))
+            identity.in_use_since = now
+            return identity
+
+    def attach(self, driver, identity: Identity):
+        with self._lock:
+            self._by_driver[id(driver)] = identity
+
+    def identity_of(self, driver):
+        return self._by_driver.get(id(driver))
+
+    def release(self, driver):
+        with self._lock:
+            identity = self._by_driver.pop(id(driver), None)
+        if identity is not None:
+            self.discard(identity)
+
+    def discard(self, identity: Identity):
+        # Also used when Chrome failed to launch and the identity never got a driver
+        with self._lock:
+            if identity.in_use_since is not None:
+                identity.active_seconds += monotonic() - identity.in_use_since
+                identity.in_use_since = None
+                self._lock.notify()
+
+    def report(self, driver, signal: str):
+        identity = self.identity_of(driver)
+        if identity is None:
+            return
+        with self._lock:
+            if signal == AdaptiveRateController.OK:
+                identity.pages += 1
+                identity.consecutive_blocks = 0
+            elif signal == AdaptiveRateController.BLOCKED:
+                identity.blocks += 1
+                identity.consecutive_blocks += 1
+                if identity.consecutive_blocks >= self._block_limit and identity.retired_until <= monotonic():
+                    identity.retired_until = monotonic() + self._retire_seconds
+                    self.logger.warning(f"Identity {identity.key} retired for {self._retire_seconds:.0f}s after "
+                                        f"{identity.consecutive_blocks} blocks in a row")
+
+    def is_retired(self, driver) -> bool:
+        identity = self.identity_of(driver)
+        return identity is not None and identity.retired_until > monotonic()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [identity.to_dict() for identity in self._identities
+                    if identity.pages or identity.blocks or identity.in_use_since is not None]
@@ -0,0 +1,72 @@
+from argparse import ArgumentParser
+from os.path import dirname, abspath
+import subprocess
+import sys
+
+
+class ImportBudget:
+    def __init__(self, module: str = "maps", budget_ms: float = 150.0, runs: int = 5,
+                 forbidden: list = None, cwd: str = None) -> None:
+        self._module = module
+        self._budget_ms = budget_ms
+        self._runs = max(1, runs)
+        self._forbidden = forbidden or []
+        self._cwd = cwd or dirname(dirname(abspath(__file__)))
+
+    @staticmethod
+    def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+        # Lines look like "import time:       120 |        480 |   utils.driver_bootstrap"
+        entries = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            entries.append((name.rstrip(), int(self_us), int(cumulative_us)))
+        return entries
+
+    def measure_once(self) -> list[tuple[str, int, int]]:
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {self._module}"],
+                                 cwd=self._cwd, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise RuntimeError(f"Importing {self._module} failed:\n{process.stderr}")
+        return self.parse_importtime(process.stderr)
+
+    def measure(self) -> tuple[float, list[tuple[str, int, int]]]:
+        # The fastest run is the least noisy estimate of the real cold start cost
+        best_ms, best_entries = None, []
+        for _ in range(self._runs):
+            entries = self.measure_once()
+            module_ms = next((cumulative / 1000 for name, _, cumulative in entries
+                              if name.strip() == self._module and not name.startswith("  ")), 0.0)
+            if best_ms is None or module_ms < best_ms:
+                best_ms, best_entries = module_ms, entries
+        return best_ms, best_entries
+
+    def check(self, top: int = 10) -> bool:
+        module_ms, entries = self.measure()
+        imported = {name.strip() for name, _, _ in entries}
+
+        print(f"Cold import of '{self._module}': {module_ms:.1f}ms (budget {self._budget_ms:.1f}ms)")
+        print("Heaviest imports (self time):")
+        for name, self_us, cumulative_us in sorted(entries, key=lambda entry: entry[1], reverse=True)[:top]:
+            print(f"  {self_us / 1000:8.1f}ms self {cumulative_us / 1000:8.1f}ms cumulative  {name.strip()}")
+
+        leaked = [module for module in self._forbidden if module in imported]
+        if leaked:
+            print(f"FAIL: modules that should load lazily were imported: {', '.join(leaked)}")
+        if module_ms > self._budget_ms:
+            print(f"FAIL: cold start is {module_ms - self._budget_ms:.1f}ms over budget")
+        return not leaked and module_ms <= self._budget_ms
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Fail when the cold import of an entry point goes over budget')
+    parser.add_argument('module', nargs='?', default='maps', help='Module to import (default: maps)')
+    parser.add_argument('-b', '--budget-ms', help='Cold start budget in milliseconds (default: 150)', type=float, default=150.0)
+    parser.add_argument('-r', '--runs', help='Number of fresh interpreters to measure (default: 5)', type=int, default=5)
+    parser.add_argument('-f', '--forbid', help='Module that must not be imported at startup (can be specified multiple times)', action='append',
+                        default=['tkinter', 'selenium', 'selenium_stealth', 'webdriver_manager', 'bs4', 'lxml', 'psutil'])
+    args = parser.parse_args()
+
+    budget = ImportBudget(module=args.module, budget_ms=args.budget_ms, runs=args.runs, forbidden=args.forbid)
+    sys.exit(0 if budget.check() else 1)
@@ -0,0 +1,139 @@
+from argparse import ArgumentParser
+from threading import local
+from time import time
+import sqlite3
+import json
+import sys
+
+
+class JobQueue:
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            query TEXT NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL,
+            results INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated_at REAL NOT NULL,
+            UNIQUE (query, payload)
+        );
+        CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, lease_expires);
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3) -> None:
+        self._path = path
+        self._max_attempts = max_attempts
+        # sqlite3 connections can't cross threads, every thread opens its own on first use
+        self._local = local()
+        self._connection().executescript(self._schema)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            # WAL lets readers (status checks) run while another process holds the write lock
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def add(self, queries: list[str], payload: dict = None) -> int:
+        payload = json.dumps(payload or {}, sort_keys=True)
+        now = time()
+        connection = self._connection()
+        before = connection.total_changes
+        connection.executemany("INSERT OR IGNORE INTO jobs (query, payload, updated_at) VALUES (?, ?, ?)",
+                               [(query, payload, now) for query in queries if query.strip()])
+        return connection.total_changes - before
+
+    def lease(self, owner: str, lease_seconds: float = 300.0):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes can never claim the same row
+        connection = self._connection()
+        now = time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # A job whose workers keep dying with it never reaches fail, its expired lease counts as the failed attempt
+            connection.execute("UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?, "
+                               "error = COALESCE(error, 'lease expired') WHERE state = ? AND lease_expires < ? "
+                               "AND attempts >= ?", (self.FAILED, now, self.LEASED, now, self._max_attempts))
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE state = ? OR (state = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (self.PENDING, self.LEASED, now)).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute("UPDATE jobs SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                               "updated_at = ? WHERE id = ?", (self.LEASED, owner, now + lease_seconds, now, row["id"]))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        return job
+
+    def _update_leased(self, job_id: int, owner: str, assignments: str, values: tuple) -> bool:
+        # Every write is guarded by the owner, a worker whose lease expired and was taken over can't clobber it
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+            (*values, time(), job_id, self.LEASED, owner))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: int, owner: str, lease_seconds: float = 300.0) -> bool:
+        return self._update_leased(job_id, owner, "lease_expires = ?", (time() + lease_seconds,))
+
+    def complete(self, job_id: int, owner: str, results: int = 0) -> bool:
+        return self._update_leased(job_id, owner, "state = ?, lease_owner = NULL, lease_expires = NULL, results = ?",
+                                   (self.DONE, results))
+
+    def release(self, job_id: int, owner: str) -> bool:
+        # A cancelled job goes back untouched, the attempt it used doesn't count against it
+        return self._update_leased(job_id, owner, "state = ?, lease_owner = NULL, lease_expires = NULL, "
+                                                  "attempts = attempts - 1", (self.PENDING,))
+
+    def fail(self, job_id: int, owner: str, error: str = "") -> bool:
+        return self._update_leased(job_id, owner,
+                                   "state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                                   "lease_owner = NULL, lease_expires = NULL, error = ?",
+                                   (self._max_attempts, self.FAILED, self.PENDING, error))
+
+    def retry_failed(self) -> int:
+        cursor = self._connection().execute("UPDATE jobs SET state = ?, attempts = 0, updated_at = ? WHERE state = ?",
+                                            (self.PENDING, time(), self.FAILED))
+        return cursor.rowcount
+
+    def counts(self) -> dict:
+        counts = dict.fromkeys((self.PENDING, self.LEASED, self.DONE, self.FAILED), 0)
+        for row in self._connection().execute("SELECT state, COUNT(*) AS jobs FROM jobs GROUP BY state"):
+            counts[row["state"]] = row["jobs"]
+        return counts
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Manage the job queue that scraper workers (maps.py --queue) pull from')
+    parser.add_argument('queue', help='Path of the SQLite queue file')
+    parser.add_argument('action', choices=['add', 'status', 'retry'], help='add queries, print job counts or put failed jobs back')
+    parser.add_argument('-q', '--query-file', help='File with one query per line, used by add (default: ./queries.txt)', type=str, default='./queries.txt')
+    parser.add_argument('-bb', '--bbox', help='Bounding box "south,west,north,east" stored with added jobs for a tiled search', type=str, default='')
+    args = parser.parse_args()
+
+    job_queue = JobQueue(args.queue)
+    if args.action == 'add':
+        with open(args.query_file, encoding="utf-8") as query_file:
+            added = job_queue.add(query_file.read().splitlines(), {"bbox": args.bbox} if args.bbox else None)
+        print(f"Added {added} new job(s)")
+    elif args.action == 'retry':
+        print(f"Put {job_queue.retry_failed()} failed job(s) back in the queue")
+    print(json.dumps(job_queue.counts()))
+    sys.exit(0)
@@ -0,0 +1,235 @@
+from utils.rate_controller import PageBlocked
+from utils.cancellation import ScrapeCancelled
+from utils.place_record import serialize_place
+from collections import OrderedDict
+from itertools import count
+from threading import Thread
+from queue import Queue
+from time import time
+import asyncio
+import logging
+import json
+
+
+class ServiceJob:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id: str, query: str, limit: int, loop: asyncio.AbstractEventLoop) -> None:
+        self.id = job_id
+        self.query = query
+        self.limit = limit
+        self.state = self.QUEUED
+        self.error = ""
+        self.records = []
+        self.submitted_at = time()
+        self.started_at = None
+        self.finished_at = None
+        self._loop = loop
+        self.updated = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def _wake(self):
+        # Streams wait on the event they saw last, swapping it means no wake up can slip between check and wait
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+    def update(self, state: str = None, record: dict = None, error: str = ""):
+        # Called from driver threads, the list append is atomic and streams only ever read up to len(records)
+        if record is not None:
+            self.records.append(record)
+        if state:
+            self.state = state
+            if state == self.RUNNING:
+                self.started_at = time()
+            elif self.finished:
+                self.finished_at = time()
+        if error:
+            self.error = error
+        self._loop.call_soon_threadsafe(self._wake)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "query": self.query, "limit": self.limit, "state": self.state,
+                "results": len(self.records), "error": self.error, "submitted_at": self.submitted_at,
+                "started_at": self.started_at, "finished_at": self.finished_at}
+
+
+class JobService:
+    _reasons = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+    def __init__(self, maps_factory, stop_flag=None, concurrency: int = 2, host: str = "127.0.0.1", port: int = 8765,
+                 default_limit: int = 200, keep_jobs: int = 200) -> None:
+        self._maps_factory = maps_factory
+        self._stop_flag = stop_flag or (lambda: False)
+        self._concurrency = max(1, concurrency)
+        self._host = host
+        self._port = port
+        self._default_limit = default_limit
+        self._keep_jobs = keep_jobs
+
+        self._jobs = OrderedDict()
+        self._job_ids = count(1)
+        self._job_queue = Queue()
+        self._workers = []
+        self._loop = None
+        self._server = None
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    def submit(self, query: str, limit: int = None) -> ServiceJob:
+        job = ServiceJob(str(next(self._job_ids)), query, self._default_limit if limit is None else limit, self._loop)
+        self._jobs[job.id] = job
+        # Finished jobs are forgotten oldest first, running and queued ones are always kept
+        finished = [job_id for job_id, old_job in self._jobs.items() if old_job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self._keep_jobs)]:
+            del self._jobs[job_id]
+        self._job_queue.put(job)
+        return job
+
+    def _run_job(self, maps_obj, driver, job: ServiceJob):
+        job_stop = self._stop_flag
+        job.update(state=ServiceJob.RUNNING)
+        try:
+            for record in maps_obj.iter_query_places(driver, job.query, job.limit or None, job_stop):
+                job.update(record=record)
+        finally:
+            # Records a client was already sent reach the CSV and delta store even when the job is cancelled or fails
+            if job.records:
+                maps_obj.store_records(job.records)
+        job.update(state=ServiceJob.CANCELLED if job_stop() else ServiceJob.DONE)
+
+    def _service_worker(self):
+        # The browser is launched once and reused by every job this worker picks up
+        maps_obj = self._maps_factory()
+        driver = None
+        try:
+            driver = maps_obj.create_chrome_driver()
+            maps_obj.open_maps(driver)
+        except Exception as e:
+            self.logger.error(f"Not able to warm up a service driver: {e}")
+
+        while True:
+            job = self._job_queue.get()
+            if job is None:
+                break
+            if self._stop_flag():
+                job.update(state=ServiceJob.CANCELLED)
+                continue
+            try:
+                driver = maps_obj.recycle_if_needed(driver) if driver is not None else maps_obj.create_chrome_driver()
+                self._run_job(maps_obj, driver, job)
+            except ScrapeCancelled:
+                job.update(state=ServiceJob.CANCELLED)
+            except Exception as e:
+                job.update(state=ServiceJob.FAILED, error=str(e) or type(e).__name__)
+                self.logger.error(f"Job {job.id} ('{job.query}') failed: {e}")
+                # A driver that failed mid job may be in any state, the next job gets a fresh one
+                if driver is not None and not isinstance(e, PageBlocked):
+                    maps_obj.quit_driver(driver)
+                    driver = None
+
+        if driver is not None:
+            maps_obj.quit_driver(driver)
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, body: dict):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {self._reasons[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload)
+        await writer.drain()
+
+    async def _stream_results(self, writer: asyncio.StreamWriter, job: ServiceJob):
+        # One chunk per record, so a client sees each place as soon as the driver has it
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        sent = 0
+        while True:
+            updated = job.updated
+            finished = job.finished
+            records = job.records[sent:]
+            for record in records:
+                line = (json.dumps(serialize_place(record, None), ensure_ascii=False) + "\n").encode("utf-8")
+                writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+            sent += len(records)
+            await writer.drain()
+            if finished:
+                break
+            await updated.wait()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            method, path = request_line.split(" ")[:2]
+            length = next((int(line.split(":", 1)[1]) for line in header_lines
+                           if line.lower().startswith("content-length:")), 0)
+            body = await reader.readexactly(length) if length else b""
+            parts = [part for part in path.split("?")[0].split("/") if part]
+
+            if parts == ["jobs"]:
+                if method != "POST":
+                    return await self._respond(writer, 405, {"error": "use POST to submit a job"})
+                try:
+                    request = json.loads(body or b"{}")
+                    query = str(request["query"]).strip()
+                    limit = request.get("limit")
+                    limit = None if limit is None else int(limit)
+                except (ValueError, KeyError, TypeError):
+                    return await self._respond(writer, 400, {"error": 'expected {"query": "...", "limit": 20}'})
+                if not query or (limit is not None and limit < 0):
+                    return await self._respond(writer, 400, {"error": "query must be non empty and limit >= 0"})
+                return await self._respond(writer, 202, self.submit(query, limit).to_dict())
+
+            job = self._jobs.get(parts[1]) if len(parts) in (2, 3) and parts[0] == "jobs" else None
+            if job is None or (len(parts) == 3 and parts[2] != "results"):
+                return await self._respond(writer, 404, {"error": "no such job"})
+            if method != "GET":
+                return await self._respond(writer, 405, {"error": "use GET"})
+            if len(parts) == 2:
+                return await self._respond(writer, 200, job.to_dict())
+            await self._stream_results(writer, job)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        self._workers = [Thread(target=self._service_worker, name=f"service-worker-{index}", daemon=True)
+                         for index in range(self._concurrency)]
+        for worker in self._workers:
+            worker.start()
+        self.logger.info(f"Job service listening on http://{self._host}:{self.port} "
+                         f"with {self._concurrency} warm driver(s)")
+        return self
+
+    async def close(self):
+        for _ in self._workers:
+            self._job_queue.put(None)
+        self._server.close()
+        await self._server.wait_closed()
+        await asyncio.to_thread(lambda: [worker.join() for worker in self._workers])
+
+    async def serve(self, poll_interval: float = 0.5):
+        await self.start()
+        try:
+            while not self._stop_flag():
+                await asyncio.sleep(poll_interval)
+        finally:
+            await self.close()
@@ -0,0 +1,86 @@
+from collections import defaultdict, deque
+from time import monotonic
+import asyncio
+
+
+class LatencyStubServer:
+    _page = ("<html><head><title>{host}</title></head><body><h1>{host}</h1>"
+             "<p>Reach us at <a href=\"mailto:info@{host}\">info@{host}</a></p>{padding}</body></html>")
+
+    def __init__(self, latency: float = 0.2, host: str = "127.0.0.1", port: int = 0, page_padding: int = 20000):
+        self._latency = latency
+        self._host = host
+        self._port = port
+        self._padding = "<p>" + "lorem ipsum " * (page_padding // 12) + "</p>"
+        self._server = None
+        self.requests = 0
+        self.requests_per_host = defaultdict(int)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        return self
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def render(self, host: str, path: str) -> tuple[int, str]:
+        return 200, self._page.format(host=host, padding=self._padding)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        path = request_line.split(" ")[1] if " " in request_line else "/"
+        host = next((line.split(":", 1)[1].strip() for line in header_lines if line.lower().startswith("host:")),
+                    self._host).split(":")[0]
+        self.requests += 1
+        self.requests_per_host[host] += 1
+
+        # Stand-in for a slow remote site
+        await asyncio.sleep(self._latency)
+        status, body = self.render(host, path)
+        payload = body.encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+class ThrottlingStubServer(LatencyStubServer):
+    _block_page = ("<html><head><title>Sorry...</title></head><body><div id=\"captcha-form\">Our systems have "
+                   "detected unusual traffic from your computer network.</div></body></html>")
+
+    def __init__(self, rate_threshold: float = 5.0, window: float = 2.0, penalty: float = 10.0, **kwargs):
+        super().__init__(**kwargs)
+        self._rate_threshold = rate_threshold
+        self._window = window
+        self._penalty = penalty
+        self._arrivals = deque()
+        self._blocked_until = 0.0
+        self.blocked_responses = 0
+
+    def render(self, host: str, path: str) -> tuple[int, str]:
+        # Behaves like Google: over the rate threshold every request gets the block page for a while
+        now = monotonic()
+        self._arrivals.append(now)
+        while self._arrivals and self._arrivals[0] < now - self._window:
+            self._arrivals.popleft()
+
+        if len(self._arrivals) / self._window > self._rate_threshold:
+            self._blocked_until = now + self._penalty
+        if now < self._blocked_until:
+            self.blocked_responses += 1
+            return 429, self._block_page
+        return super().render(host, path)
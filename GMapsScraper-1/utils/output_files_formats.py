@@ -1,20 +1,85 @@
+from utils.place_record import Place, serialize_place
 from threading import Lock
-from csv import DictWriter
-from os.path import isfile
+from csv import DictWriter, DictReader, reader
+from os.path import isfile, getsize
+from os import replace
+import logging
+
+
+def migrate_csv_header(file_path: str, fieldnames, unavailable_text: str = "Not Available") -> tuple:
+    # Appending under a header with other columns shifts every value. A file from an older layout is rewritten once
+    # under the current columns, old rows get the unavailable text in new columns and columns that are gone stay at the
+    # end so nothing is lost. Returns the header rows have to be appended under
+    fieldnames = tuple(fieldnames)
+    if not isfile(file_path) or getsize(file_path) == 0:
+        return fieldnames
+    with open(file_path, newline="", encoding="utf-8-sig") as file_handler:
+        header = next(reader(file_handler), None)
+    if not header:
+        return fieldnames
+    if set(fieldnames) <= set(header):
+        return tuple(header)
+
+    merged = (*fieldnames, *(column for column in header if column not in fieldnames))
+    temp_path = file_path + ".tmp"
+    with open(file_path, newline="", encoding="utf-8-sig") as source, \
+            open(temp_path, "w", newline="", encoding="utf-8-sig") as target:
+        writer = DictWriter(target, fieldnames=merged, restval=unavailable_text, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows({key: unavailable_text if value is None else value for key, value in row.items()}
+                         for row in DictReader(source))
+    # The old file is only replaced once the rewritten one is complete
+    replace(temp_path, file_path)
+    logging.getLogger(__name__).warning(f"Rewrote {file_path} from columns {', '.join(header)} "
+                                        f"to {', '.join(merged)}")
+    return merged
+
 
 class CSVCreator:
-    def __init__(self, file_lock: Lock, output_path: str = "./CSV_FILES"):
+    def __init__(self, file_lock: Lock, output_path: str = "./CSV_FILES", unavailable_text: str = "Not Available"):
         self._output_path = output_path
         self._file_lock = file_lock
+        self._unavailable_text = unavailable_text
+        self._headers = {}
 
-    def create_csv(self, list_of_dict_data: list[dict]):
+    def create_csv(self, list_of_dict_data: list):
         with self._file_lock:
             file_name = "google_maps_data.csv"
-            is_header_file = not isfile(self._output_path + "/" + file_name)
+            first_record = list_of_dict_data[0]
+            fieldnames = tuple(Place.fields if isinstance(first_record, Place) else first_record.keys())
+            file_path = self._output_path + "/" + file_name
+            # The header check reads the file once per layout, later batches reuse the resolved header
+            header = self._headers.get(fieldnames)
+            if header is None:
+                header = self._headers[fieldnames] = migrate_csv_header(file_path, fieldnames, self._unavailable_text)
+            is_header_file = not isfile(file_path) or getsize(file_path) == 0
 
-            with open(self._output_path + "/" + file_name, "w" if is_header_file else "a", newline="", encoding="utf-8-sig") as file_handler:
-                writer = DictWriter(file_handler, fieldnames=list_of_dict_data[0].keys(), extrasaction='ignore')
+            with open(file_path, "w" if is_header_file else "a", newline="", encoding="utf-8-sig") as file_handler:
+                writer = DictWriter(file_handler, fieldnames=header, restval=self._unavailable_text,
+                                    extrasaction='ignore')
                 if is_header_file:
                     writer.writeheader()
 
-                writer.writerows(list_of_dict_data)
+                # Rows are serialised one at a time while writing, no second copy of the batch is built
+                writer.writerows(serialize_place(record, self._unavailable_text) for record in list_of_dict_data)
+
+
+class ReviewCSVWriter:
+    def __init__(self, fieldnames: tuple, output_path: str = "./CSV_FILES", unavailable_text: str = "Not Available",
+                 file_name: str = "google_maps_reviews.csv"):
+        self._file_path = output_path + "/" + file_name
+        self._fieldnames = migrate_csv_header(self._file_path, fieldnames, unavailable_text)
+        self._unavailable_text = unavailable_text
+        self._file_lock = Lock()
+
+    def __call__(self, reviews: list):
+        # Called with every scrolled batch, reviews reach the file while the place is still being read
+        with self._file_lock:
+            is_header_file = not isfile(self._file_path) or getsize(self._file_path) == 0
+            with open(self._file_path, "w" if is_header_file else "a", newline="", encoding="utf-8-sig") as file_handler:
+                writer = DictWriter(file_handler, fieldnames=self._fieldnames, restval=self._unavailable_text,
+                                    extrasaction='ignore')
+                if is_header_file:
+                    writer.writeheader()
+                writer.writerows({key: self._unavailable_text if value in (None, "") else value
+                                  for key, value in review.items()} for review in reviews)
@@ -0,0 +1,197 @@
+from utils.place_record import Place, serialize_place
+from utils.href_parser import HrefParser
+from utils.page_patterns import PagePatterns
+from utils.domain_router import DomainRouter
+from concurrent.futures import ProcessPoolExecutor
+from argparse import ArgumentParser
+from collections import defaultdict
+from os import makedirs, replace, getpid
+from os.path import join, exists
+from threading import local
+from hashlib import sha256
+from csv import DictWriter
+from time import time, perf_counter
+import sqlite3
+import zlib
+import sys
+
+
+class PageArchive:
+    PLACE = "place"
+    CONTACT = "contact"
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS pages (
+            kind TEXT NOT NULL,
+            url TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            place_id TEXT NOT NULL DEFAULT '',
+            query TEXT NOT NULL DEFAULT '',
+            fetched_at REAL NOT NULL,
+            UNIQUE (kind, url, digest, place_id)
+        );
+        CREATE INDEX IF NOT EXISTS pages_by_place ON pages (place_id);
+    """
+
+    def __init__(self, root: str, compression_level: int = 6) -> None:
+        self._root = root
+        self._compression_level = compression_level
+        makedirs(join(root, "objects"), exist_ok=True)
+        self._local = local()
+        self._connection().executescript(self._schema)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(join(self._root, "index.sqlite"), timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _blob_path(self, digest: str) -> str:
+        return join(self._root, "objects", digest[:2], digest[2:] + ".z")
+
+    def put(self, kind: str, url: str, html: str, place_id: str = "", query: str = "") -> str:
+        # Blobs are named by their content hash, a page seen twice (chains sharing one site) is stored once
+        payload = html.encode("utf-8")
+        digest = sha256(payload).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not exists(blob_path):
+            makedirs(join(self._root, "objects", digest[:2]), exist_ok=True)
+            temp_path = f"{blob_path}.{getpid()}.tmp"
+            with open(temp_path, "wb") as blob:
+                blob.write(zlib.compress(payload, self._compression_level))
+            replace(temp_path, blob_path)
+
+        self._connection().execute("INSERT OR IGNORE INTO pages (kind, url, digest, place_id, query, fetched_at) "
+                                   "VALUES (?, ?, ?, ?, ?, ?)", (kind, url, digest, place_id or "", query or "", time()))
+        return digest
+
+    def get(self, digest: str) -> str:
+        with open(self._blob_path(digest), "rb") as blob:
+            return zlib.decompress(blob.read()).decode("utf-8")
+
+    def places(self) -> list[dict]:
+        # Latest capture of every place page, with the contact pages fetched for the same place
+        contacts = defaultdict(list)
+        places = {}
+        for kind, url, digest, place_id, query in self._connection().execute(
+                "SELECT kind, url, digest, place_id, query FROM pages ORDER BY fetched_at"):
+            if kind == self.CONTACT:
+                contacts[place_id].append(digest)
+            else:
+                places[place_id or url] = {"url": url, "digest": digest, "place_id": place_id, "query": query}
+        for place in places.values():
+            place["contacts"] = list(dict.fromkeys(contacts.get(place["place_id"], []))) if place["place_id"] else []
+        return list(places.values())
+
+    def stats(self) -> dict:
+        row = self._connection().execute("SELECT COUNT(*), COUNT(DISTINCT digest) FROM pages").fetchone()
+        return {"pages": row[0], "blobs": row[1]}
+
+
+class PageExtractor:
+    # Reads archived pages with lxml through the same PagePatterns the live scraper uses
+    def __init__(self, unavailable_text: str = "Not Available") -> None:
+        self._unavailable_text = unavailable_text
+
+    @staticmethod
+    def _text(tree, xpath: str) -> str:
+        found = tree.xpath(xpath)
+        return (found[0].text_content().strip() or None) if found else None
+
+    @staticmethod
+    def _attribute(tree, xpath: str, name: str) -> str:
+        found = tree.xpath(xpath)
+        return ((found[0].get(name) or "").strip() or None) if found else None
+
+    def place_fields(self, html: str) -> dict:
+        from lxml import html as lxml_html
+
+        tree = lxml_html.fromstring(html)
+        phones = (element.text_content().strip() for element in tree.xpath(PagePatterns.phone))
+        return {
+            "title": self._text(tree, PagePatterns.title),
+            "rating": self._text(tree, PagePatterns.rating),
+            "review_count": self._attribute(tree, PagePatterns.review_count, "aria-label") or
+                            self._text(tree, PagePatterns.review_count),
+            "webpage": self._attribute(tree, PagePatterns.website, "href"),
+            "phone_number": next((phone for phone in phones if PagePatterns.is_phone(phone)), None),
+        }
+
+    def emails(self, html: str) -> list[str]:
+        from lxml import html as lxml_html
+
+        tree = lxml_html.fromstring(html)
+        # Text nodes joined with a space like BeautifulSoup's get_text(" ") on the live side, so neighbours don't merge
+        return PagePatterns.emails(" ".join(tree.itertext()), tree.xpath('//a/@href'))
+
+    def get_pattern_data(self, sources: list) -> dict:
+        # PatternScraper's interface, DomainRouter.aggregator_data reads link-in-bio pages through it
+        return {"site_email": [email for source in sources for email in self.emails(source)]}
+
+    def website_data(self, website: str, contact_pages: list, router: DomainRouter) -> dict:
+        # The live scraper's routing: social, booking and directory links are kept as socials without a fetch,
+        # a link-in-bio page gives socials and email, any other site only its contact pages' emails
+        kind = router.route(website)
+        if kind == DomainRouter.AGGREGATOR:
+            return router.aggregator_data(website, contact_pages, self, self._unavailable_text)
+        if kind != DomainRouter.SITE:
+            return router.link_data(website, self._unavailable_text)
+        emails = self.get_pattern_data(contact_pages)["site_email"]
+        return {"site_email": emails[0] if emails else self._unavailable_text}
+
+
+def _replay_chunk(archive_root: str, places: list[dict], unavailable_text: str) -> list[dict]:
+    # Runs in a worker process, every worker opens the archive read side on its own
+    archive = PageArchive(archive_root)
+    extractor = PageExtractor(unavailable_text)
+    router = DomainRouter()
+    rows = []
+    for entry in places:
+        try:
+            fields = extractor.place_fields(archive.get(entry["digest"]))
+            fields.update(extractor.website_data(fields["webpage"], [archive.get(digest) for digest in entry["contacts"]],
+                                                 router))
+        except Exception as e:
+            print(f"Skipping {entry['url']}: {e}", file=sys.stderr)
+            continue
+        place = Place.from_scrape(unavailable_text, query=entry["query"], **fields,
+                                  **HrefParser.parse(entry["url"], unavailable_text))
+        rows.append(serialize_place(place, unavailable_text))
+    return rows
+
+
+def replay(archive_root: str, output_file: str, workers: int = None, chunk_size: int = 200,
+           unavailable_text: str = "Not Available") -> int:
+    places = PageArchive(archive_root).places()
+    chunks = [places[index:index + chunk_size] for index in range(0, len(places), chunk_size)]
+    written = 0
+    with open(output_file, "w", newline="", encoding="utf-8-sig") as file_handler, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        writer = DictWriter(file_handler, fieldnames=Place.fields, extrasaction='ignore')
+        writer.writeheader()
+        for rows in executor.map(_replay_chunk, [archive_root] * len(chunks), chunks,
+                                 [unavailable_text] * len(chunks)):
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Re-extract places from an archive written with maps.py --archive, no browser needed')
+    parser.add_argument('archive', help='Archive folder')
+    parser.add_argument('action', choices=['replay', 'stats'], help='replay writes a fresh CSV, stats prints the archive size')
+    parser.add_argument('-o', '--output-file', help='CSV written by replay (default: ./CSV_FILES/replayed_data.csv)', type=str, default='./CSV_FILES/replayed_data.csv')
+    parser.add_argument('-j', '--jobs', help='Worker processes (default: one per CPU)', type=int, default=None)
+    parser.add_argument('-u', '--unavailable-text', help='Replacement text for unavailable information (default: "Not Available")', type=str, default="Not Available")
+    args = parser.parse_args()
+
+    if args.action == 'stats':
+        print(PageArchive(args.archive).stats())
+        sys.exit(0)
+
+    start_time = perf_counter()
+    count = replay(args.archive, args.output_file, workers=args.jobs, unavailable_text=args.unavailable_text)
+    print(f"Replayed {count} places into {args.output_file} in {perf_counter() - start_time:.2f}s")
+    sys.exit(0)
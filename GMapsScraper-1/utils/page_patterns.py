@@ -0,0 +1,50 @@
+import re
+
+
+def _has_class(*names: str) -> str:
+    # XPath for CSS's .name, XPath is the selector language both Selenium and lxml understand without extras
+    return " and ".join(f'contains(concat(" ", normalize-space(@class), " "), " {name} ")' for name in names)
+
+
+class PagePatterns:
+    # Where each field sits on a place page and how emails are found on a contact page. The live scraper reads them
+    # through Selenium, the archive replay through lxml, a markup change is fixed here once for both
+    _header = (f'//*[@id="QA0Szd"]/div/div/div[{_has_class("w6VYqd")}]/div[{_has_class("bJzME", "tTVLSc")}]/div/'
+               f'div[{_has_class("e07Vkf", "kA9KIf")}]/div/div/div[{_has_class("TIHn2")}]/div/'
+               f'div[{_has_class("lMbq3e")}]')
+    title = f'{_header}/*[1][self::div]/h1'
+    rating = (f'{_header}/div[{_has_class("LBgpqf")}]/div/div[{_has_class("fontBodyMedium", "dmRWX")}]/'
+              f'div[{_has_class("F7nice")}]/*[1][self::span]/*[1][self::span]')
+    # The count sits next to the stars as "(1,234)", its aria-label spells it out as "1,234 reviews"
+    review_count = f'//div[{_has_class("F7nice")}]/*[2][self::span]/span/span'
+    website = f'//div[{_has_class("UCw5gc")}]/div/*[1][self::div]/a[@data-tooltip="Open website"]'
+    phone = f'//*[{_has_class("rogA2c")}]'
+
+    # Image names like logo@2x.png look like addresses, a file extension is never a TLD
+    email_pattern = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.(?!(?:png|jpe?g|gif|svg|webp)\b)[a-zA-Z]{2,}\b")
+    _phone_characters = str.maketrans("", "", "()+- ")
+
+    @classmethod
+    def is_phone(cls, text: str) -> bool:
+        return bool(text) and text.translate(cls._phone_characters).isnumeric()
+
+    @staticmethod
+    def decode_protected_email(encoded: str) -> str:
+        # Cloudflare email protection XORs every byte with the first one
+        key = int(encoded[:2], 16)
+        return "".join(chr(int(encoded[index:index + 2], 16) ^ key) for index in range(2, len(encoded) - 1, 2))
+
+    @classmethod
+    def emails(cls, text: str, hrefs) -> list[str]:
+        # mailto and protected links first, they are meant as contact addresses, then anything written in the text
+        emails = []
+        for href in hrefs:
+            if "email-protect" in href and "#" in href:
+                try:
+                    emails.append(cls.decode_protected_email(href.split("#")[1]))
+                except ValueError:
+                    continue
+            elif href.lower().startswith("mailto:"):
+                emails.append(href[len("mailto:"):].split("?")[0].strip())
+        emails.extend(cls.email_pattern.findall(text or ""))
+        return list(dict.fromkeys(email for email in emails if email))
@@ -0,0 +1,59 @@
+from utils.rate_controller import AdaptiveRateController
+from utils.cancellation import ScrapeCancelled
+from time import monotonic, sleep
+
+
+class PageState:
+    FEED = "feed"
+    PLACE = "place"
+    CONSENT = "consent"
+    BLOCKED = "blocked"
+    EMPTY = "empty"
+    SEARCH = "search"
+    LOADING = "loading"
+
+    _empty_markers = ("google maps can't find", "no results found", "make sure your search is spelled correctly")
+
+    # One round trip per check, the page text is only read when no place or feed selector matched
+    _probe_script = """
+        const place = location.pathname.includes('/maps/place/') && document.querySelector('h1') !== null;
+        const feed = !place && document.getElementsByClassName('hfpxzc').length > 0;
+        const search = document.getElementById('searchboxinput') !== null;
+        const text = place || feed ? '' :
+            document.title + ' ' + (document.body ? document.body.innerText.slice(0, 2000) : '');
+        return [location.href, place, feed, search, text];
+    """
+
+    @classmethod
+    def from_probe(cls, url: str, place: bool, feed: bool, search: bool, text: str) -> str:
+        if place:
+            return cls.PLACE
+        if feed:
+            return cls.FEED
+        signal = AdaptiveRateController.classify_page(url, text)
+        if signal == AdaptiveRateController.BLOCKED:
+            return cls.BLOCKED
+        if signal == AdaptiveRateController.CONSENT:
+            return cls.CONSENT
+        if "/maps/search/" in (url or "") and any(marker in (text or "").lower() for marker in cls._empty_markers):
+            return cls.EMPTY
+        return cls.SEARCH if search else cls.LOADING
+
+    @classmethod
+    def classify(cls, driver) -> str:
+        try:
+            return cls.from_probe(*driver.execute_script(cls._probe_script))
+        except Exception:
+            return cls.LOADING
+
+    @classmethod
+    def wait_for(cls, driver, states: tuple, timeout: float, stop_flag=None, poll_interval: float = 0.1) -> str:
+        # Returns the first state in states, or whatever the page showed when the timeout ran out
+        deadline = monotonic() + timeout
+        while True:
+            state = cls.classify(driver)
+            if state in states or monotonic() >= deadline:
+                return state
+            if stop_flag and stop_flag():
+                raise ScrapeCancelled()
+            sleep(poll_interval)
@@ -0,0 +1,57 @@
+from utils.driver_bootstrap import DriverBootstrap
+import asyncio
+
+
+def iter_places(query: str, limit: int = 20, driver_path: str = "", headless: bool = True, wait_time: int = 15,
+                suggested_ext: list = None, unavailable_text: str = "Not Available",
+                output_path: str = "./CSV_FILES", adaptive_rate: bool = True, dedupe_radius: float = 50.0,
+                stop_flag=None):
+    # The scrape only advances while the generator is consumed, closing it (or breaking out of the loop) quits the
+    # browser through the finally below. Selenium is only imported once the first record is asked for
+    from utils.google_maps_scraper import GoogleMaps
+    from utils.rate_controller import AdaptiveRateController
+    from utils.spatial_index import PlaceIndex
+    from threading import Lock
+
+    bootstrap = DriverBootstrap(driver_path=driver_path, profile_root="")
+    maps_obj = GoogleMaps(driver_path=bootstrap.resolve_driver_path(), unavailable_text=unavailable_text,
+                          headless=headless, wait_time=wait_time, suggested_ext=suggested_ext,
+                          output_path=output_path, verbose=False, result_range=limit or None, print_lock=Lock(),
+                          rate_controller=AdaptiveRateController() if adaptive_rate else None,
+                          place_index=PlaceIndex(radius_m=dedupe_radius) if dedupe_radius > 0 else None,
+                          stop_flag=stop_flag)
+    driver = maps_obj.create_chrome_driver()
+    try:
+        yield from maps_obj.iter_query_places(driver, query)
+    finally:
+        maps_obj.quit_driver(driver)
+
+
+class AsyncPlaceIterator:
+    # Every browser step of iter_places() runs in a worker thread, the event loop never blocks on Selenium
+    _finished = object()
+
+    def __init__(self, query: str, **options) -> None:
+        self._places = iter_places(query, **options)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        place = await asyncio.to_thread(next, self._places, self._finished)
+        if place is self._finished:
+            raise StopAsyncIteration
+        return place
+
+    async def aclose(self):
+        await asyncio.to_thread(self._places.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+def aiter_places(query: str, **options) -> AsyncPlaceIterator:
+    return AsyncPlaceIterator(query, **options)
@@ -0,0 +1,97 @@
+from sys import intern
+import re
+
+
+class Place:
+    # Column order of every writer, the names match the keys the dict based rows used to have
+    fields = ("title", "rating", "review_count", "lat", "long", "phone_number", "webpage", "site_email", "socials",
+              "place_id", "map_link", "slug", "query")
+    __slots__ = fields
+
+    _number_pattern = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+    def __init__(self, title: str = None, rating: float = None, review_count: int = None, lat: float = None,
+                 long: float = None, phone_number: str = None, webpage: str = None, site_email: str = None,
+                 socials: tuple = (), place_id: str = None, map_link: str = None, slug: str = None,
+                 query: str = None) -> None:
+        self.title = title
+        self.rating = rating
+        self.review_count = review_count
+        self.lat = lat
+        self.long = long
+        self.phone_number = phone_number
+        self.webpage = webpage
+        self.site_email = site_email
+        self.socials = socials
+        self.place_id = place_id
+        self.map_link = map_link
+        self.slug = slug
+        # Every record of a query points at the same string
+        self.query = intern(query) if query else None
+
+    @classmethod
+    def _to_float(cls, text):
+        match = cls._number_pattern.search(text or "")
+        return float(match.group().replace(",", ".")) if match else None
+
+    @staticmethod
+    def _to_int(text):
+        digits = "".join(character for character in text or "" if character.isdigit())
+        return int(digits) if digits else None
+
+    @classmethod
+    def from_scrape(cls, unavailable: str, **values) -> "Place":
+        # Scrapers hand back page text with a placeholder for anything missing, the record keeps None instead
+        values = {key: (None if value == unavailable else value) for key, value in values.items() if key in cls.fields}
+        for key in ("rating", "lat", "long"):
+            if isinstance(values.get(key), str):
+                values[key] = cls._to_float(values[key])
+        if isinstance(values.get("review_count"), str):
+            values["review_count"] = cls._to_int(values["review_count"])
+        return cls(**values)
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self.fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in self.fields else None
+        return default if value is None else value
+
+    def setdefault(self, key: str, default=None):
+        if self.get(key) is None:
+            self[key] = default
+        return self[key]
+
+    def update(self, values: dict):
+        for key, value in values.items():
+            self[key] = value
+
+    def keys(self):
+        return self.fields
+
+    def to_dict(self, unavailable: str = "Not Available") -> dict:
+        row = {}
+        for key in self.fields:
+            value = getattr(self, key)
+            if value is None or value == ():
+                value = unavailable
+            elif isinstance(value, tuple):
+                value = " | ".join(value)
+            row[key] = value
+        return row
+
+    def __repr__(self):
+        return f"Place({self.title!r}, place_id={self.place_id!r})"
+
+
+def serialize_place(record, unavailable: str = "Not Available") -> dict:
+    # The one row format shared by the CSV writer, the NDJSON stream and any other output
+    return record.to_dict(unavailable) if isinstance(record, Place) else dict(record)
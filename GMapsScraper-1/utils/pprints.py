@@ -13,9 +13,11 @@ class PPrints:
     RED = '\033[91m'
     RESET = '\033[0m'
 
-    def __init__(self, print_lock: Lock):
+    def __init__(self, print_lock: Lock, browser_memory=None):
         self._print_lock = print_lock
         self._process = Process()
+        # Chrome runs out of process, its memory has to come from whoever tracks the drivers
+        self._browser_memory = browser_memory
 
     @staticmethod
     def unpack_result_indices(results_indices: any([str, list[int, int]]) = "Calculating"):
@@ -39,6 +41,7 @@ class PPrints:
         with self._print_lock:
             memory_info = self._process.memory_info()
             current_memory_usage = memory_info.rss / 1024 / 1024  # Convert bytes to megabytes
+            browser_memory = self._browser_memory() if self._browser_memory else "Not Tracked"
 
             results_index_data = self.unpack_result_indices(results_indices=results_indices)
             if active_count()-1 == 0:
@@ -52,6 +55,7 @@ class PPrints:
                   f"{self.GREEN}OutPutFile: CSV\n{self.BLUE}{results_index_data}\n"
                   f"{self.GREEN}LaunchedDrivers: {launched_drivers}\n"
                   f"{self.RED}MemoryUsageByScript: {current_memory_usage: .2f}MB\n"
+                  f"{self.RED}MemoryUsageByBrowsers: {browser_memory}\n"
                   f"{self.RED}Warning: Don't open the output file while script is running\n"
                   f"{self.RESET}", end="\r")
 
@@ -0,0 +1,34 @@
+from queue import SimpleQueue, Empty
+from collections import Counter
+
+
+class ProgressEvents:
+    RESULT = "result"
+    STATUS = "status"
+
+    def __init__(self) -> None:
+        # Workers only ever append here, the GUI thread is the single consumer
+        self._queue = SimpleQueue()
+
+    def __call__(self, count: int, query: str = ""):
+        self._queue.put((self.RESULT, query, count))
+
+    def for_query(self, query: str):
+        return lambda count: self._queue.put((self.RESULT, query, count))
+
+    def query_status(self, query: str, status: str):
+        self._queue.put((self.STATUS, query, status))
+
+    def drain(self, max_events: int = 10000) -> tuple[Counter, dict]:
+        # Folds a burst of events into one result delta and the latest status per query
+        results, statuses = Counter(), {}
+        for _ in range(max_events):
+            try:
+                kind, query, value = self._queue.get_nowait()
+            except Empty:
+                break
+            if kind == self.RESULT:
+                results[query] += value
+            else:
+                statuses[query] = value
+        return results, statuses
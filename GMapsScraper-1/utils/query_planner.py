@@ -0,0 +1,147 @@
+from heapq import heapify, heapreplace
+from threading import Lock
+from time import time
+import sqlite3
+import logging
+import math
+
+
+class QueryPlan:
+    def __init__(self, entries: list, workers: int, raw_makespan: float, calibration: float = 1.0) -> None:
+        # entries are (query, estimated_places, estimated_seconds, source, chunks), longest first
+        self.entries = entries
+        self.workers = workers
+        self.raw_makespan = raw_makespan
+        self.predicted_makespan = raw_makespan * calibration
+
+    @property
+    def queries(self) -> list[str]:
+        return [entry[0] for entry in self.entries]
+
+    def chunks(self, query: str) -> int:
+        return next((entry[4] for entry in self.entries if entry[0] == query), 1)
+
+
+class QueryPlanner:
+    _schema = """
+        CREATE TABLE IF NOT EXISTS query_history (
+            query TEXT PRIMARY KEY,
+            places REAL NOT NULL,
+            seconds REAL NOT NULL,
+            runs INTEGER NOT NULL DEFAULT 1,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            queries INTEGER NOT NULL,
+            workers INTEGER NOT NULL,
+            predicted REAL NOT NULL,
+            actual REAL NOT NULL,
+            finished_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, history_path: str, default_places: int = 60, default_seconds_per_place: float = 6.0,
+                 smoothing: float = 0.5) -> None:
+        self._default_places = default_places
+        self._default_seconds_per_place = default_seconds_per_place
+        # Weight of the newest measurement, history follows a query whose feed grows or shrinks
+        self._smoothing = smoothing
+        self._lock = Lock()
+        self._connection = sqlite3.connect(history_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(self._schema)
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    def seconds_per_place(self) -> float:
+        with self._lock:
+            places, seconds = self._connection.execute(
+                "SELECT SUM(places), SUM(seconds) FROM query_history WHERE places > 0").fetchone()
+        return seconds / places if places else self._default_seconds_per_place
+
+    def calibration(self, last_runs: int = 5) -> float:
+        # Uncalibrated predictions of earlier runs against what they really took, applied to the next prediction
+        with self._lock:
+            ratios = [actual / predicted for predicted, actual in self._connection.execute(
+                "SELECT predicted, actual FROM runs WHERE predicted > 0 ORDER BY id DESC LIMIT ?", (last_runs,))]
+        return sum(ratios) / len(ratios) if ratios else 1.0
+
+    def history(self, queries: list[str]) -> dict:
+        known = {}
+        with self._lock:
+            for start in range(0, len(queries), 500):
+                chunk = queries[start:start + 500]
+                for query, places, seconds in self._connection.execute(
+                        f"SELECT query, places, seconds FROM query_history WHERE query IN "
+                        f"({', '.join('?' * len(chunk))})", chunk):
+                    known[query] = (places, seconds)
+        return known
+
+    @staticmethod
+    def makespan(durations: list, workers: int) -> float:
+        # Longest processing time first: every job goes to the worker that frees up first
+        loads = [0.0] * max(1, workers)
+        heapify(loads)
+        for duration in sorted(durations, reverse=True):
+            heapreplace(loads, loads[0] + duration)
+        return max(loads)
+
+    def plan(self, queries: list[str], workers: int, probe=None, limit: int = None, split: bool = True) -> QueryPlan:
+        # probe(query) -> feed length, only called for queries the history has never seen
+        known = self.history(queries)
+        seconds_per_place = self.seconds_per_place()
+        estimates = []
+        for query in queries:
+            if query in known:
+                places, seconds = known[query]
+                source = "history"
+            elif probe is not None:
+                places = probe(query)
+                seconds = places * seconds_per_place
+                source = "probe"
+            else:
+                places = self._default_places
+                seconds = places * seconds_per_place
+                source = "default"
+            if limit and places > limit:
+                seconds *= limit / places
+                places = limit
+            estimates.append((query, places, seconds, source))
+
+        # A query longer than a fair share of the run would set the makespan on its own, its detail work is split
+        fair_share = sum(estimate[2] for estimate in estimates) / max(1, workers)
+        entries = []
+        for query, places, seconds, source in estimates:
+            chunks = 1
+            if split and workers > 1 and seconds > fair_share and places > 1:
+                chunks = min(workers, math.ceil(seconds / max(fair_share, 1e-9)), int(places))
+            entries.append((query, places, seconds, source, chunks))
+        entries.sort(key=lambda entry: entry[2], reverse=True)
+
+        durations = []
+        for entry in entries:
+            durations.extend([entry[2] / entry[4]] * entry[4])
+        return QueryPlan(entries, workers, self.makespan(durations, workers), self.calibration())
+
+    def record_query(self, query: str, places: int, seconds: float):
+        with self._lock:
+            row = self._connection.execute("SELECT places, seconds FROM query_history WHERE query = ?",
+                                           (query,)).fetchone()
+            if row is not None:
+                places = row[0] + self._smoothing * (places - row[0])
+                seconds = row[1] + self._smoothing * (seconds - row[1])
+            self._connection.execute(
+                "INSERT INTO query_history (query, places, seconds, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (query) DO UPDATE SET places = excluded.places, seconds = excluded.seconds, "
+                "runs = runs + 1, updated_at = excluded.updated_at", (query, places, seconds, time()))
+
+    def record_run(self, plan: QueryPlan, actual: float):
+        with self._lock:
+            self._connection.execute("INSERT INTO runs (queries, workers, predicted, actual, finished_at) "
+                                     "VALUES (?, ?, ?, ?, ?)",
+                                     (len(plan.entries), plan.workers, plan.raw_makespan, actual, time()))
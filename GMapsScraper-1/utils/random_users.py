@@ -1,4 +1,6 @@
-users = [
+# Kept as a tuple of constants so importing this module costs a single constant load, the list is
+# only built on first access of `users`
+_user_agents = (
     'Mozilla/5.0 (Windows NT 6.1; rv:94.0) Gecko/20100101 Firefox/94.0',
     'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:94.0) Gecko/20100101 Firefox/94.0',
     'Mozilla/5.0 (Windows NT 6.1; Win64; x64; rv:94.0) Gecko/20100101 Firefox/94.0',
@@ -540,4 +542,11 @@ users = [
     'OPR/77.0.4054.90',
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.43 (KHTML, like Gecko) Chrome/91.0.4472.101 '
     'Safari/537.36 OPR/77.0.4054.90 '
-]
+)
+
+
+def __getattr__(name):
+    if name == "users":
+        globals()["users"] = list(_user_agents)
+        return globals()["users"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,72 @@
+from utils.rate_controller import AdaptiveRateController
+from utils.local_stubs import ThrottlingStubServer
+from concurrent.futures import ThreadPoolExecutor
+from argparse import ArgumentParser
+from threading import Thread, Event
+from time import monotonic
+from urllib.request import urlopen
+from urllib.error import HTTPError, URLError
+import asyncio
+
+
+def serve_in_background(server: ThrottlingStubServer, ready: Event, stop: Event):
+    async def serve():
+        await server.start()
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        await server.close()
+
+    asyncio.run(serve())
+
+
+def fetch_signal(url: str, timeout: float) -> str:
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            return AdaptiveRateController.classify_page(response.url, response.read().decode("utf-8", "replace"))
+    except HTTPError as e:
+        return AdaptiveRateController.classify_page(url, e.read().decode("utf-8", "replace"))
+    except (URLError, TimeoutError):
+        return AdaptiveRateController.TIMEOUT
+
+
+def run_benchmark(duration: float, workers: int, threshold: float, adaptive: bool) -> dict:
+    server = ThrottlingStubServer(rate_threshold=threshold, latency=0.05)
+    ready, stop = Event(), Event()
+    Thread(target=serve_in_background, args=(server, ready, stop), daemon=True).start()
+    ready.wait()
+
+    controller = AdaptiveRateController(initial_rate=1.0, max_rate=threshold * 4, block_cooldown=2.0)
+    url = f"http://127.0.0.1:{server.port}/maps"
+    deadline = monotonic() + duration
+    outcomes = {AdaptiveRateController.OK: 0, AdaptiveRateController.BLOCKED: 0, AdaptiveRateController.TIMEOUT: 0}
+
+    def worker():
+        while monotonic() < deadline:
+            if adaptive and not controller.acquire(stop_flag=lambda: monotonic() >= deadline):
+                break
+            signal = fetch_signal(url, timeout=5)
+            outcomes[signal] = outcomes.get(signal, 0) + 1
+            if adaptive:
+                controller.report(signal)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in range(workers):
+            executor.submit(worker)
+
+    stop.set()
+    return {"clean_per_second": outcomes[AdaptiveRateController.OK] / duration, "final_rate": controller.rate,
+            **outcomes}
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Compare fixed-speed and AIMD-paced workers against a local throttling stub')
+    parser.add_argument('-t', '--duration', help='Seconds to run each mode (default: 30)', type=float, default=30)
+    parser.add_argument('-w', '--workers', help='Number of worker threads (default: 8)', type=int, default=8)
+    parser.add_argument('-th', '--threshold', help='Requests per second the stub tolerates before blocking (default: 5)', type=float, default=5)
+    args = parser.parse_args()
+
+    for mode, adaptive in (("unpaced", False), ("adaptive", True)):
+        result = run_benchmark(args.duration, args.workers, args.threshold, adaptive)
+        print(f"{mode:>9}: {result['clean_per_second']:.2f} clean/s | ok {result['ok']} | "
+              f"blocked {result['blocked']} | timeouts {result['timeout']} | final rate {result['final_rate']:.2f}/s")
@@ -0,0 +1,114 @@
+from collections import deque, Counter
+from threading import Lock
+from time import monotonic, sleep
+import logging
+
+
+class PageBlocked(Exception):
+    pass
+
+
+class AdaptiveRateController:
+    OK = "ok"
+    TIMEOUT = "timeout"
+    BLOCKED = "blocked"
+    CONSENT = "consent"
+
+    _block_markers = ("unusual traffic", "/sorry/", "recaptcha", "captcha-form", "not a robot")
+    _consent_markers = ("consent.google.", "before you continue to google")
+
+    def __init__(self, initial_rate: float = 1.0, min_rate: float = 0.05, max_rate: float = 10.0,
+                 additive_step: float = 0.1, decrease_factor: float = 0.5, block_cooldown: float = 30.0,
+                 timeout_window: int = 20, timeout_threshold: float = 0.3, block_window: float = 300.0) -> None:
+        # block_window: a block that comes within this many seconds after the last cooldown ended keeps doubling it
+        self._rate = initial_rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._additive_step = additive_step
+        self._decrease_factor = decrease_factor
+        self._block_cooldown = block_cooldown
+        self._timeout_threshold = timeout_threshold
+        self._block_window = block_window
+
+        self._lock = Lock()
+        self._next_slot = monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_blocks = 0
+        self._generation = 0
+        self._recent = deque(maxlen=timeout_window)
+        self.counters = Counter()
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @classmethod
+    def classify_page(cls, url: str, text: str = "") -> str:
+        url, text = (url or "").lower(), (text or "").lower()
+        if any(marker in url or marker in text for marker in cls._block_markers):
+            return cls.BLOCKED
+        if any(marker in url or marker in text for marker in cls._consent_markers):
+            return cls.CONSENT
+        return cls.OK
+
+    def acquire(self, stop_flag=None, poll_interval: float = 0.25) -> bool:
+        while True:
+            # Reserve the next send slot under the lock, then sleep outside it so workers queue up fairly
+            with self._lock:
+                generation = self._generation
+                slot = max(monotonic(), self._next_slot, self._blocked_until)
+                self._next_slot = slot + 1.0 / self._rate
+
+            # A block while waiting invalidates the reservation, it gets re-reserved at the new pace
+            while generation == self._generation:
+                remaining = slot - monotonic()
+                if remaining <= 0:
+                    return True
+                if stop_flag and stop_flag():
+                    return False
+                sleep(min(remaining, poll_interval))
+
+    def report(self, signal: str):
+        with self._lock:
+            self.counters[signal] += 1
+            self._recent.append(signal)
+
+            if signal == self.BLOCKED:
+                # Requests sent before the last cut report late, only the first block of an episode counts
+                if monotonic() < self._blocked_until:
+                    return
+
+                # Multiplicative decrease plus a cooldown that doubles while blocks keep coming. Only time ends an
+                # episode, an OK from a worker whose request was already in flight says nothing about the block
+                if monotonic() - self._blocked_until > self._block_window:
+                    self._consecutive_blocks = 0
+                self._consecutive_blocks += 1
+                self._rate = max(self._min_rate, self._rate * self._decrease_factor)
+                cooldown = min(self._block_cooldown * 2 ** (self._consecutive_blocks - 1), 600.0)
+                self._blocked_until = monotonic() + cooldown
+                self._next_slot = self._blocked_until
+                self._generation += 1
+                self._recent.clear()
+                self.logger.warning(f"Block page detected, rate cut to {self._rate:.2f}/s for {cooldown:.0f}s")
+                return
+
+            if signal == self.TIMEOUT:
+                timeouts = sum(1 for recent in self._recent if recent == self.TIMEOUT)
+                if len(self._recent) >= 5 and timeouts / len(self._recent) > self._timeout_threshold:
+                    self._rate = max(self._min_rate, self._rate * self._decrease_factor)
+                    self._recent.clear()
+                return
+
+            if signal == self.OK:
+                # Additive increase, damped at higher rates so the ramp up stays gradual
+                self._rate = min(self._max_rate, self._rate + self._additive_step / max(1.0, self._rate))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"rate": self._rate, **self.counters}
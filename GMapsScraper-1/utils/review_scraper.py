@@ -0,0 +1,187 @@
+from collections import Counter
+from datetime import date, timedelta
+from threading import Lock
+from time import monotonic, sleep
+import logging
+import re
+
+
+class ReviewScraper:
+    fields = ("place_id", "title", "review_id", "author", "rating", "date", "date_text", "text", "query")
+
+    _age_pattern = re.compile(r"\b(a|an|one|\d+)\s+(minute|hour|day|week|month|year)s?\s+ago", re.IGNORECASE)
+    _age_days = {"minute": 0, "hour": 0, "day": 1, "week": 7, "month": 30, "year": 365}
+
+    _open_script = """
+        const tab = Array.from(document.querySelectorAll('button[role="tab"]')).find(
+            button => /^reviews/i.test(button.getAttribute('aria-label') || button.innerText || ''));
+        if (!tab) return false;
+        tab.click();
+        return true;
+    """
+
+    _sort_menu_script = """
+        const sort = document.querySelector('button[aria-label*="Sort"], button[data-value="Sort"]');
+        if (!sort) return false;
+        sort.click();
+        return true;
+    """
+
+    # The menu renders after the click handler returns, so picking "Newest" is a separate, polled call
+    _sort_newest_script = """
+        const newest = document.querySelectorAll('div[role="menuitemradio"]')[1];
+        if (!newest) return false;
+        newest.click();
+        return true;
+    """
+
+    # One round trip per scroll step. Only nodes without the read marker are looked at, so a round costs the new
+    # reviews and not the whole list, and pruned nodes stop weighing on layout
+    _round_script = """
+        const prune = arguments[0];
+        const nodes = Array.from(document.querySelectorAll('div.jftiEf[data-review-id]:not([data-gm-read])'));
+        const rows = [];
+        for (const node of nodes) {
+            const more = node.querySelector('button.w8nwRe');
+            if (more) more.click();
+            const text = selector => { const found = node.querySelector(selector); return found ? found.innerText : ''; };
+            const stars = node.querySelector('span.kvMYJc, [role="img"][aria-label*="star"]');
+            rows.push([node.getAttribute('data-review-id'), text('.d4r55'),
+                       stars ? stars.getAttribute('aria-label') : text('span.fzvQIb'),
+                       text('span.rsqaWe') || text('span.xRkPPb'), text('span.wiI7pd')]);
+            node.setAttribute('data-gm-read', '1');
+        }
+
+        let pane = window.__gmReviewPane;
+        const anchor = nodes.length ? nodes[nodes.length - 1] : document.querySelector('div.jftiEf[data-review-id]');
+        if ((!pane || !pane.isConnected) && anchor) {
+            pane = anchor.parentElement;
+            while (pane && !['auto', 'scroll'].includes(getComputedStyle(pane).overflowY)) pane = pane.parentElement;
+            window.__gmReviewPane = pane;
+        }
+        // The last node stays as the scroll anchor, the rest of this round is dropped once read
+        if (prune) nodes.slice(0, -1).forEach(node => node.remove());
+        if (pane) pane.scrollTop = pane.scrollHeight;
+        return [rows, prune ? Math.max(0, nodes.length - 1) : 0];
+    """
+
+    def __init__(self, max_reviews: int = 0, since: date = None, prune_dom: bool = True,
+                 scroll_pause: float = 0.4, idle_rounds: int = 8, open_timeout: float = 10.0) -> None:
+        # max_reviews 0 reads every review, since leaves out older reviews and stops at the first one once the list
+        # is sorted newest first
+        self._max_reviews = max_reviews
+        self._since = since
+        self._prune_dom = prune_dom
+        self._scroll_pause = scroll_pause
+        self._idle_rounds = idle_rounds
+        self._open_timeout = open_timeout
+
+        self._lock = Lock()
+        self.counters = Counter()
+
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def review_date(cls, date_text: str, today: date = None):
+        # Maps only shows relative ages ("3 months ago"), the date is an estimate of the same precision
+        match = cls._age_pattern.search(date_text or "")
+        if not match:
+            return None
+        amount = 1 if match.group(1).lower() in ("a", "an", "one") else int(match.group(1))
+        return (today or date.today()) - timedelta(days=amount * cls._age_days[match.group(2).lower()])
+
+    @staticmethod
+    def _rating(label: str):
+        match = re.search(r"\d+(?:[.,]\d+)?", label or "")
+        return float(match.group().replace(",", ".")) if match else None
+
+    def open_reviews(self, driver, stop_flag) -> bool:
+        deadline = monotonic() + self._open_timeout
+        while not driver.execute_script(self._open_script):
+            if stop_flag() or monotonic() > deadline:
+                return False
+            sleep(0.2)
+        while not driver.execute_script("return document.querySelector('div.jftiEf[data-review-id]') !== null;"):
+            if stop_flag() or monotonic() > deadline:
+                return False
+            sleep(0.2)
+        return True
+
+    def sort_newest(self, driver, stop_flag) -> bool:
+        # True only once "Newest" was clicked, callers may then treat the first older review as the end
+        if not driver.execute_script(self._sort_menu_script):
+            return False
+        deadline = monotonic() + self._open_timeout
+        while not driver.execute_script(self._sort_newest_script):
+            if stop_flag() or monotonic() > deadline:
+                return False
+            sleep(0.2)
+        sleep(self._scroll_pause * 2)
+        return True
+
+    def scrape(self, driver, place, sink, stop_flag=None) -> int:
+        # Streams each round of new reviews to sink(list_of_rows) and returns how many were written
+        stop_flag = stop_flag or (lambda: False)
+        if not self.open_reviews(driver, stop_flag):
+            with self._lock:
+                self.counters["places_without_reviews"] += 1
+            return 0
+
+        # A date cutoff only ends the scroll early when the newest reviews come first, unsorted lists are read to
+        # the end and older reviews are just left out
+        sorted_newest = bool(self._since) and self.sort_newest(driver, stop_flag)
+        if self._since and not sorted_newest:
+            with self._lock:
+                self.counters["unsorted_places"] += 1
+
+        today = date.today()
+        seen = set()
+        written = 0
+        pruned = 0
+        idle = 0
+        finished = False
+        while not finished and idle < self._idle_rounds and not stop_flag():
+            rows, removed = driver.execute_script(self._round_script, self._prune_dom)
+            pruned += removed
+            batch = []
+            new_reviews = 0
+            for review_id, author, rating, date_text, text in rows:
+                if review_id in seen:
+                    continue
+                seen.add(review_id)
+                new_reviews += 1
+                review_date = self.review_date(date_text, today)
+                if self._since and review_date and review_date < self._since:
+                    if sorted_newest:
+                        finished = True
+                        break
+                    continue
+                batch.append({"place_id": place.place_id, "title": place.title, "review_id": review_id,
+                              "author": author.strip(), "rating": self._rating(rating),
+                              "date": review_date.isoformat() if review_date else None,
+                              "date_text": date_text.strip(), "text": text.strip(), "query": place.query})
+                if self._max_reviews and written + len(batch) >= self._max_reviews:
+                    finished = True
+                    break
+
+            if batch:
+                sink(batch)
+                written += len(batch)
+            # A round of only skipped older reviews still scrolled the list further
+            idle = 0 if new_reviews else idle + 1
+            if not finished:
+                sleep(self._scroll_pause)
+
+        with self._lock:
+            self.counters["places"] += 1
+            self.counters["reviews"] += written
+            self.counters["pruned_nodes"] += pruned
+        return written
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
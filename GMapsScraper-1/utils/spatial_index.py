@@ -0,0 +1,112 @@
+from collections import defaultdict, Counter
+from math import cos, radians, floor
+from threading import Lock
+import unicodedata
+import re
+
+
+class PlaceIndex:
+    _earth_radius_m = 6371008.8
+    _name_noise = {"the", "and", "co", "ltd", "llc", "inc", "pvt", "private", "limited", "company"}
+    _non_word_pattern = re.compile(r"[^a-z0-9 ]+")
+
+    def __init__(self, radius_m: float = 50.0, name_similarity: float = 0.75, phone_radius_m: float = 500.0) -> None:
+        self._radius_m = radius_m
+        self._phone_radius_m = phone_radius_m
+        self._name_similarity = name_similarity
+        self._lock = Lock()
+        # Grid hash over an equirectangular projection, a cell is one radius wide so a lookup scans 3x3 cells
+        self._cells = defaultdict(list)
+        self._place_ids = set()
+        self._phones = {}
+        self.duplicates = Counter()
+
+    def __len__(self):
+        return len(self._place_ids)
+
+    @classmethod
+    def name_key(cls, name: str) -> str:
+        if not name:
+            return ""
+        name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+        name = cls._non_word_pattern.sub(" ", name.replace("&", " and "))
+        return " ".join(token for token in name.split() if token not in cls._name_noise)
+
+    @staticmethod
+    def phone_key(phone: str) -> str:
+        digits = "".join(character for character in phone or "" if character.isdigit())
+        # Local and international spellings of a number share their trailing digits
+        return digits[-9:] if len(digits) >= 7 else ""
+
+    def _project(self, lat: float, lng: float) -> tuple[float, float]:
+        y = radians(lat) * self._earth_radius_m
+        x = radians(lng) * self._earth_radius_m * cos(radians(lat))
+        return x, y
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return floor(x / self._radius_m), floor(y / self._radius_m)
+
+    def _names_match(self, first: str, second: str) -> bool:
+        if not first or not second:
+            return False
+        first_tokens, second_tokens = set(first.split()), set(second.split())
+        shared_tokens = first_tokens & second_tokens
+        # "Pizza Hut" and "Pizza Hut Delivery" are the same listing, "Cafe 5" and "Cafe 50" are not. A single shared
+        # word is too generic for a subset match, "Cafe" next to "Cafe Milano" is another business
+        if len(shared_tokens) >= 2 and (first_tokens <= second_tokens or second_tokens <= first_tokens):
+            return True
+        return len(shared_tokens) / len(first_tokens | second_tokens) >= self._name_similarity
+
+    def _nearby_match(self, x: float, y: float, name: str):
+        cell_x, cell_y = self._cell(x, y)
+        radius_squared = self._radius_m ** 2
+        for neighbour_x in (cell_x - 1, cell_x, cell_x + 1):
+            for neighbour_y in (cell_y - 1, cell_y, cell_y + 1):
+                for point_x, point_y, point_name, point_id in self._cells.get((neighbour_x, neighbour_y), ()):
+                    if (point_x - x) ** 2 + (point_y - y) ** 2 <= radius_squared and \
+                            self._names_match(name, point_name):
+                        return point_id
+        return None
+
+    def _duplicate_of(self, place_id: str, point, name: str) -> str:
+        # Callers hold the lock
+        if place_id in self._place_ids:
+            self.duplicates["place_id"] += 1
+            return place_id
+        if point is not None:
+            duplicate_of = self._nearby_match(*point, name)
+            if duplicate_of is not None:
+                self.duplicates["nearby_name"] += 1
+                return duplicate_of
+        return None
+
+    def find_duplicate(self, place_id: str, lat: float = None, lng: float = None, name: str = "") -> str:
+        # Lookup only, a listing is indexed once its visit succeeded so a failed visit can be retried
+        point = self._project(lat, lng) if lat is not None and lng is not None else None
+        with self._lock:
+            return self._duplicate_of(place_id, point, self.name_key(name))
+
+    def check_and_add(self, place_id: str, lat: float = None, lng: float = None, name: str = "") -> str:
+        # Returns the place this one duplicates, or None after indexing it as a new place
+        name = self.name_key(name)
+        point = self._project(lat, lng) if lat is not None and lng is not None else None
+        with self._lock:
+            duplicate_of = self._duplicate_of(place_id, point, name)
+            if duplicate_of is None:
+                if point is not None:
+                    self._cells[self._cell(*point)].append((*point, name, place_id))
+                self._place_ids.add(place_id)
+            return duplicate_of
+
+    def check_phone(self, place_id: str, phone: str, lat: float = None, lng: float = None) -> str:
+        # Chains share one number across branches, so a phone only matches a listing close by
+        phone = self.phone_key(phone)
+        if not phone or lat is None or lng is None:
+            return None
+        x, y = self._project(lat, lng)
+        with self._lock:
+            owner_id, owner_x, owner_y = self._phones.setdefault(phone, (place_id, x, y))
+            if owner_id != place_id and (owner_x - x) ** 2 + (owner_y - y) ** 2 <= self._phone_radius_m ** 2:
+                self.duplicates["phone"] += 1
+                return owner_id
+            return None
@@ -0,0 +1,133 @@
+from utils.page_state import PageState
+from utils.cancellation import ScrapeCancelled
+from collections import deque
+from time import monotonic, sleep
+import logging
+
+
+class TabPool:
+    # States a place tab can stop loading in, anything else is still on its way
+    settled_states = (PageState.PLACE, PageState.BLOCKED, PageState.CONSENT, PageState.EMPTY)
+    # A released tab keeps its page until the next navigation commits, the flag tells that page from the new one
+    _release_script = "window.__gmReleased = true;"
+    _probe_script = "if (window.__gmReleased === true) return null;\n" + PageState._probe_script
+
+    def __init__(self, driver, size: int = 3, page_factory=None, poll_interval: float = 0.1) -> None:
+        # page_factory(handle) -> DevTools page for that tab, without it tabs are navigated and polled through Selenium
+        self._driver = driver
+        self._poll_interval = poll_interval
+        self._main = driver.current_window_handle
+        self._current = self._main
+        self._names = {}
+        self._pages = {}
+        self._loading = {}
+        self.setup_logging()
+
+        for index in range(max(1, size)):
+            name = f"gm-tab-{index}"
+            handles = set(driver.window_handles)
+            driver.execute_script("window.open('about:blank', arguments[0]);", name)
+            handle = next(handle for handle in driver.window_handles if handle not in handles)
+            self._names[handle] = name
+            if page_factory is not None:
+                try:
+                    self._pages[handle] = page_factory(handle)
+                except Exception as e:
+                    self.logger.warning(f"Tab {name} stays on Selenium: {e}")
+        self._free = deque(self._names)
+
+    def setup_logging(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def free(self) -> int:
+        return len(self._free)
+
+    @property
+    def loading(self) -> int:
+        return len(self._loading)
+
+    def _switch(self, handle: str):
+        if self._current != handle:
+            self._driver.switch_to.window(handle)
+            self._current = handle
+
+    def load(self, url: str, item=None) -> bool:
+        # Starts the navigation and returns at once, the page loads while other tabs are read
+        if not self._free:
+            return False
+        handle = self._free.popleft()
+        page = self._pages.get(handle)
+        if page is not None:
+            page.navigate(url, wait=False)
+        else:
+            # A named window.open from the main tab reuses the pool tab instead of creating one
+            self._switch(self._main)
+            self._driver.execute_script("window.open(arguments[0], arguments[1]);", url, self._names[handle])
+        self._loading[handle] = (item, monotonic())
+        return True
+
+    def _classify(self, handle: str) -> str:
+        page = self._pages.get(handle)
+        if page is None:
+            self._switch(handle)
+            page = self._driver
+        try:
+            probe = page.execute_script(self._probe_script)
+        except Exception:
+            return PageState.LOADING
+        # Until the new navigation commits the tab still shows the released page, or about:blank when it is new
+        if probe is None or probe[0] == "about:blank":
+            return PageState.LOADING
+        return PageState.from_probe(*probe)
+
+    def next_ready(self, timeout: float, stop_flag=None):
+        # Returns (handle, item, state) of the first tab that settled or ran out of time, the driver is switched to it
+        while self._loading:
+            if stop_flag and stop_flag():
+                raise ScrapeCancelled()
+            for handle, (item, started) in list(self._loading.items()):
+                state = self._classify(handle)
+                if state in self.settled_states or monotonic() - started >= timeout:
+                    del self._loading[handle]
+                    self._switch(handle)
+                    return handle, item, state
+            sleep(self._poll_interval)
+        return None, None, None
+
+    def release(self, handle: str):
+        # The tab keeps its page until the next load navigates it, only the main tab's feed gets focus back
+        if handle in self._names and handle not in self._free and handle not in self._loading:
+            try:
+                page = self._pages.get(handle)
+                if page is None:
+                    self._switch(handle)
+                    page = self._driver
+                page.execute_script(self._release_script)
+            except Exception as e:
+                self.logger.warning(f"Not able to mark tab {self._names[handle]} as released: {e}")
+            self._free.append(handle)
+        self._switch(self._main)
+
+    def close(self):
+        for page in self._pages.values():
+            try:
+                page.close()
+            except Exception:
+                pass
+        for handle in self._names:
+            try:
+                self._switch(handle)
+                self._driver.close()
+            except Exception as e:
+                self.logger.error(f"Not able to close tab {self._names[handle]}: {e}")
+        self._current = None
+        try:
+            self._switch(self._main)
+        except Exception:
+            pass
+        self._names.clear()
+        self._pages.clear()
+        self._loading.clear()
+        self._free.clear()
@@ -1,12 +1,27 @@
 from utils.google_maps_scraper import GoogleMaps
-from threading import Lock
+from utils.rate_controller import AdaptiveRateController
+from utils.spatial_index import PlaceIndex
+from utils.cancellation import DriverRegistry
+from utils.driver_supervisor import DriverSupervisor
+from utils.domain_router import DomainRouter
+from threading import Lock, Thread, Event
+from concurrent.futures import wait
+from time import time
+from socket import gethostname
+from os import getpid
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 class FastSearchAlgo:
     def __init__(self, driver_path: str, unavailable_text: str = "Not Available", headless: bool = False, wait_time: int = 15,
                  suggested_ext: list = None, output_path: str = "./CSV_FILES", result_range: int = None,
-                 workers: int = 1, verbose: bool = True, print_lock: Lock = None) -> None:
+                 workers: int = 1, verbose: bool = True, print_lock: Lock = None, detail_workers: int = 0,
+                 bootstrap=None, async_enrichment: bool = False, adaptive_rate: bool = True,
+                 dedupe_radius: float = 50.0, max_browser_mb: float = 1500.0, max_pages: int = 0,
+                 archive_dir: str = "", max_reviews: int = -1, reviews_since=None,
+                 prune_reviews: bool = True, identities: bool = False, proxies: list = None,
+                 delta_path: str = "", plan_history: str = "", probe_queries: bool = False,
+                 backend: str = "selenium", tabs: int = 0) -> None:
         if suggested_ext is None:
             suggested_ext = ["contact-us", "contact"]
 
@@ -18,7 +33,55 @@ class FastSearchAlgo:
         self._result_range = result_range
         self._verbose = verbose
         self._driver_path = driver_path
+        self._backend = backend
+        self._tabs = tabs
         self._print_lock = print_lock
+        self._workers = max(1, workers)
+        self._detail_workers = detail_workers
+        self._bootstrap = bootstrap
+        self._async_enrichment = async_enrichment
+        # Shared by every GoogleMaps object so a block seen by one worker slows all of them down
+        self._rate_controller = AdaptiveRateController() if adaptive_rate else None
+        # Shared as well, overlapping queries and tiles must see each other's places
+        self._dedupe_radius = dedupe_radius
+        self._place_index = self._new_place_index()
+        # Every live driver is tracked so a stop can quit the ones that don't wind down on their own
+        self._driver_registry = DriverRegistry()
+        self._stop_flag = lambda: False
+        # Chrome grows with every tab it opens, drivers past these budgets are swapped between places
+        self._supervisor = DriverSupervisor(max_rss_mb=max_browser_mb, max_pages=max_pages)
+        self._archive = None
+        if archive_dir:
+            from utils.page_archive import PageArchive
+            self._archive = PageArchive(archive_dir)
+        # -1 leaves reviews out, 0 reads all of them; the writer is shared so every worker streams into one file
+        self._review_scraper = None
+        self._review_sink = None
+        if max_reviews >= 0:
+            from utils.review_scraper import ReviewScraper
+            from utils.output_files_formats import ReviewCSVWriter
+            self._review_scraper = ReviewScraper(max_reviews=max_reviews, since=reviews_since, prune_dom=prune_reviews)
+            self._review_sink = ReviewCSVWriter(ReviewScraper.fields, output_path=output_path,
+                                                unavailable_text=unavailable_text)
+
+        # Added / changed / disappeared places against the snapshot of earlier runs
+        self._delta = None
+        if delta_path:
+            from utils.delta_export import DeltaExporter
+            self._delta = DeltaExporter(delta_path, output_path=output_path, unavailable_text=unavailable_text)
+        # Longest-first scheduling from the feed sizes and durations of earlier runs
+        self._planner = None
+        self._probe_queries = probe_queries
+        if plan_history:
+            from utils.query_planner import QueryPlanner
+            self._planner = QueryPlanner(plan_history)
+        # One router for all workers, so the end of run report counts every avoided fetch
+        self._domain_router = DomainRouter()
+        # Per-browser user agents and fingerprints, drawn from utils/random_users.py and spread over the proxies
+        self._identity_pool = None
+        if identities or proxies:
+            from utils.identity_pool import IdentityPool
+            self._identity_pool = IdentityPool(proxies=proxies)
 
         self.setup_logging()
 
@@ -26,28 +89,406 @@ class FastSearchAlgo:
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
 
+    def _new_place_index(self):
+        return PlaceIndex(radius_m=self._dedupe_radius) if self._dedupe_radius > 0 else None
+
+    def _create_maps_obj(self, result_range: int = -1, place_index=None) -> GoogleMaps:
+        return GoogleMaps(unavailable_text=self._unavailable_text, headless=self._headless,
+                          wait_time=self._wait_time, suggested_ext=self._suggested_ext,
+                          output_path=self._output_path, verbose=self._verbose,
+                          result_range=self._result_range if result_range == -1 else result_range,
+                          driver_path=self._driver_path,
+                          print_lock=self._print_lock, bootstrap=self._bootstrap,
+                          async_enrichment=self._async_enrichment, rate_controller=self._rate_controller,
+                          place_index=self._place_index if place_index is None else place_index,
+                          driver_registry=self._driver_registry,
+                          stop_flag=lambda: self._stop_flag(), supervisor=self._supervisor, archive=self._archive,
+                          review_scraper=self._review_scraper, review_sink=self._review_sink,
+                          identity_pool=self._identity_pool, domain_router=self._domain_router,
+                          delta=self._delta, backend=self._backend, tabs=self._tabs)
+
+    def memory_report(self) -> dict:
+        report = self._supervisor.report()
+        self.logger.info(f"Browser memory: peak {report['peak_rss_mb']}MB per browser, "
+                         f"recycled {report['recycled'] or 'none'}")
+        return report
+
+    def review_report(self) -> dict:
+        if self._review_scraper is None:
+            return {}
+        report = self._review_scraper.stats()
+        self.logger.info(f"Reviews: {report.get('reviews', 0)} from {report.get('places', 0)} places, "
+                         f"{report.get('pruned_nodes', 0)} DOM nodes pruned")
+        return report
+
+    def identity_report(self) -> list[dict]:
+        if self._identity_pool is None:
+            return []
+        report = self._identity_pool.stats()
+        for identity in report:
+            self.logger.info(f"Identity {identity['identity']}{' via ' + identity['proxy'] if identity['proxy'] else ''}: "
+                             f"{identity['pages']} pages, block rate {identity['block_rate']:.1%}, "
+                             f"{identity['pages_per_minute']} pages/min{', retired' if identity['retired'] else ''}")
+        return report
+
+    def routing_report(self) -> dict:
+        report = self._domain_router.stats()
+        if report["routed"]:
+            self.logger.info(f"Websites routed past the contact page crawl: {report['routed']}, "
+                             f"{report['fetches_avoided']} fetches avoided")
+        return report
+
+    def run_report(self) -> dict:
+        return {"memory": self.memory_report(), "reviews": self.review_report(), "identities": self.identity_report(),
+                "routing": self.routing_report()}
+
+    def finish_run(self) -> dict:
+        # Disappeared places are only known once every query of the run is over
+        if self._delta is not None:
+            counts = self._delta.finish()
+            self.logger.info(f"Delta: {counts['added']} added, {counts['changed']} changed, "
+                             f"{counts['disappeared']} disappeared, {counts['unchanged']} unchanged "
+                             f"({', '.join(self._delta.output_files.values())})")
+        return self.run_report()
+
+    def shutdown(self, grace: float = 5.0) -> dict:
+        # Called after the stop flag is set: workers get `grace` seconds to flush and quit, the rest are killed
+        return self._driver_registry.shutdown(grace)
+
+    def warm_up(self):
+        if self._bootstrap:
+            self._bootstrap.warm_up(self._create_maps_obj())
+
+    @staticmethod
+    def _query_callback(update_callback, query: str):
+        # Progress sinks that track queries separately get a callback bound to the query, plain callables pass through
+        for_query = getattr(update_callback, "for_query", None)
+        return for_query(query) if for_query else update_callback
+
+    @staticmethod
+    def _query_status(update_callback, query: str, status: str):
+        query_status = getattr(update_callback, "query_status", None)
+        if query_status:
+            query_status(query, status)
+
+    def _finish_query(self, update_callback, query: str, stop_flag):
+        if self._delta is not None and not stop_flag():
+            self._delta.complete_query(query)
+        self._query_status(update_callback, query, "Cancelled" if stop_flag() else "Done")
+
+    def plan_queries(self, query_list: list[str], stop_flag, split: bool = True):
+        if self._planner is None:
+            return None
+        probe_maps_obj = self._create_maps_obj()
+        probe_driver = []
+
+        def probe(query):
+            # Queries the history hasn't seen yet are searched once by a single probe browser
+            if stop_flag():
+                return 0
+            try:
+                if not probe_driver:
+                    probe_driver.append(probe_maps_obj.create_chrome_driver(block_images=True))
+                return probe_maps_obj.probe_feed(probe_driver[0], query, stop_flag)
+            except Exception as e:
+                self.logger.error(f"Not able to probe query '{query}': {e}")
+                return GoogleMaps._feed_cap // 2
+
+        workers = self._detail_workers if self._detail_workers > 0 else self._workers
+        try:
+            plan = self._planner.plan(query_list, workers, probe if self._probe_queries else None,
+                                      self._result_range, split)
+        finally:
+            if probe_driver:
+                probe_maps_obj.quit_driver(probe_driver[0])
+
+        for query, places, seconds, source, chunks in plan.entries:
+            self.logger.info(f"Plan: '{query}' ~{places:.0f} places, ~{seconds:.0f}s ({source})"
+                             f"{f', split over {chunks} drivers' if chunks > 1 else ''}")
+        self.logger.info(f"Predicted makespan: {plan.predicted_makespan:.0f}s on {workers} worker(s)")
+        return plan
+
+    def _record_run(self, plan, start_time: float, stop_flag):
+        if plan is None or stop_flag():
+            return
+        actual = time() - start_time
+        self._planner.record_run(plan, actual)
+        self.logger.info(f"Actual makespan: {actual:.0f}s (predicted {plan.predicted_makespan:.0f}s)")
+
+    def _measured_callback(self, update_callback, query: str):
+        # Counts the places a query produced, the planner learns its size from it
+        query_callback = self._query_callback(update_callback, query)
+        lock, results = Lock(), [0]
+
+        def count_results(count):
+            with lock:
+                results[0] += count
+            query_callback(count)
+        return count_results, results
+
+    def _record_query(self, query: str, places: int, seconds: float, stop_flag):
+        if self._planner is not None and not stop_flag():
+            self._planner.record_query(query, places, seconds)
+
     def fast_search_algorithm(self, query_list: list[str], update_callback, stop_flag):
-        maps_obj = GoogleMaps(unavailable_text=self._unavailable_text, headless=self._headless,
-                              wait_time=self._wait_time, suggested_ext=self._suggested_ext,
-                              output_path=self._output_path, verbose=self._verbose,
-                              result_range=self._result_range, driver_path=self._driver_path,
-                              print_lock=self._print_lock)
-
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for query in query_list:
-                futures.append(executor.submit(self.scrape_query, maps_obj, query, update_callback, stop_flag))
+        self._stop_flag = stop_flag
+        start_time = time()
+        plan = self.plan_queries(query_list, stop_flag, split=self._detail_workers == 0)
+        if plan is not None:
+            query_list = plan.queries
+        try:
+            if self._detail_workers > 0:
+                # The shared detail pool already spreads a big query's places over every detail driver
+                return self.pooled_search_algorithm(query_list, update_callback, stop_flag)
+
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                futures = []
+                for query in query_list:
+                    chunks = plan.chunks(query) if plan is not None else 1
+                    if chunks > 1:
+                        futures.append(executor.submit(self.scrape_split_query, executor, query, chunks,
+                                                       update_callback, stop_flag))
+                    else:
+                        futures.append(executor.submit(self.scrape_query, query, update_callback, stop_flag))
+
+                split_queries = []
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"An error occurred: {e}")
+                        continue
+                    if result:
+                        split_queries.append(result)
 
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    self.logger.error(f"An error occurred: {e}")
+                # Chunks are plain executor jobs, only this thread waits on them so no worker blocks on another
+                for query, listing_seconds, chunk_futures, count_results, results in split_queries:
+                    wait(chunk_futures)
+                    seconds = listing_seconds
+                    for future in chunk_futures:
+                        try:
+                            seconds += future.result()
+                        except Exception as e:
+                            self.logger.error(f"An error occurred in a chunk of query '{query}': {e}")
+                    self._record_query(query, results[0], seconds, stop_flag)
+                    self._finish_query(update_callback, query, stop_flag)
+        finally:
+            self._record_run(plan, start_time, stop_flag)
 
-    def scrape_query(self, maps_obj, query, update_callback, stop_flag):
+    def scrape_query(self, query, update_callback, stop_flag):
+        # Every query gets its own GoogleMaps, create_chrome_driver rebinds the wait and main tab of the object
+        maps_obj = self._create_maps_obj()
         try:
             self.logger.info(f"Starting scraper for query: {query}")
-            maps_obj.start_scrapper(query, update_callback, stop_flag)
+            self._query_status(update_callback, query, "Running")
+            count_results, results = self._measured_callback(update_callback, query)
+            start_time = time()
+            maps_obj.start_scrapper(query, count_results, stop_flag)
+            self._record_query(query, results[0], time() - start_time, stop_flag)
+            self._finish_query(update_callback, query, stop_flag)
+            self.logger.info(f"Scraping completed for query: {query}")
+        except Exception as e:
+            self._query_status(update_callback, query, "Failed")
+            self.logger.error(f"An error occurred while scraping query '{query}': {e}")
+
+    def scrape_split_query(self, executor, query, chunks: int, update_callback, stop_flag):
+        # The listing runs here, the places are cut into chunks that queue up as jobs for any free worker
+        self.logger.info(f"Starting split scraper for query: {query} ({chunks} chunks)")
+        self._query_status(update_callback, query, "Running")
+        count_results, results = self._measured_callback(update_callback, query)
+        maps_obj = self._create_maps_obj()
+        start_time = time()
+        links = []
+        driver = None
+        try:
+            driver = maps_obj.create_chrome_driver(block_images=True)
+            maps_obj.open_maps(driver)
+            if maps_obj.run_search(driver, query, stop_flag):
+                maps_obj.collect_place_links(driver, link_callback=links.append, query=query)
+        except Exception as e:
+            self._query_status(update_callback, query, "Failed")
+            self.logger.error(f"An error occurred while listing query '{query}': {e}")
+            return None
+        finally:
+            if driver is not None:
+                maps_obj.quit_driver(driver)
+
+        size = max(1, -(-len(links) // chunks))
+        chunk_futures = [executor.submit(self._scrape_chunk, links[index:index + size], query, count_results,
+                                         stop_flag) for index in range(0, len(links), size)]
+        return query, time() - start_time, chunk_futures, count_results, results
+
+    def _scrape_chunk(self, links: list[str], query: str, update_callback, stop_flag) -> float:
+        start_time = time()
+        self._create_maps_obj().scrape_links(links, query, update_callback, stop_flag)
+        return time() - start_time
+
+    def pooled_search_algorithm(self, query_list: list[str], update_callback, stop_flag):
+        from utils.detail_pool import DetailDriverPool
+
+        self._stop_flag = stop_flag
+        # One listing driver per query feeds place URLs to a shared pool of detail drivers
+        detail_pool = DetailDriverPool(maps_obj=self._create_maps_obj(), workers=self._detail_workers,
+                                       stop_flag=stop_flag)
+        detail_pool.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                futures = [executor.submit(self.scrape_pooled_query, query, update_callback, stop_flag, detail_pool)
+                           for query in query_list]
+
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.logger.error(f"An error occurred: {e}")
+        finally:
+            detail_pool.close()
+
+    def scrape_pooled_query(self, query, update_callback, stop_flag, detail_pool):
+        try:
+            self.logger.info(f"Starting pooled scraper for query: {query}")
+            self._query_status(update_callback, query, "Running")
+            self._create_maps_obj().start_pooled_scrapper(query, self._query_callback(update_callback, query),
+                                                          stop_flag, detail_pool)
+            self._finish_query(update_callback, query, stop_flag)
             self.logger.info(f"Scraping completed for query: {query}")
         except Exception as e:
+            self._query_status(update_callback, query, "Failed")
             self.logger.error(f"An error occurred while scraping query '{query}': {e}")
+
+    def tiled_search_algorithm(self, query_list: list[str], bbox: str, update_callback, stop_flag, grid: int = 2,
+                               tile_cap: int = 100, max_depth: int = 4):
+        from utils.geo_tiling import Tile
+
+        self._stop_flag = stop_flag
+        area = Tile.from_string(bbox)
+        detail_pool = None
+        if self._detail_workers > 0:
+            from utils.detail_pool import DetailDriverPool
+            detail_pool = DetailDriverPool(maps_obj=self._create_maps_obj(), workers=self._detail_workers,
+                                           stop_flag=stop_flag)
+            detail_pool.start()
+
+        try:
+            for query in query_list:
+                if stop_flag():
+                    break
+                self._query_status(update_callback, query, "Running")
+                self.scrape_tiled_query(query, area, self._query_callback(update_callback, query), stop_flag,
+                                        detail_pool, grid, tile_cap, max_depth)
+                self._finish_query(update_callback, query, stop_flag)
+        finally:
+            if detail_pool is not None:
+                detail_pool.close()
+
+    def scrape_tiled_query(self, query, area, update_callback, stop_flag, detail_pool=None, grid: int = 2,
+                           tile_cap: int = 100, max_depth: int = 4, raise_errors: bool = False,
+                           place_index=None) -> int:
+        from utils.geo_tiling import TiledSearch
+
+        self.logger.info(f"Starting tiled scraper for query: {query}")
+        # Tiles read their whole feed, the run wide limit is enforced on unique places instead
+        search = TiledSearch(maps_factory=lambda: self._create_maps_obj(result_range=None, place_index=place_index),
+                             query=query, bbox=area,
+                             workers=self._workers, grid=grid, tile_cap=tile_cap, max_depth=max_depth,
+                             limit=self._result_range, update_callback=update_callback, stop_flag=stop_flag)
+        places = search.run(detail_pool)
+        if raise_errors and search.errors and not stop_flag():
+            raise RuntimeError(f"{len(search.errors)} tile(s) failed, first: {search.errors[0]}")
+        return places
+
+    def serve(self, stop_flag, port: int = 8765, host: str = "127.0.0.1", default_limit: int = 200):
+        import asyncio
+        from utils.job_service import JobService
+
+        # Jobs from different clients may repeat places, so the service doesn't dedupe across jobs
+        self._stop_flag = stop_flag
+        self._place_index = None
+        service = JobService(maps_factory=self._create_maps_obj, stop_flag=stop_flag, concurrency=self._workers,
+                             host=host, port=port, default_limit=default_limit)
+        asyncio.run(service.serve())
+
+    def queue_search_algorithm(self, job_queue, update_callback, stop_flag, lease_seconds: float = 300.0,
+                               grid: int = 2, tile_cap: int = 100, max_depth: int = 4):
+        # Any number of processes can run this against one queue, each of the -w workers leases one job at a time
+        self._stop_flag = stop_flag
+        # Each leased job dedupes against its own places only, a retried job has to find all of them again
+        self._place_index = None
+        owner = f"{gethostname()}:{getpid()}"
+        detail_pool = None
+        if self._detail_workers > 0:
+            from utils.detail_pool import DetailDriverPool
+            detail_pool = DetailDriverPool(maps_obj=self._create_maps_obj(), workers=self._detail_workers,
+                                           stop_flag=stop_flag)
+            detail_pool.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                futures = [executor.submit(self._queue_worker, job_queue, f"{owner}:{index}", update_callback,
+                                           stop_flag, detail_pool, lease_seconds, (grid, tile_cap, max_depth))
+                           for index in range(self._workers)]
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.logger.error(f"An error occurred: {e}")
+        finally:
+            if detail_pool is not None:
+                detail_pool.close()
+
+    @staticmethod
+    def _keep_lease(job_queue, job: dict, owner: str, lease_seconds: float, finished: Event, lost: Event):
+        while not finished.wait(lease_seconds / 3):
+            if not job_queue.heartbeat(job["id"], owner, lease_seconds):
+                lost.set()
+                return
+
+    def _queue_worker(self, job_queue, owner: str, update_callback, stop_flag, detail_pool, lease_seconds: float,
+                      tiling: tuple):
+        from utils.geo_tiling import Tile
+
+        while not stop_flag():
+            job = job_queue.lease(owner, lease_seconds)
+            if job is None:
+                break
+
+            query = job["query"]
+            finished, lost = Event(), Event()
+            Thread(target=self._keep_lease, args=(job_queue, job, owner, lease_seconds, finished, lost),
+                   daemon=True).start()
+            # A worker that lost its lease stops, whoever took the job over owns it now
+            job_stop = lambda: stop_flag() or lost.is_set()
+            query_callback = self._query_callback(update_callback, query)
+            results_lock, results = Lock(), [0]
+
+            def count_results(count, query_callback=query_callback, results_lock=results_lock, results=results):
+                with results_lock:
+                    results[0] += count
+                query_callback(count)
+
+            place_index = self._new_place_index()
+            self._query_status(update_callback, query, "Running")
+            try:
+                if job["payload"].get("bbox"):
+                    self.scrape_tiled_query(query, Tile.from_string(job["payload"]["bbox"]), count_results, job_stop,
+                                            detail_pool, *tiling, raise_errors=True, place_index=place_index)
+                elif detail_pool is not None:
+                    self._create_maps_obj(place_index=place_index).start_pooled_scrapper(
+                        query, count_results, job_stop, detail_pool, raise_errors=True)
+                else:
+                    # Blocks, timeouts and failed launches come back as exceptions so the job is failed and retried
+                    self._create_maps_obj(place_index=place_index).start_scrapper(query, count_results, job_stop,
+                                                                                  raise_errors=True)
+            except Exception as e:
+                finished.set()
+                job_queue.fail(job["id"], owner, str(e))
+                self._query_status(update_callback, query, "Failed")
+                self.logger.error(f"Job {job['id']} ('{query}') failed on attempt {job['attempts']}: {e}")
+                continue
+
+            finished.set()
+            if stop_flag():
+                job_queue.release(job["id"], owner)
+            elif not lost.is_set():
+                job_queue.complete(job["id"], owner, results[0])
+            self._finish_query(update_callback, query, job_stop)
@@ -1,12 +1,15 @@
-from selenium.webdriver.chrome.webdriver import WebDriver
+from __future__ import annotations
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
-from re import compile
+from utils.page_patterns import PagePatterns
+
+# Type-only imports, bs4 is loaded when the first page is parsed and selenium by the driver stage
+if TYPE_CHECKING:
+    from selenium.webdriver.chrome.webdriver import WebDriver
 
 class PatternScraper:
     def __init__(self):
         self._last_opened_handler = None
-        self._email_pattern = compile(r'([a-zA-Z0-9._-]+@[a-zA-Z0-9._-]+\.[a-zA-Z0-9_-]+)*')
         # self._fb_pattern = compile(r'(?:https?://)?(?:www\.)?facebook\.com/\S+')
         # self._twitter_pattern = compile(r'(?:https?://)?(?:www\.)?twitter\.com/\S+')
         # self._insta_pattern = compile(r'(?:https?://)?(?:www\.)?instagram\.com/\S+')
@@ -40,35 +43,15 @@ class PatternScraper:
             driver.switch_to.window(self._last_opened_handler)
         return source_codes
 
-    @staticmethod
-    def email_decoder(email):
-        decoded_mail = ""
-        k = int(email[:2], 16)
-        for i in range(2, len(email) - 1, 2):
-            decoded_mail += chr(int(email[i:i + 2], 16) ^ k)
-        return decoded_mail
-
-    def _href_emails(self, soup: BeautifulSoup) -> list:
-        email_list = []
-        mail_tos = soup.select('a[href]')
-        for mail in mail_tos:
-            href = mail['href']
-            if "email-protect" in href:
-                email_list.append(self.email_decoder(href.split("#")[1]))
-            elif "mailto" in href:
-                email_list.append(href.removeprefix("mailto:").strip())
-        return email_list
-
     def get_pattern_data(self, source_codes: list):
+        from bs4 import BeautifulSoup
         patterns_data = {"site_email": []}
 
         for source in source_codes:
             soup = BeautifulSoup(source, features="lxml", parser="html.parser")
 
-            site_email = [x for x in str(soup) if self._email_pattern.search(x).group()]
-            if not site_email:
-                href_emails = self._href_emails(soup)
-                site_email.extend(href_emails)
+            # Same rules as the archive replay, see PagePatterns.emails
+            site_email = PagePatterns.emails(soup.get_text(" "), [anchor['href'] for anchor in soup.select('a[href]')])
 
             # facebook_links = [link['href'] for link in soup.find_all('a', href=self._fb_pattern)]
             # twitter_links = [link['href'] for link in soup.find_all('a', href=self._twitter_pattern)]
@@ -84,7 +67,16 @@ class PatternScraper:
             # patterns_data["linkedin_links"].extend(linkedin_links)
         return patterns_data
 
-    def find_patterns(self, driver: WebDriver, site_url: str, suggested_ext: list, unavailable: str = "Not Available"):
+    def read_pages(self, driver: WebDriver, urls: list, source_sink=None) -> list:
+        self._last_opened_handler = driver.current_window_handle
+        sources = self.get_source_code(driver, urls)
+        if source_sink:
+            for url, source in zip(urls, sources):
+                source_sink(url, source)
+        return sources
+
+    def find_patterns(self, driver: WebDriver, site_url: str, suggested_ext: list, unavailable: str = "Not Available",
+                      source_sink=None):
         patterns_data = {"site_email": ""}
 
         if site_url == unavailable or not suggested_ext:
@@ -92,9 +84,8 @@ class PatternScraper:
 
         valid_urls = self.create_urls(site_url, suggested_ext)
 
-        self._last_opened_handler = driver.current_window_handle
         try:
-            sources = self.get_source_code(driver, valid_urls)
+            sources = self.read_pages(driver, valid_urls, source_sink)
         except Exception:
             return {key: unavailable for key in patterns_data}
 